@@ -0,0 +1,243 @@
+import argparse
+import contextlib
+import importlib
+import importlib.util
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+sys.path[:0] = [str(BASE_DIR), str(BASE_DIR / "scenic_generation")]
+# Every pass re-runs the same scenarios and programs; measure the pipeline rather than cache hits.
+os.environ.setdefault("SCENIC_VALIDATION_CACHE", "0")
+os.environ.setdefault("SCENIC_DECOMPOSITION_CACHE", "0")
+
+from llm_clients.mock_server import build_mock_response
+from prompt_budget import count_tokens, get_prompt_token_stats, record_prompt_tokens
+
+DEFAULT_CORPUS_PATH = Path(__file__).parent / "scenarios.jsonl"
+PIPELINES = {
+    "auto": "auto_scenario_generator",
+    "basic": "scenario_generator"
+}
+STAGES = [
+    "decomposition",
+    "retrieval",
+    "prompt_assembly",
+    "code_generation",
+    "integration",
+    "validation",
+    "end_to_end"
+]
+COLD_START_TARGET_MS = 500
+COLD_START_MODULES = ["batch_generator", "auto_scenario_generator"]
+COLD_START_SCRIPT = "import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+
+
+def load_corpus(corpus_path):
+    with open(corpus_path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def make_stub_llm(latency=0.0):
+    def stub_get_llm_response(prompt, stage=None, **kwargs):
+        record_prompt_tokens(stage, count_tokens(prompt))
+        if latency:
+            time.sleep(latency)
+        return build_mock_response(prompt)
+
+    return stub_get_llm_response
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(durations):
+    total = sum(durations)
+    return {
+        'iterations': len(durations),
+        'p50_ms': round(percentile(durations, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(durations, 0.95) * 1000, 3),
+        'mean_ms': round(total / len(durations) * 1000, 3),
+        'throughput_per_s': round(len(durations) / total, 3) if total else None
+    }
+
+
+def measure(function, inputs, iterations, warmup):
+    for item in inputs[:warmup]:
+        function(item)
+
+    durations = []
+    for _ in range(iterations):
+        for item in inputs:
+            start_time = time.perf_counter()
+            function(item)
+            durations.append(time.perf_counter() - start_time)
+    return summarize(durations)
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def prepare_inputs(generator, corpus):
+    prepared = []
+    for record in corpus:
+        decomposition = generator.decompose_scenario(record["scenario"])
+        if not decomposition:
+            continue
+        snippets = generator.retrieve_category_snippets(decomposition)
+        codes = generator.generate_category_codes(decomposition, snippets)
+        prepared.append({
+            'scenario': record["scenario"],
+            'decomposition': decomposition,
+            'snippets': snippets,
+            'codes': {category: generator.clean_code_block(code) for category, code in codes.items()}
+        })
+    return prepared
+
+
+def build_stage_functions(generator, validate_scenic_code):
+    def run_prompt_assembly(item):
+        for category_type, decomposition_key in generator.CATEGORY_DECOMPOSITION_KEYS.items():
+            generator.build_category_prompt(
+                item['decomposition'][decomposition_key],
+                generator.CATEGORY_PROMPT_PATHS[category_type],
+                item['snippets'][category_type],
+                stage=category_type
+            )
+
+    def run_integration(item):
+        codes = item['codes']
+        town = generator.extract_town_from_geometry(codes['geometry'])
+        generator.integrate_code_components(
+            item['scenario'],
+            town,
+            generator.build_scenic_header(town),
+            codes['behavior'],
+            generator.remove_town_line(codes['geometry']),
+            codes['spawn']
+        )
+
+    def run_end_to_end(item):
+        code = generator.generate_scenario_code(item['scenario'])
+        if validate_scenic_code and code:
+            validate_scenic_code(code)
+
+    stage_functions = {
+        'decomposition': lambda item: generator.decompose_scenario(item['scenario']),
+        'retrieval': lambda item: generator.retrieve_category_snippets(item['decomposition']),
+        'prompt_assembly': run_prompt_assembly,
+        'code_generation': lambda item: generator.generate_category_codes(item['decomposition'], item['snippets']),
+        'end_to_end': run_end_to_end
+    }
+    if hasattr(generator, "integrate_code_components"):
+        stage_functions['integration'] = run_integration
+    if validate_scenic_code:
+        stage_functions['validation'] = lambda item: validate_scenic_code(item['reference_code'])
+    return stage_functions
+
+
+def measure_cold_start(module, runs=5):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(BASE_DIR), str(BASE_DIR / "scenic_generation")]))
+    durations = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", COLD_START_SCRIPT.format(module=module)],
+            capture_output=True, text=True, check=True, env=env
+        )
+        durations.append(float(output.stdout.strip().splitlines()[-1]))
+    result = summarize(durations)
+    result['target_ms'] = COLD_START_TARGET_MS
+    result['within_target'] = result['p50_ms'] <= COLD_START_TARGET_MS
+    return result
+
+
+def run_benchmark(corpus_path=DEFAULT_CORPUS_PATH, pipeline="auto", stages=None, iterations=3, warmup=1,
+                  llm_latency=0.0, cold_start_runs=5):
+    stages = stages or STAGES
+    cold_start = {}
+    if cold_start_runs:
+        cold_start = {module: measure_cold_start(module, cold_start_runs) for module in COLD_START_MODULES}
+    corpus = load_corpus(corpus_path)
+    generator = importlib.import_module(PIPELINES[pipeline])
+    generator.get_llm_response = make_stub_llm(llm_latency)
+
+    validate_scenic_code = None
+    if importlib.util.find_spec("scenic") is not None:
+        validate_scenic_code = importlib.import_module("scenic_validator").validate_scenic_code
+
+    report = {
+        'pipeline': pipeline,
+        'corpus': str(corpus_path),
+        'scenarios': len(corpus),
+        'iterations': iterations,
+        'llm_latency_s': llm_latency,
+        'python': platform.python_version(),
+        'retriever_backend': os.environ.get("SCENIC_RETRIEVER_BACKEND", "chroma"),
+        'cold_start_import': cold_start,
+        'stages': {},
+        'skipped_stages': {}
+    }
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        prepared = prepare_inputs(generator, corpus)
+        for item in prepared:
+            item['reference_code'] = generator.generate_scenario_code(item['scenario'])
+
+        stage_functions = build_stage_functions(generator, validate_scenic_code)
+        for stage in stages:
+            if stage not in stage_functions:
+                report['skipped_stages'][stage] = "not available for this pipeline or environment"
+                continue
+            report['stages'][stage] = measure(stage_functions[stage], prepared, iterations, warmup)
+
+    report['prompt_tokens'] = get_prompt_token_stats()
+    report['peak_rss_mb'] = peak_rss_mb()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the Scenic generation pipeline")
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS_PATH), help="JSONL file of scenario descriptions")
+    parser.add_argument("--pipeline", choices=sorted(PIPELINES), default="auto")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=None)
+    parser.add_argument("--iterations", type=int, default=3, help="passes over the corpus per stage")
+    parser.add_argument("--warmup", type=int, default=1, help="scenarios run once before timing each stage")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="simulated seconds per stubbed LLM call")
+    parser.add_argument("--cold-start-runs", type=int, default=5,
+                        help="fresh interpreters timing the CLI module imports, 0 to skip")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        corpus_path=args.corpus,
+        pipeline=args.pipeline,
+        stages=args.stages,
+        iterations=args.iterations,
+        warmup=args.warmup,
+        llm_latency=args.llm_latency,
+        cold_start_runs=args.cold_start_runs
+    )
+
+    report_json = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report_json + "\n")
+    else:
+        print(report_json)
+
+
+if __name__ == "__main__":
+    main()
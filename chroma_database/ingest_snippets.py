@@ -0,0 +1,289 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import re
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+from scenic_retriever import bump_kb_version
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+db_path = os.path.join(script_dir, "scenic_codebase")
+COLLECTION_NAME = "scenario_snippets"
+CATEGORIES = ("behavior", "geometry", "spawn")
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_EMBEDDING_WORKERS = min(4, os.cpu_count() or 1)
+LEGACY_UID_PATTERN = re.compile(rf"^({'|'.join(CATEGORIES)})_(\d{{3,}})$")
+DOCSTRING_PATTERN = re.compile(r'^\s*(?:"""(.*?)"""|\'\'\'(.*?)\'\'\')', re.DOTALL)
+
+
+def content_hash(category, description, code):
+    payload = json.dumps([category, description, code], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def stable_uid(category, description):
+    # Editing a description changes its uid; the record under the old uid stays until ingestion runs with --prune.
+    return f"{category}_{hashlib.sha256(description.encode('utf-8')).hexdigest()[:12]}"
+
+
+def make_record(category, description, code, uid=None):
+    if category not in CATEGORIES:
+        raise ValueError(f"Unknown snippet category {category!r}, expected one of {', '.join(CATEGORIES)}")
+    return {
+        'uid': uid or stable_uid(category, description),
+        'type': category,
+        'description': description,
+        'code': code
+    }
+
+
+def uid_allocator():
+    # Snippets sharing a description get a numbered suffix in the order they appear in their source.
+    seen = {}
+
+    def allocate(category, description):
+        uid = stable_uid(category, description)
+        seen[uid] = seen.get(uid, 0) + 1
+        return uid if seen[uid] == 1 else f"{uid}_{seen[uid]}"
+
+    return allocate
+
+
+def load_pickle_entries(pkl_path):
+    with open(pkl_path, "rb") as f:
+        database = pickle.load(f)
+    for category in CATEGORIES:
+        if category not in database:
+            continue
+        entries = database[category]
+        for i, (description, code) in enumerate(zip(entries['description'], entries['snippet'])):
+            yield category, i, description, code
+
+
+def load_pickle_records(pkl_path):
+    allocate = uid_allocator()
+    for category, _, description, code in load_pickle_entries(pkl_path):
+        yield make_record(category, description, code, allocate(category, description))
+
+
+def load_jsonl_records(jsonl_path):
+    allocate = uid_allocator()
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                category = entry.get("type") or entry["category"]
+                yield make_record(
+                    category,
+                    entry["description"],
+                    entry.get("code") or entry["snippet"],
+                    entry.get("uid") or allocate(category, entry["description"])
+                )
+
+
+def split_scenic_description(source):
+    match = DOCSTRING_PATTERN.match(source)
+    if match:
+        return " ".join((match.group(1) or match.group(2)).split()), source[match.end():].strip()
+    comments = []
+    lines = source.strip().split("\n")
+    while lines and lines[0].startswith("#"):
+        comments.append(lines.pop(0).lstrip("#").strip())
+    return " ".join(comments), "\n".join(lines).strip()
+
+
+def file_uid(category, name):
+    # The "file" namespace keeps names such as 000.scenic from looking like index-based pickle uids.
+    return f"{category}_file_{name}"
+
+
+def load_scenic_directory_records(directory):
+    # Snippets live in <directory>/<category>/<name>.scenic with their description as a leading docstring or comment.
+    for category in CATEGORIES:
+        category_dir = os.path.join(directory, category)
+        if not os.path.isdir(category_dir):
+            continue
+        for name in sorted(os.listdir(category_dir)):
+            if not name.endswith(".scenic"):
+                continue
+            with open(os.path.join(category_dir, name), "r", encoding="utf-8") as f:
+                description, code = split_scenic_description(f.read())
+            if not description:
+                print(f"Skipping {category}/{name}: no leading docstring or comment to use as description")
+                continue
+            yield make_record(category, description, code, file_uid(category, name[:-len('.scenic')]))
+
+
+def load_records(source):
+    if os.path.isdir(source):
+        return load_scenic_directory_records(source)
+    if source.endswith(".pkl"):
+        return load_pickle_records(source)
+    if source.endswith(".jsonl"):
+        return load_jsonl_records(source)
+    raise ValueError(f"Unsupported snippet source {source!r}, expected a .pkl, .jsonl or a directory of .scenic files")
+
+
+def batched(records, batch_size):
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def legacy_uid_mapping(collection):
+    # Index-based uids from the original pickle migration shift whenever a snippet is inserted. They are mapped in
+    # index order, so snippets sharing a description get the same suffixes as when their pickle is loaded.
+    existing = collection.get(include=["documents"])
+    legacy = []
+    for uid, description in zip(existing['ids'], existing['documents']):
+        match = LEGACY_UID_PATTERN.match(uid)
+        if match:
+            legacy.append((CATEGORIES.index(match.group(1)), int(match.group(2)), uid, description))
+    allocate = uid_allocator()
+    return {uid: allocate(CATEGORIES[category], description) for category, _, uid, description in sorted(legacy)}
+
+
+def has_legacy_uids(collection):
+    return bool(collection.get(ids=[f"{category}_000" for category in CATEGORIES], include=[])['ids'])
+
+
+def migrate_legacy_uids(path=db_path, collection_name=COLLECTION_NAME):
+    import chromadb
+
+    collection = chromadb.PersistentClient(path=path).get_or_create_collection(collection_name)
+    mapping = legacy_uid_mapping(collection)
+    if not mapping:
+        return {}
+
+    # Stored embeddings are reused, so the migration does not re-embed anything.
+    existing = collection.get(ids=list(mapping), include=["embeddings", "documents", "metadatas"])
+    collection.upsert(
+        ids=[mapping[uid] for uid in existing['ids']],
+        embeddings=existing['embeddings'],
+        documents=existing['documents'],
+        metadatas=[dict(metadata, uid=mapping[uid]) for uid, metadata in zip(existing['ids'], existing['metadatas'])]
+    )
+    collection.delete(ids=list(mapping))
+    bump_kb_version(path)
+    return mapping
+
+
+def stored_hashes(collection, uids):
+    existing = collection.get(ids=uids, include=["documents", "metadatas"])
+    hashes = {}
+    for uid, description, metadata in zip(existing['ids'], existing['documents'], existing['metadatas']):
+        # Records from the pickle migration carry no hash; derive it from what is stored.
+        hashes[uid] = metadata.get('content_hash') or content_hash(metadata['type'], description, metadata['code'])
+    return hashes, {uid: metadata for uid, metadata in zip(existing['ids'], existing['metadatas'])}
+
+
+def ingest_snippets(records, path=db_path, collection_name=COLLECTION_NAME, batch_size=DEFAULT_BATCH_SIZE,
+                    embedding_workers=DEFAULT_EMBEDDING_WORKERS, prune=False):
+    import chromadb
+    from chromadb.utils import embedding_functions
+
+    embedding_function = embedding_functions.DefaultEmbeddingFunction()
+    client = chromadb.PersistentClient(path=path)
+    collection = client.get_or_create_collection(collection_name, embedding_function=embedding_function)
+    if has_legacy_uids(collection):
+        raise ValueError(f"{path} still uses index-based pickle uids; run ingest_snippets.py "
+                         f"--migrate-legacy-uids once before ingesting")
+    stats = {'read': 0, 'added': 0, 'updated': 0, 'unchanged': 0, 'hash_backfilled': 0, 'pruned': 0}
+    ingested = set()
+
+    def embed(batch):
+        return batch, embedding_function([record['description'] for record in batch])
+
+    def upsert(batch, embeddings):
+        collection.upsert(
+            ids=[record['uid'] for record in batch],
+            documents=[record['description'] for record in batch],
+            embeddings=embeddings,
+            metadatas=[{key: record[key] for key in ('uid', 'type', 'code', 'content_hash')} for record in batch]
+        )
+
+    # At most two embedding batches per worker are in flight, so memory stays bounded for any input size.
+    with ThreadPoolExecutor(max_workers=max(1, embedding_workers)) as executor:
+        pending = []
+        for batch in batched(records, batch_size):
+            batch = list({record['uid']: record for record in batch}.values())
+            ingested.update(record['uid'] for record in batch)
+            stats['read'] += len(batch)
+            hashes, metadatas = stored_hashes(collection, [record['uid'] for record in batch])
+
+            changed, backfill = [], []
+            for record in batch:
+                record['content_hash'] = content_hash(record['type'], record['description'], record['code'])
+                if hashes.get(record['uid']) != record['content_hash']:
+                    changed.append(record)
+                    stats['updated' if record['uid'] in hashes else 'added'] += 1
+                elif 'content_hash' not in metadatas[record['uid']]:
+                    backfill.append(record)
+                else:
+                    stats['unchanged'] += 1
+
+            if backfill:
+                collection.update(
+                    ids=[record['uid'] for record in backfill],
+                    metadatas=[dict(metadatas[record['uid']], content_hash=record['content_hash']) for record in backfill]
+                )
+                stats['hash_backfilled'] += len(backfill)
+            if changed:
+                pending.append(executor.submit(embed, changed))
+            while len(pending) >= 2 * max(1, embedding_workers):
+                upsert(*pending.pop(0).result())
+        for future in pending:
+            upsert(*future.result())
+
+    if prune:
+        stale = [uid for uid in collection.get(include=[])['ids'] if uid not in ingested]
+        if stale:
+            collection.delete(ids=stale)
+        stats['pruned'] = len(stale)
+
+    stats['total'] = collection.count()
+    if stats['added'] or stats['updated'] or stats['pruned']:
+        bump_kb_version(path)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upsert Scenic snippets into the knowledge base")
+    parser.add_argument("sources", nargs="*", help=".pkl, .jsonl or directory of <category>/<name>.scenic files")
+    parser.add_argument("--db-path", default=db_path)
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--embedding-workers", type=int, default=DEFAULT_EMBEDDING_WORKERS)
+    parser.add_argument("--migrate-legacy-uids", action="store_true",
+                        help="re-key records created with index-based pickle uids to content-derived uids")
+    parser.add_argument("--prune", action="store_true",
+                        help="delete stored records that none of the given sources contain, e.g. after a description edit")
+    args = parser.parse_args()
+
+    if args.migrate_legacy_uids:
+        migrated = migrate_legacy_uids(path=args.db_path, collection_name=args.collection)
+        print(f"Migrated {len(migrated)} records from index-based to content-derived uids")
+
+    # Pruning needs every source in one pass, otherwise each source would delete the others' records.
+    sources = [(", ".join(args.sources), chain.from_iterable(load_records(source) for source in args.sources))] \
+        if args.prune and args.sources else [(source, load_records(source)) for source in args.sources]
+    for name, records in sources:
+        stats = ingest_snippets(
+            records,
+            path=args.db_path,
+            collection_name=args.collection,
+            batch_size=args.batch_size,
+            embedding_workers=args.embedding_workers,
+            prune=args.prune
+        )
+        print(f"{name}: {stats['read']} read, {stats['added']} added, {stats['updated']} updated, "
+              f"{stats['unchanged'] + stats['hash_backfilled']} unchanged, {stats['pruned']} pruned, "
+              f"{stats['total']} in collection")
+
+if __name__ == "__main__":
+    main()
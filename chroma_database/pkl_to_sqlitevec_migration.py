@@ -1,36 +1,10 @@
-import pickle
-import chromadb
+from ingest_snippets import ingest_snippets, load_pickle_records, migrate_legacy_uids
 
 
 def migrate_database(pkl_path, db_path):
-    with open(pkl_path, 'rb') as f:
-        database = pickle.load(f)
-
-    client = chromadb.PersistentClient(path=db_path)
-    collection = client.create_collection("scenario_snippets")
-
-    descriptions = []
-    metadatas = []
-    ids = []
-
-    for category in ['behavior', 'geometry', 'spawn']:
-        desc_list = database[category]['description']
-        code_list = database[category]['snippet']
-
-        for i, (desc, code) in enumerate(zip(desc_list, code_list)):
-            descriptions.append(desc)
-            metadatas.append({
-                'uid': f"{category}_{i:03d}",
-                'type': category,
-                'code': code
-            })
-            ids.append(f"{category}_{i:03d}")
-
-    collection.add(
-        documents=descriptions,
-        metadatas=metadatas,
-        ids=ids
-    )
+    # Upserts, so re-running against an existing knowledge base only re-embeds changed snippets.
+    migrate_legacy_uids(db_path)
+    return ingest_snippets(load_pickle_records(pkl_path), db_path)
 
 
 def main():
@@ -1,56 +1,691 @@
+import argparse
+import json
+import mmap
 import os
-import chromadb
+import sqlite3
+import threading
+from contextlib import closing
+import diskcache
+import numpy as np
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 db_path = os.path.join(script_dir, "scenic_codebase")
+COLLECTION_NAME = "scenario_snippets"
+RETRIEVER_BACKEND = os.environ.get("SCENIC_RETRIEVER_BACKEND", "chroma")
+SNIPPET_STORE_PATH = os.environ.get("SCENIC_SNIPPET_STORE", os.path.join(script_dir, "snippet_store"))
+SNIPPET_STORE_INDEX = "index.json"
+SNIPPET_STORE_BLOB = "snippets.bin"
+KB_VERSION_FILE = "kb_version.json"
+RETRIEVAL_CACHE_ENABLED = os.environ.get("SCENIC_RETRIEVAL_CACHE", "1") != "0"
+RETRIEVAL_CACHE_DIR = os.environ.get("SCENIC_RETRIEVAL_CACHE_DIR", os.path.join(script_dir, ".retrieval_cache"))
+RETRIEVAL_CACHE_SIZE_LIMIT = int(os.environ.get("SCENIC_RETRIEVAL_CACHE_SIZE_LIMIT", 64 * 1024 * 1024))
+PARITY_QUERIES = [
+    ("The adversarial cyclist suddenly swerves into the path of the ego vehicle.", "behavior"),
+    ("The adversarial car suddenly brakes as the ego approaches.", "behavior"),
+    ("A straight road.", "geometry"),
+    ("A four-way intersection.", "geometry"),
+    ("The adversarial agent is directly in front of the ego vehicle on the same straight road.", "spawn"),
+    ("A pedestrian crosses the road in front of the ego vehicle.", None)
+]
+PARITY_TIE_WINDOW = 5
 
 
-def search_snippets(query_text, category=None, limit=3):
-    client = chromadb.PersistentClient(path=db_path)
-    collection = client.get_collection("scenario_snippets")
+def normalize_query_text(text):
+    return " ".join(text.split())
 
-    where_filter = {"type": category} if category else None
 
-    results = collection.query(
-        query_texts=[query_text],
-        n_results=limit,
-        where=where_filter,
-        include=["documents", "metadatas", "distances"]
-    )
+def read_max_seq_id(path, collection_id):
+    sqlite_path = os.path.join(path, "chroma.sqlite3")
+    try:
+        with closing(sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True)) as connection:
+            row = connection.execute(
+                "SELECT MAX(e.seq_id) FROM embeddings e JOIN segments s ON e.segment_id = s.id "
+                "WHERE s.collection = ?",
+                (str(collection_id),)
+            ).fetchone()
+    except sqlite3.Error:
+        return None
+    seq_id = row[0] if row else None
+    return int.from_bytes(seq_id, "big") if isinstance(seq_id, bytes) else seq_id
 
-    snippets = []
-    for desc, meta, dist in zip(results['documents'][0], results['metadatas'][0], results['distances'][0]):
-        snippets.append({
-            'uid': meta['uid'],
-            'type': meta['type'],
-            'description': desc,
-            'code': meta['code'],
-            'similarity': 1 - dist
-        })
 
-    return snippets
+def kb_version_signature(path):
+    try:
+        stat = os.stat(os.path.join(path, KB_VERSION_FILE))
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
 
 
-def get_snippet_by_id(uid):
-    client = chromadb.PersistentClient(path=db_path)
-    collection = client.get_collection("scenario_snippets")
+def read_kb_version_counter(path):
+    try:
+        with open(os.path.join(path, KB_VERSION_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)["version"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def bump_kb_version(path):
+    # Ingestion bumps the counter after every change, so retrievers only re-read it when the file changes.
+    version = (read_kb_version_counter(path) or 0) + 1
+    marker = os.path.join(path, KB_VERSION_FILE)
+    with open(marker + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"version": version}, f)
+    os.replace(marker + ".tmp", marker)
+    return version
+
+
+class RetrievalCache:
+    def __init__(self, directory=RETRIEVAL_CACHE_DIR, size_limit=RETRIEVAL_CACHE_SIZE_LIMIT):
+        self._cache = diskcache.Cache(
+            directory,
+            size_limit=size_limit,
+            eviction_policy="least-recently-used",
+            tag_index=True
+        )
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'embedding_hits': 0,
+            'embedding_misses': 0,
+            'result_hits': 0,
+            'result_misses': 0
+        }
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def get_stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def sync_kb_version(self, kb_version):
+        previous_version = self._cache.get(("kb_version",))
+        if previous_version != kb_version:
+            if previous_version is not None:
+                self._cache.evict(tag=previous_version)
+            self._cache.set(("kb_version",), kb_version)
+
+    def get_embedding(self, text, model_name):
+        embedding = self._cache.get(("embedding", normalize_query_text(text), model_name))
+        self._count('embedding_hits' if embedding is not None else 'embedding_misses')
+        return embedding
+
+    def set_embedding(self, text, model_name, embedding):
+        self._cache.set(("embedding", normalize_query_text(text), model_name), np.asarray(embedding, dtype=np.float32))
+
+    def get_results(self, text, category, limit, kb_version):
+        snippets = self._cache.get(("results", normalize_query_text(text), category, limit, kb_version))
+        self._count('result_hits' if snippets is not None else 'result_misses')
+        return snippets
+
+    def set_results(self, text, category, limit, kb_version, snippets):
+        self._cache.set(
+            ("results", normalize_query_text(text), category, limit, kb_version),
+            snippets,
+            tag=kb_version
+        )
+
+    def clear(self):
+        self._cache.clear()
+
+
+class SnippetRetriever:
+    def __init__(self, path=db_path, collection_name=COLLECTION_NAME, cache=None):
+        self.path = path
+        self.collection_name = collection_name
+        self.cache = cache
+        self._open_lock = threading.Lock()
+        self._query_lock = threading.Lock()
+        self._client = None
+        self._collection = None
+        self._embedding_function = None
+        self._version_lock = threading.Lock()
+        self._kb_version = None
+        self._kb_version_signature = None
+
+    def _get_collection(self):
+        if self._collection is None:
+            with self._open_lock:
+                if self._collection is None:
+                    import chromadb
+                    from chromadb.utils import embedding_functions
+                    self._embedding_function = embedding_functions.DefaultEmbeddingFunction()
+                    self._client = chromadb.PersistentClient(path=self.path)
+                    self._collection = self._client.get_collection(
+                        self.collection_name,
+                        embedding_function=self._embedding_function
+                    )
+        return self._collection
+
+    def kb_version(self):
+        signature = kb_version_signature(self.path)
+        if self._kb_version is None or self._kb_version_signature != signature:
+            with self._version_lock:
+                if self._kb_version is None or self._kb_version_signature != signature:
+                    self._kb_version = self._read_kb_version()
+                    self._kb_version_signature = signature
+        return self._kb_version
+
+    def _read_kb_version(self):
+        collection = self._get_collection()
+        counter = read_kb_version_counter(self.path)
+        if counter is not None:
+            return f"{collection.id}:v{counter}"
+        # Knowledge bases written before the version counter existed are identified by their contents.
+        with self._query_lock:
+            count = collection.count()
+        return f"{collection.id}:{count}:{read_max_seq_id(self.path, collection.id)}"
+
+    def _get_embedding_function(self):
+        self._get_collection()
+        return self._embedding_function
+
+    def embedding_model_name(self):
+        embedding_function = self._get_embedding_function()
+        name = getattr(embedding_function, "name", None)
+        return name() if callable(name) else type(embedding_function).__name__
+
+    def embed_queries(self, query_texts):
+        embedding_function = self._get_embedding_function()
+        query_texts = list(query_texts)
+        if self.cache is None:
+            return embedding_function(query_texts)
+
+        model_name = self.embedding_model_name()
+        embeddings = [self.cache.get_embedding(text, model_name) for text in query_texts]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            missing_texts = list(dict.fromkeys(normalize_query_text(query_texts[i]) for i in missing))
+            computed = dict(zip(missing_texts, embedding_function(missing_texts)))
+            for text, embedding in computed.items():
+                self.cache.set_embedding(text, model_name, embedding)
+            for i in missing:
+                embeddings[i] = computed[normalize_query_text(query_texts[i])]
+        return embeddings
+
+    def search_snippets(self, query_text, category=None, limit=3):
+        return self.search_snippets_batch([(query_text, category, limit)])[0]
+
+    def search_snippets_batch(self, queries):
+        queries = [(text, category, limit) for text, category, limit in queries]
+        if not queries:
+            return []
+
+        results = [None] * len(queries)
+        pending = list(range(len(queries)))
+        if self.cache is not None:
+            kb_version = self.kb_version()
+            self.cache.sync_kb_version(kb_version)
+            pending = []
+            for i, (text, category, limit) in enumerate(queries):
+                cached = self.cache.get_results(text, category, limit, kb_version)
+                if cached is None:
+                    pending.append(i)
+                else:
+                    results[i] = cached
+            if not pending:
+                return results
+
+        unique_texts = list(dict.fromkeys(queries[i][0] for i in pending))
+        text_embeddings = dict(zip(unique_texts, self.embed_queries(unique_texts)))
+
+        category_groups = {}
+        for i in pending:
+            category_groups.setdefault(queries[i][1], []).append(i)
+
+        for category, indices in category_groups.items():
+            group_texts = list(dict.fromkeys(queries[i][0] for i in indices))
+            n_results = max(queries[i][2] for i in indices)
+            group_matches = self._query_embeddings(
+                [text_embeddings[text] for text in group_texts],
+                category,
+                n_results
+            )
+            matches_by_text = dict(zip(group_texts, group_matches))
+            for i in indices:
+                text, _, limit = queries[i]
+                results[i] = matches_by_text[text][:limit]
+                if self.cache is not None:
+                    self.cache.set_results(text, category, limit, kb_version, results[i])
+
+        return results
+
+    def _query_embeddings(self, query_embeddings, category, n_results):
+        collection = self._get_collection()
+        where_filter = {"type": category} if category else None
+
+        with self._query_lock:
+            results = collection.query(
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                where=where_filter,
+                include=["documents", "metadatas", "distances"]
+            )
+
+        all_snippets = []
+        for documents, metadatas, distances in zip(results['documents'], results['metadatas'], results['distances']):
+            snippets = []
+            for desc, meta, dist in zip(documents, metadatas, distances):
+                snippets.append({
+                    'uid': meta['uid'],
+                    'type': meta['type'],
+                    'description': desc,
+                    'code': meta['code'],
+                    'similarity': 1 - dist
+                })
+            all_snippets.append(snippets)
+
+        return all_snippets
+
+    def get_snippet_by_id(self, uid):
+        collection = self._get_collection()
+
+        with self._query_lock:
+            results = collection.get(
+                ids=[uid],
+                include=["documents", "metadatas"]
+            )
+
+        if results['documents']:
+            return {
+                'uid': uid,
+                'type': results['metadatas'][0]['type'],
+                'description': results['documents'][0],
+                'code': results['metadatas'][0]['code']
+            }
+        return None
+
+
+class NumpySnippetRetriever(SnippetRetriever):
+    def __init__(self, path=db_path, collection_name=COLLECTION_NAME, cache=None):
+        super().__init__(path, collection_name, cache)
+        self._index_lock = threading.Lock()
+        self._index_version = None
+        self._space = None
+        self._category_indexes = None
+        self._snippets_by_uid = None
+
+    def _get_category_indexes(self):
+        self.kb_version()
+        return self._category_indexes
+
+    def kb_version(self):
+        version = super().kb_version()
+        if self._index_version != version:
+            with self._index_lock:
+                if self._index_version != version:
+                    self._load_index()
+        return self._index_version
+
+    def _load_index(self):
+        collection = self._get_collection()
+        index_version = super().kb_version()
+        with self._query_lock:
+            records = collection.get(include=["embeddings", "documents", "metadatas"])
+
+        grouped = {}
+        snippets_by_uid = {}
+        for embedding, desc, meta in zip(records['embeddings'], records['documents'], records['metadatas']):
+            snippet = {
+                'uid': meta['uid'],
+                'type': meta['type'],
+                'description': desc,
+                'code': meta['code']
+            }
+            snippets_by_uid[meta['uid']] = snippet
+            for key in (meta['type'], None):
+                rows = grouped.setdefault(key, ([], []))
+                rows[0].append(embedding)
+                rows[1].append(snippet)
+
+        category_indexes = {}
+        for category, (embeddings, snippets) in grouped.items():
+            matrix = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32))
+            category_indexes[category] = {
+                'embeddings': matrix,
+                'squared_norms': np.einsum('ij,ij->i', matrix, matrix),
+                'snippets': snippets
+            }
+
+        self._space = collection_distance_space(collection)
+        self._index_version = index_version
+        self._snippets_by_uid = snippets_by_uid
+        self._category_indexes = category_indexes
+
+    def _query_embeddings(self, query_embeddings, category, n_results):
+        category_index = self._get_category_indexes().get(category)
+        if category_index is None:
+            return [[] for _ in query_embeddings]
+
+        queries = np.ascontiguousarray(np.asarray(query_embeddings, dtype=np.float32))
+        distances = compute_distances(
+            queries,
+            category_index['embeddings'],
+            category_index['squared_norms'],
+            self._space
+        )
+        top_indices = top_k_indices(distances, n_results)
+
+        all_snippets = []
+        for row, indices in enumerate(top_indices):
+            snippets = []
+            for index in indices:
+                snippet = dict(category_index['snippets'][index])
+                snippet['similarity'] = 1 - float(distances[row, index])
+                snippets.append(snippet)
+            all_snippets.append(snippets)
+
+        return all_snippets
+
+    def get_snippet_by_id(self, uid):
+        self._get_category_indexes()
+        snippet = self._snippets_by_uid.get(uid)
+        return dict(snippet) if snippet else None
+
 
-    results = collection.get(
-        ids=[uid],
-        include=["documents", "metadatas"]
-    )
+class MmapSnippetRetriever(SnippetRetriever):
+    # Serves an exported snippet store; embeddings, offsets and the text blob are memory-mapped read-only,
+    # so worker processes share the same pages and never open chroma.sqlite3.
+    def __init__(self, path=SNIPPET_STORE_PATH, collection_name=COLLECTION_NAME, cache=None):
+        super().__init__(path, collection_name, cache)
+        self._store = None
 
-    if results['documents']:
+    def _get_embedding_function(self):
+        if self._embedding_function is None:
+            with self._open_lock:
+                if self._embedding_function is None:
+                    from chromadb.utils import embedding_functions
+                    self._embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        return self._embedding_function
+
+    def _get_store(self):
+        if self._store is None:
+            with self._open_lock:
+                if self._store is None:
+                    self._store = open_snippet_store(self.path)
+        return self._store
+
+    def kb_version(self):
+        return self._get_store()['kb_version']
+
+    def _snippet(self, category, row):
+        store = self._get_store()
+        category_store = store['categories'][category]
+        blob = store['blob']
+        desc_offset, desc_length, code_offset, code_length = category_store['offsets'][row]
         return {
-            'uid': uid,
-            'type': results['metadatas'][0]['type'],
-            'description': results['documents'][0],
-            'code': results['metadatas'][0]['code']
+            'uid': category_store['uids'][row],
+            'type': category,
+            'description': blob[desc_offset:desc_offset + desc_length].decode("utf-8"),
+            'code': blob[code_offset:code_offset + code_length].decode("utf-8")
+        }
+
+    def _query_embeddings(self, query_embeddings, category, n_results):
+        store = self._get_store()
+        categories = [category] if category else list(store['categories'])
+        categories = [name for name in categories if name in store['categories']]
+        if not categories:
+            return [[] for _ in query_embeddings]
+
+        queries = np.ascontiguousarray(np.asarray(query_embeddings, dtype=np.float32))
+        distances = np.concatenate([
+            compute_distances(
+                queries,
+                store['categories'][name]['embeddings'],
+                store['categories'][name]['squared_norms'],
+                store['space']
+            )
+            for name in categories
+        ], axis=1)
+        starts = np.cumsum([0] + [len(store['categories'][name]['uids']) for name in categories])
+        top_indices = top_k_indices(distances, n_results)
+
+        all_snippets = []
+        for row, indices in enumerate(top_indices):
+            snippets = []
+            for index in indices:
+                owner = int(np.searchsorted(starts, index, side="right")) - 1
+                snippet = self._snippet(categories[owner], int(index - starts[owner]))
+                snippet['similarity'] = 1 - float(distances[row, index])
+                snippets.append(snippet)
+            all_snippets.append(snippets)
+
+        return all_snippets
+
+    def get_snippet_by_id(self, uid):
+        location = self._get_store()['uids'].get(uid)
+        return self._snippet(*location) if location else None
+
+
+def export_snippet_store(output_path=SNIPPET_STORE_PATH, path=db_path, collection_name=COLLECTION_NAME):
+    retriever = SnippetRetriever(path, collection_name)
+    collection = retriever._get_collection()
+    kb_version = retriever.kb_version()
+    records = collection.get(include=["embeddings", "documents", "metadatas"])
+
+    grouped = {}
+    for embedding, desc, meta in zip(records['embeddings'], records['documents'], records['metadatas']):
+        grouped.setdefault(meta['type'], []).append((meta['uid'], desc, meta['code'], embedding))
+
+    os.makedirs(output_path, exist_ok=True)
+    index = {
+        'kb_version': kb_version,
+        'space': collection_distance_space(collection),
+        'embedding_model': retriever.embedding_model_name(),
+        'categories': {}
+    }
+    blob_path = os.path.join(output_path, SNIPPET_STORE_BLOB)
+    with open(blob_path + ".tmp", "wb") as blob:
+        for category, rows in sorted(grouped.items()):
+            offsets = []
+            for _, desc, code, _ in rows:
+                row_offsets = []
+                for text in (desc, code):
+                    data = text.encode("utf-8")
+                    row_offsets.extend([blob.tell(), len(data)])
+                    blob.write(data)
+                offsets.append(row_offsets)
+
+            embeddings = np.ascontiguousarray(np.asarray([row[3] for row in rows], dtype=np.float32))
+            arrays = {
+                'embeddings': embeddings,
+                'squared_norms': np.einsum('ij,ij->i', embeddings, embeddings),
+                'offsets': np.asarray(offsets, dtype=np.int64)
+            }
+            for name, array in arrays.items():
+                with open(os.path.join(output_path, f"{category}.{name}.npy.tmp"), "wb") as f:
+                    np.save(f, array)
+                os.replace(os.path.join(output_path, f"{category}.{name}.npy.tmp"),
+                           os.path.join(output_path, f"{category}.{name}.npy"))
+            index['categories'][category] = {'uids': [row[0] for row in rows]}
+    os.replace(blob_path + ".tmp", blob_path)
+
+    # The index is written last, so readers never see it pointing at a partial export.
+    with open(os.path.join(output_path, SNIPPET_STORE_INDEX + ".tmp"), "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(os.path.join(output_path, SNIPPET_STORE_INDEX + ".tmp"), os.path.join(output_path, SNIPPET_STORE_INDEX))
+    return index
+
+
+def open_snippet_store(path=SNIPPET_STORE_PATH):
+    with open(os.path.join(path, SNIPPET_STORE_INDEX), "r", encoding="utf-8") as f:
+        index = json.load(f)
+    with open(os.path.join(path, SNIPPET_STORE_BLOB), "rb") as f:
+        blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+    categories = {}
+    uids = {}
+    for category, category_index in index['categories'].items():
+        categories[category] = {
+            name: np.load(os.path.join(path, f"{category}.{name}.npy"), mmap_mode="r")
+            for name in ('embeddings', 'squared_norms', 'offsets')
         }
-    return None
+        categories[category]['uids'] = category_index['uids']
+        uids.update((uid, (category, row)) for row, uid in enumerate(category_index['uids']))
+
+    return {
+        'kb_version': index['kb_version'],
+        'space': index['space'],
+        'embedding_model': index['embedding_model'],
+        'categories': categories,
+        'uids': uids,
+        'blob': blob
+    }
+
+
+def collection_distance_space(collection):
+    metadata = collection.metadata or {}
+    if "hnsw:space" in metadata:
+        return metadata["hnsw:space"]
+    configuration = getattr(collection, "configuration", None) or {}
+    hnsw_configuration = configuration.get("hnsw") or {}
+    return hnsw_configuration.get("space") or "l2"
+
+
+def compute_distances(queries, embeddings, squared_norms, space):
+    dot_products = queries @ embeddings.T
+    if space == "l2":
+        query_squared_norms = np.einsum('ij,ij->i', queries, queries)
+        return np.maximum(query_squared_norms[:, None] + squared_norms[None, :] - 2 * dot_products, 0)
+    if space == "ip":
+        return 1 - dot_products
+    if space == "cosine":
+        query_norms = np.linalg.norm(queries, axis=1)
+        norms = np.sqrt(squared_norms)
+        return 1 - dot_products / np.maximum(query_norms[:, None] * norms[None, :], 1e-12)
+    raise ValueError(f"Unsupported distance space: {space}")
+
+
+def top_k_indices(distances, k):
+    k = min(k, distances.shape[1])
+    if k <= 0:
+        return np.empty((distances.shape[0], 0), dtype=np.int64)
+    if k < distances.shape[1]:
+        candidates = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(distances.shape[1]), distances.shape)
+    order = np.argsort(np.take_along_axis(distances, candidates, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+RETRIEVER_BACKENDS = {
+    "chroma": SnippetRetriever,
+    "numpy": NumpySnippetRetriever,
+    "mmap": MmapSnippetRetriever
+}
+
+
+def create_retriever(backend=None, **kwargs):
+    backend = backend or RETRIEVER_BACKEND
+    if backend not in RETRIEVER_BACKENDS:
+        raise ValueError(f"Unknown retriever backend '{backend}', expected one of {sorted(RETRIEVER_BACKENDS)}")
+    return RETRIEVER_BACKENDS[backend](**kwargs)
+
+
+_default_retriever = None
+_default_retriever_lock = threading.Lock()
+
+
+def get_default_retriever():
+    global _default_retriever
+    if _default_retriever is None:
+        with _default_retriever_lock:
+            if _default_retriever is None:
+                cache = RetrievalCache() if RETRIEVAL_CACHE_ENABLED else None
+                _default_retriever = create_retriever(cache=cache)
+    return _default_retriever
+
+
+def search_snippets(query_text, category=None, limit=3):
+    return get_default_retriever().search_snippets(query_text, category, limit)
+
+
+def search_snippets_batch(queries):
+    return get_default_retriever().search_snippets_batch(queries)
+
+
+def get_snippet_by_id(uid):
+    return get_default_retriever().get_snippet_by_id(uid)
+
+
+def rankings_differ(expected, ranking, limit, tolerance):
+    # A differing uid is only accepted as a tie when chroma scores the backend's uid like its own, and the backend
+    # scores chroma's uid exactly like the one it returned; both rankings extend past the limit to show such ties.
+    expected_scores = {snippet['uid']: snippet['similarity'] for snippet in expected}
+    scores = {snippet['uid']: snippet['similarity'] for snippet in ranking}
+    if len(expected[:limit]) != len(ranking[:limit]):
+        return True
+    for expected_snippet, actual_snippet in zip(expected[:limit], ranking[:limit]):
+        if abs(expected_snippet['similarity'] - actual_snippet['similarity']) > tolerance:
+            return True
+        if expected_snippet['uid'] == actual_snippet['uid']:
+            continue
+        chroma_tie = actual_snippet['uid'] in expected_scores and \
+            abs(expected_scores[actual_snippet['uid']] - expected_snippet['similarity']) <= tolerance
+        backend_tie = scores.get(expected_snippet['uid']) == actual_snippet['similarity']
+        if not (chroma_tie and backend_tie):
+            return True
+    return False
+
+
+def embedding_parity_mismatches(chroma_retriever, backend_retriever, query_embeddings, category, limit=3,
+                                tolerance=1e-4):
+    expected = chroma_retriever._query_embeddings(query_embeddings, category, limit + PARITY_TIE_WINDOW)
+    rankings = backend_retriever._query_embeddings(query_embeddings, category, limit + PARITY_TIE_WINDOW)
+    return [
+        (i, [snippet['uid'] for snippet in expected[i][:limit]], [snippet['uid'] for snippet in rankings[i][:limit]])
+        for i in range(len(query_embeddings))
+        if rankings_differ(expected[i], rankings[i], limit, tolerance)
+    ]
+
+
+def check_backend_parity(queries=None, limit=3, tolerance=1e-4, backend="numpy"):
+    queries = queries or PARITY_QUERIES
+    chroma_retriever = create_retriever("chroma")
+    backend_retriever = create_retriever(backend)
+    query_embeddings = chroma_retriever.embed_queries([text for text, _ in queries])
+
+    mismatches = []
+    for (text, category), query_embedding in zip(queries, query_embeddings):
+        for _, expected_uids, actual_uids in embedding_parity_mismatches(
+            chroma_retriever, backend_retriever, [query_embedding], category, limit, tolerance
+        ):
+            mismatches.append({
+                'query': text,
+                'category': category,
+                'chroma': expected_uids,
+                backend: actual_uids
+            })
+    return mismatches
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Search the Scenic snippet knowledge base")
+    parser.add_argument("--parity", action="store_true", help="compare chroma with the numpy and mmap backends")
+    parser.add_argument("--export", nargs="?", const=SNIPPET_STORE_PATH, default=None, metavar="DIR",
+                        help="write the read-only memory-mapped snippet store used by the mmap backend")
+    args = parser.parse_args()
+
+    if args.export:
+        index = export_snippet_store(args.export)
+        print(f"Exported {sum(len(category['uids']) for category in index['categories'].values())} snippets "
+              f"to {args.export} ({index['kb_version']})")
+        return
+
+    if args.parity:
+        backends = ["numpy"]
+        if os.path.exists(os.path.join(SNIPPET_STORE_PATH, SNIPPET_STORE_INDEX)):
+            backends.append("mmap")
+        for backend in backends:
+            mismatches = check_backend_parity(backend=backend)
+            for mismatch in mismatches:
+                print(f"Mismatch for {mismatch['category']!r} query {mismatch['query']!r}: "
+                      f"chroma={mismatch['chroma']} {backend}={mismatch[backend]}")
+            print(f"Backend parity ({backend}): {len(PARITY_QUERIES) - len(mismatches)}/{len(PARITY_QUERIES)} "
+                  f"queries identical")
+        return
+
     results = search_snippets("The adversarial cyclist suddenly swerves into the path of the ego vehicle.", "behavior",
                               3)
     for snippet in results:
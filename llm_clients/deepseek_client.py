@@ -1,22 +1,52 @@
-from openai import OpenAI
 import json
 import os
+import threading
 
+MODEL_NAME = "deepseek-chat"
 config_path = os.path.join(os.path.dirname(__file__), "api_keys.json")
 
-with open(config_path, "r") as f:
-    config = json.load(f)
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
 
-client = OpenAI(
-    api_key=config["deepseek_api_key"],
-    base_url="https://api.deepseek.com"
-)
 
+def load_api_key():
+    with open(config_path, "r") as f:
+        return json.load(f)["deepseek_api_key"]
 
-def get_llm_response(prompt):
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI(
+                    api_key=load_api_key(),
+                    base_url="https://api.deepseek.com",
+                    max_retries=0
+                )
+    return _client
+
+
+def get_async_client():
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                from openai import AsyncOpenAI
+                _async_client = AsyncOpenAI(
+                    api_key=load_api_key(),
+                    base_url="https://api.deepseek.com",
+                    max_retries=0
+                )
+    return _async_client
+
+
+def get_llm_response(prompt, on_chunk=None):
     response = ""
-    completion = client.chat.completions.create(
-        model="deepseek-chat",
+    completion = get_client().chat.completions.create(
+        model=MODEL_NAME,
         messages=[{"role": "user", "content": prompt}],
         stream=True
     )
@@ -24,16 +54,39 @@ def get_llm_response(prompt):
     for chunk in completion:
         if chunk.choices[0].delta.content:
             content = chunk.choices[0].delta.content
-            print(content, end="", flush=True)
+            if on_chunk:
+                on_chunk(content)
             response += content
 
-    print()
+    return response
+
+
+async def stream_llm_response_async(prompt):
+    completion = await get_async_client().chat.completions.create(
+        model=MODEL_NAME,
+        messages=[{"role": "user", "content": prompt}],
+        stream=True
+    )
+
+    async for chunk in completion:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+async def get_llm_response_async(prompt, on_chunk=None):
+    response = ""
+    async for content in stream_llm_response_async(prompt):
+        if on_chunk:
+            on_chunk(content)
+        response += content
+
     return response
 
 
 def main():
     prompt = "Explain quantum computing in simple terms"
-    result = get_llm_response(prompt)
+    result = get_llm_response(prompt, on_chunk=lambda content: print(content, end="", flush=True))
+    print()
     print(f"\nComplete response length: {len(result)} characters")
 
 
@@ -1,35 +1,71 @@
-from google import genai
 import json
 import os
+import threading
 
+MODEL_NAME = "gemini-2.5-pro"
 config_path = os.path.join(os.path.dirname(__file__), "api_keys.json")
 
-with open(config_path, "r") as f:
-    config = json.load(f)
+_client = None
+_client_lock = threading.Lock()
 
-client = genai.Client(api_key=config["gemini_api_key"])
 
+def load_api_key():
+    with open(config_path, "r") as f:
+        return json.load(f)["gemini_api_key"]
 
-def get_llm_response(prompt):
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from google import genai
+                _client = genai.Client(api_key=load_api_key())
+    return _client
+
+
+def get_llm_response(prompt, on_chunk=None):
     response = ""
-    stream = client.models.generate_content_stream(
-        model='gemini-2.5-pro',
+    stream = get_client().models.generate_content_stream(
+        model=MODEL_NAME,
         contents=prompt
     )
 
     for chunk in stream:
         if chunk.text:
             content = chunk.text
-            print(content, end="", flush=True)
+            if on_chunk:
+                on_chunk(content)
             response += content
 
-    print()
+    return response
+
+
+async def stream_llm_response_async(prompt):
+    stream = await get_client().aio.models.generate_content_stream(
+        model=MODEL_NAME,
+        contents=prompt
+    )
+
+    async for chunk in stream:
+        if chunk.text:
+            yield chunk.text
+
+
+async def get_llm_response_async(prompt, on_chunk=None):
+    response = ""
+    async for content in stream_llm_response_async(prompt):
+        if on_chunk:
+            on_chunk(content)
+        response += content
+
     return response
 
 
 def main():
     prompt = "你谁啊"
-    result = get_llm_response(prompt)
+    result = get_llm_response(prompt, on_chunk=lambda content: print(content, end="", flush=True))
+    print()
     print(f"\nComplete response length: {len(result)} characters")
 
 
@@ -1,14 +1,38 @@
-from openai import OpenAI
+import os
+import threading
 
-SERVER_URL = "http://127.0.0.1:1234"
+SERVER_URL = os.environ.get("LOCAL_LLM_SERVER_URL", "http://127.0.0.1:1234")
+MODEL_NAME = "local-model"
 
-client = OpenAI(base_url=f"{SERVER_URL}/v1", api_key="not-needed")
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
 
 
-def get_llm_response(prompt):
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI(base_url=f"{SERVER_URL}/v1", api_key="not-needed", max_retries=0)
+    return _client
+
+
+def get_async_client():
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                from openai import AsyncOpenAI
+                _async_client = AsyncOpenAI(base_url=f"{SERVER_URL}/v1", api_key="not-needed", max_retries=0)
+    return _async_client
+
+
+def get_llm_response(prompt, on_chunk=None):
     response = ""
-    completion = client.chat.completions.create(
-        model="local-model",
+    completion = get_client().chat.completions.create(
+        model=MODEL_NAME,
         messages=[{"role": "user", "content": prompt}],
         stream=True
     )
@@ -16,16 +40,39 @@ def get_llm_response(prompt):
     for chunk in completion:
         if chunk.choices[0].delta.content:
             content = chunk.choices[0].delta.content
-            print(content, end="", flush=True)
+            if on_chunk:
+                on_chunk(content)
             response += content
 
-    print()
+    return response
+
+
+async def stream_llm_response_async(prompt):
+    completion = await get_async_client().chat.completions.create(
+        model=MODEL_NAME,
+        messages=[{"role": "user", "content": prompt}],
+        stream=True
+    )
+
+    async for chunk in completion:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+async def get_llm_response_async(prompt, on_chunk=None):
+    response = ""
+    async for content in stream_llm_response_async(prompt):
+        if on_chunk:
+            on_chunk(content)
+        response += content
+
     return response
 
 
 def main():
     prompt = "Explain quantum computing in simple terms"
-    result = get_llm_response(prompt)
+    result = get_llm_response(prompt, on_chunk=lambda content: print(content, end="", flush=True))
+    print()
     print(f"\nComplete response length: {len(result)} characters")
 
 
@@ -0,0 +1,266 @@
+import argparse
+import json
+import random
+import re
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 1234
+MOCK_MODEL_NAME = "mock-model"
+
+PROMPT_MARKERS = [
+    ("decomposition", "decompose full descriptions of safety-critical scenarios"),
+    ("integration", "You are an expert Scenic code integrator"),
+    ("behavior", "defining the adversarial behavior of an agent"),
+    ("geometry", "defining the geometry for the ego agent"),
+    ("spawn", "defining the spawn point for the adversarial agent")
+]
+
+ADVERSARIAL_OBJECT_KEYWORDS = [
+    ("Pedestrian", ("pedestrian", "walker", "person", "child")),
+    ("Bicycle", ("bicycle", "cyclist", "bike")),
+    ("Motorcycle", ("motorcycle", "motorcyclist", "motorbike"))
+]
+
+FALLBACK_SNIPPETS = {
+    "behavior": '''behavior AdvBehavior():
+    do FollowLaneBehavior(target_speed=globalParameters.OPT_ADV_SPEED) until (distance from self to ego) < globalParameters.OPT_BRAKE_DIST
+    while True:
+        take SetBrakeAction(globalParameters.OPT_BRAKE)
+
+param OPT_ADV_SPEED = Range(5, 10)
+param OPT_BRAKE_DIST = Range(5, 15)
+param OPT_BRAKE = Range(0.5, 1.0)''',
+    "geometry": '''Town = 'Town05'
+lane = Uniform(*network.lanes)
+egoTrajectory = lane.centerline
+egoSpawnPt = OrientedPoint on lane.centerline''',
+    "spawn": '''param OPT_GEO_Y_DISTANCE = Range(10, 20)
+ego = Car at egoSpawnPt,
+    with blueprint EGO_MODEL
+AdvAgent = {AdvObject} following roadDirection from ego for globalParameters.OPT_GEO_Y_DISTANCE,
+    with behavior AdvBehavior()'''
+}
+
+INTEGRATION_SECTIONS = ["SCENARIO DESCRIPTION", "SCENIC HEADER", "BEHAVIOR CODE", "GEOMETRY CODE", "SPAWN CODE"]
+
+
+def classify_prompt(prompt):
+    for prompt_type, marker in PROMPT_MARKERS:
+        if marker in prompt:
+            return prompt_type
+    return "unknown"
+
+
+def extract_after_label(prompt, label):
+    position = prompt.rfind(f"{label}:")
+    if position == -1:
+        return ""
+    return prompt[position + len(label) + 1:].strip().split("\n")[0].strip()
+
+
+def detect_adversarial_object(scenario):
+    lowered = scenario.lower()
+    for adversarial_object, keywords in ADVERSARIAL_OBJECT_KEYWORDS:
+        if any(keyword in lowered for keyword in keywords):
+            return adversarial_object
+    return "Car"
+
+
+def build_decomposition_response(prompt):
+    scenario = extract_after_label(prompt, "Scenario")
+    adversarial_object = detect_adversarial_object(scenario)
+    result = {
+        "success": bool(scenario),
+        "adversarial_object": adversarial_object if scenario else None,
+        "behavior": f"The adversarial {adversarial_object.lower()} suddenly brakes as the ego approaches." if scenario else None,
+        "geometry": "A straight road." if scenario else None,
+        "spawn_position": "The adversarial agent is directly in front of the ego vehicle on the same straight road, "
+                          "heading in the same direction." if scenario else None
+    }
+    return f"```json\n{json.dumps(result, indent=2)}\n```"
+
+
+def build_snippet_response(prompt, prompt_type):
+    match = re.search(r"--- Example 1 ---\nDescription: .*?\nSnippet: (.*?)\n={50}", prompt, re.DOTALL)
+    snippet = match.group(1).strip() if match else FALLBACK_SNIPPETS[prompt_type]
+    return f"```\n{snippet}\n```"
+
+
+def build_integration_response(prompt):
+    sections = {}
+    for index, name in enumerate(INTEGRATION_SECTIONS):
+        start = prompt.find(f"{name}:\n")
+        if start == -1:
+            continue
+        start += len(name) + 2
+        end = len(prompt)
+        for following in INTEGRATION_SECTIONS[index + 1:] + ["MAP INFORMATION", "INTEGRATION REQUIREMENTS"]:
+            position = prompt.find(f"\n{following}:\n", start)
+            if position != -1:
+                end = min(end, position)
+        sections[name] = prompt[start:end].strip()
+
+    parts = [f'"""{sections.get("SCENARIO DESCRIPTION", "")}"""']
+    parts.extend(sections.get(name, "") for name in INTEGRATION_SECTIONS[1:])
+    return "```\n" + "\n\n".join(part for part in parts if part) + "\n```"
+
+
+def build_mock_response(prompt):
+    prompt_type = classify_prompt(prompt)
+    if prompt_type == "decomposition":
+        return build_decomposition_response(prompt)
+    if prompt_type == "integration":
+        return build_integration_response(prompt)
+    if prompt_type in FALLBACK_SNIPPETS:
+        return build_snippet_response(prompt, prompt_type)
+    return "This is a mock response."
+
+
+def split_into_tokens(text):
+    return re.findall(r"\s*\S+|\s+", text)
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, time_to_first_token=0.0, tokens_per_second=0.0, error_rate=0.0,
+                 error_status=500, seed=None):
+        super().__init__(address, MockLLMRequestHandler)
+        self.time_to_first_token = time_to_first_token
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+
+
+class MockLLMRequestHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [{"id": MOCK_MODEL_NAME, "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        server = self.server
+
+        if server.random.random() < server.error_rate:
+            self._send_json(server.error_status, {
+                "error": {"message": "Simulated provider error", "type": "mock_error", "code": server.error_status}
+            })
+            return
+
+        prompt = "\n".join(
+            message.get("content", "") for message in request.get("messages", []) if message.get("role") == "user"
+        )
+        response = build_mock_response(prompt)
+        model = request.get("model", MOCK_MODEL_NAME)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+        if request.get("stream"):
+            self._stream_response(completion_id, model, response)
+        else:
+            time.sleep(server.time_to_first_token)
+            if server.tokens_per_second > 0:
+                time.sleep(len(split_into_tokens(response)) / server.tokens_per_second)
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": response},
+                    "finish_reason": "stop"
+                }]
+            })
+
+    def _write_event(self, payload):
+        data = payload if isinstance(payload, str) else json.dumps(payload)
+        self.wfile.write(f"data: {data}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _chunk(self, completion_id, model, delta, finish_reason=None):
+        return {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+
+    def _stream_response(self, completion_id, model, response):
+        server = self.server
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        try:
+            self._write_event(self._chunk(completion_id, model, {"role": "assistant", "content": ""}))
+            time.sleep(server.time_to_first_token)
+            for token in split_into_tokens(response):
+                self._write_event(self._chunk(completion_id, model, {"content": token}))
+                if server.tokens_per_second > 0:
+                    time.sleep(1 / server.tokens_per_second)
+            self._write_event(self._chunk(completion_id, model, {}, "stop"))
+            self._write_event("[DONE]")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def create_server(host=DEFAULT_HOST, port=DEFAULT_PORT, **options):
+    return MockLLMServer((host, port), **options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock LLM server for offline benchmarking")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--ttft", type=float, default=0.0, help="simulated time to first token in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="streaming rate, 0 for unlimited")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with an error")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status used for simulated errors")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = create_server(
+        args.host,
+        args.port,
+        time_to_first_token=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed
+    )
+    print(f"Mock LLM server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,44 @@
-from openai import OpenAI
 import json
+import os
+import threading
 
-with open("api_keys.json", "r") as f:
-    config = json.load(f)
+MODEL_NAME = "gpt-3.5-turbo"
+config_path = os.path.join(os.path.dirname(__file__), "api_keys.json")
 
-client = OpenAI(api_key=config["openai_api_key"])
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
 
 
-def get_llm_response(prompt):
+def load_api_key():
+    with open(config_path, "r") as f:
+        return json.load(f)["openai_api_key"]
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI(api_key=load_api_key(), max_retries=0)
+    return _client
+
+
+def get_async_client():
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                from openai import AsyncOpenAI
+                _async_client = AsyncOpenAI(api_key=load_api_key(), max_retries=0)
+    return _async_client
+
+
+def get_llm_response(prompt, on_chunk=None):
     response = ""
-    completion = client.chat.completions.create(
-        model="gpt-3.5-turbo",
+    completion = get_client().chat.completions.create(
+        model=MODEL_NAME,
         messages=[{"role": "user", "content": prompt}],
         stream=True
     )
@@ -18,16 +46,39 @@ def get_llm_response(prompt):
     for chunk in completion:
         if chunk.choices[0].delta.content:
             content = chunk.choices[0].delta.content
-            print(content, end="", flush=True)
+            if on_chunk:
+                on_chunk(content)
             response += content
 
-    print()
+    return response
+
+
+async def stream_llm_response_async(prompt):
+    completion = await get_async_client().chat.completions.create(
+        model=MODEL_NAME,
+        messages=[{"role": "user", "content": prompt}],
+        stream=True
+    )
+
+    async for chunk in completion:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+async def get_llm_response_async(prompt, on_chunk=None):
+    response = ""
+    async for content in stream_llm_response_async(prompt):
+        if on_chunk:
+            on_chunk(content)
+        response += content
+
     return response
 
 
 def main():
     prompt = "Write a short story about a robot learning to paint"
-    result = get_llm_response(prompt)
+    result = get_llm_response(prompt, on_chunk=lambda content: print(content, end="", flush=True))
+    print()
     print(f"\nComplete response length: {len(result)} characters")
 
 
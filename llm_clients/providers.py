@@ -0,0 +1,22 @@
+import importlib
+import os
+
+PROVIDERS = {
+    "deepseek": "llm_clients.deepseek_client",
+    "openai": "llm_clients.openai_client",
+    "gemini": "llm_clients.gemini_client",
+    "local": "llm_clients.local_client"
+}
+DEFAULT_PROVIDER = "deepseek"
+
+
+def get_provider_name(name=None):
+    name = name or os.environ.get("SCENIC_LLM_PROVIDER") or DEFAULT_PROVIDER
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider {name!r}, expected one of {', '.join(PROVIDERS)}")
+    return name
+
+
+def get_provider(name=None):
+    # Client modules only create their SDK client and read API keys on the first request.
+    return importlib.import_module(PROVIDERS[get_provider_name(name)])
@@ -0,0 +1,141 @@
+import functools
+import hashlib
+import json
+import os
+import threading
+import diskcache
+from llm_clients.scheduler import report_call
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+CACHE_MODES = ("off", "read_write", "replay")
+LLM_CACHE_MODE = os.environ.get("LLM_CACHE_MODE", "off")
+LLM_CACHE_DIR = os.environ.get("LLM_CACHE_DIR", os.path.join(script_dir, ".response_cache"))
+LLM_CACHE_SIZE_LIMIT = int(os.environ.get("LLM_CACHE_SIZE_LIMIT", 512 * 1024 * 1024))
+
+
+class LLMCacheMissError(RuntimeError):
+    pass
+
+
+def response_cache_key(provider, model, prompt, sampling_params=None):
+    payload = json.dumps(
+        {
+            "provider": provider,
+            "model": model,
+            "prompt": prompt,
+            "sampling_params": sampling_params or {}
+        },
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    def __init__(self, directory=LLM_CACHE_DIR, size_limit=LLM_CACHE_SIZE_LIMIT, mode="read_write"):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown LLM cache mode '{mode}', expected one of {CACHE_MODES}")
+        self.mode = mode
+        self._cache = diskcache.Cache(directory, size_limit=size_limit, eviction_policy="least-recently-used")
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def get(self, key):
+        return self.get_first([key])
+
+    def get_first(self, keys):
+        response = next((response for response in map(self._cache.get, keys) if response is not None), None)
+        with self._stats_lock:
+            self._stats['hits' if response is not None else 'misses'] += 1
+        return response
+
+    def set(self, key, response):
+        if self.mode == "read_write":
+            self._cache.set(key, response)
+
+    def get_stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def clear(self):
+        self._cache.clear()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_response_cache():
+    global _default_cache
+    if LLM_CACHE_MODE == "off":
+        return None
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = LLMResponseCache(mode=LLM_CACHE_MODE)
+    return _default_cache
+
+
+def _candidate_keys(provider, model, prompt, sampling_params, router, stage):
+    if router is None or not router.is_routed():
+        return [(provider, model, response_cache_key(provider, model, prompt, sampling_params))]
+    return [
+        (name, router.model_name(name), response_cache_key(name, router.model_name(name), prompt, sampling_params))
+        for name in router.route(stage or "default")
+    ]
+
+
+def _lookup(response_cache, candidates):
+    response = response_cache.get_first([key for _, _, key in candidates])
+    if response is None and response_cache.mode == "replay":
+        provider, model, key = candidates[0]
+        raise LLMCacheMissError(f"No cached {provider}/{model} response for prompt {key[:12]} in replay mode")
+    return response
+
+
+def _answer_key(provider, model, prompt, sampling_params, router):
+    # Routed answers are cached under the provider that produced them, not the primary.
+    answered_by = router.last_answered_by() if router is not None and router.is_routed() else None
+    if answered_by is not None and answered_by != provider:
+        return response_cache_key(answered_by, router.model_name(answered_by), prompt, sampling_params)
+    return response_cache_key(provider, model, prompt, sampling_params)
+
+
+def cached_llm_response(get_llm_response, provider, model, sampling_params=None, cache=None, router=None):
+    @functools.wraps(get_llm_response)
+    def cached_get_llm_response(prompt, **kwargs):
+        response_cache = cache or get_default_response_cache()
+        if response_cache is None or response_cache.mode == "off":
+            return get_llm_response(prompt, **kwargs)
+
+        candidates = _candidate_keys(provider, model, prompt, sampling_params, router, kwargs.get("stage"))
+        response = _lookup(response_cache, candidates)
+        if response is not None:
+            report_call(cached=True)
+            return response
+
+        response = get_llm_response(prompt, **kwargs)
+        response_cache.set(_answer_key(provider, model, prompt, sampling_params, router), response)
+        return response
+
+    return cached_get_llm_response
+
+
+def cached_llm_response_async(get_llm_response_async, provider, model, sampling_params=None, cache=None, router=None):
+    @functools.wraps(get_llm_response_async)
+    async def cached_get_llm_response_async(prompt, **kwargs):
+        response_cache = cache or get_default_response_cache()
+        if response_cache is None or response_cache.mode == "off":
+            return await get_llm_response_async(prompt, **kwargs)
+
+        candidates = _candidate_keys(provider, model, prompt, sampling_params, router, kwargs.get("stage"))
+        response = _lookup(response_cache, candidates)
+        if response is not None:
+            report_call(cached=True)
+            return response
+
+        response = await get_llm_response_async(prompt, **kwargs)
+        response_cache.set(_answer_key(provider, model, prompt, sampling_params, router), response)
+        return response
+
+    return cached_get_llm_response_async
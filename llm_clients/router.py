@@ -0,0 +1,209 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import queue
+import threading
+from collections import deque
+from llm_clients.providers import get_provider, get_provider_name
+from llm_clients.scheduler import get_call_report, get_scheduler, report_call, reporting_to, scheduled_llm_response
+
+DEFAULT_HEDGE_SECONDS = 10.0
+FAILOVER_RETRIES = int(os.environ.get("SCENIC_LLM_FAILOVER_RETRIES", 1))
+ROUTED_STAGES = ("decomposition", "behavior", "geometry", "spawn", "integration")
+
+logger = logging.getLogger("scenic_generation.router")
+_DONE = object()
+_answered_by = contextvars.ContextVar("llm_router_answered_by", default=None)
+
+
+def parse_route(value):
+    return [get_provider_name(name.strip()) for name in value.split(",") if name.strip()]
+
+
+def route_config_from_environment(primary):
+    routes = {"default": parse_route(os.environ.get("SCENIC_LLM_ROUTE", primary))}
+    hedge_after = {"default": float(os.environ.get("SCENIC_LLM_HEDGE_SECONDS", DEFAULT_HEDGE_SECONDS))}
+    for stage in ROUTED_STAGES:
+        route = os.environ.get(f"SCENIC_LLM_ROUTE_{stage.upper()}")
+        if route:
+            routes[stage] = parse_route(route)
+        hedge = os.environ.get(f"SCENIC_LLM_HEDGE_SECONDS_{stage.upper()}")
+        if hedge is not None:
+            hedge_after[stage] = float(hedge)
+    return routes, hedge_after
+
+
+class LLMRouter:
+    # Chunks only ever come from one provider: the first to stream a token wins and the others are cancelled.
+    # Hedging and failover only happen before that first token.
+    def __init__(self, routes, hedge_after=None, failover_retries=FAILOVER_RETRIES):
+        self.routes = routes
+        self.hedge_after = hedge_after or {}
+        self.failover_retries = failover_retries
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+
+    def route(self, stage):
+        return self.routes.get(stage) or self.routes["default"]
+
+    def hedge_deadline(self, stage):
+        deadline = self.hedge_after.get(stage, self.hedge_after.get("default"))
+        return deadline if deadline and deadline > 0 else None
+
+    def model_name(self, provider):
+        return get_provider(provider).MODEL_NAME
+
+    def last_answered_by(self):
+        # The provider whose answer the current thread or task received from its latest routed call.
+        return _answered_by.get()
+
+    def is_routed(self):
+        return any(len(route) > 1 for route in self.routes.values())
+
+    def _record(self, stage, **counts):
+        with self._stats_lock:
+            stats = self._stats.setdefault(stage, {'calls': 0, 'hedges': 0, 'hedge_wins': 0, 'failovers': 0,
+                                                    'failed_after_first_chunk': 0, 'wins': {}})
+            for key, value in counts.items():
+                if key == 'winner':
+                    stats['wins'][value] = stats['wins'].get(value, 0) + 1
+                else:
+                    stats[key] += value
+
+    def get_stats(self):
+        with self._stats_lock:
+            return {stage: dict(stats, wins=dict(stats['wins'])) for stage, stats in self._stats.items()}
+
+    async def _call_provider(self, provider, prompt, stage, on_chunk, last):
+        client = get_provider(provider)
+        scheduler = get_scheduler(provider)
+        max_retries = None if last else self.failover_retries
+        return await scheduler.call_async(client.get_llm_response_async, prompt, stage=stage,
+                                          max_retries=max_retries, on_chunk=on_chunk)
+
+    async def get_llm_response_async(self, prompt, stage=None, on_chunk=None):
+        provider, response = await self._route_async(prompt, stage=stage, on_chunk=on_chunk)
+        _answered_by.set(provider)
+        return response
+
+    async def _route_async(self, prompt, stage=None, on_chunk=None):
+        stage_name = stage or "default"
+        remaining = deque(self.route(stage_name))
+        hedge_deadline = self.hedge_deadline(stage_name)
+        running = {}
+        state = {'leader': None, 'hedged': False, 'error': None}
+        self._record(stage_name, calls=1)
+
+        def launch():
+            provider = remaining.popleft()
+
+            def forward(content):
+                if state['leader'] is None:
+                    state['leader'] = provider
+                    for task, other in running.items():
+                        if other != provider:
+                            task.cancel()
+                if state['leader'] == provider and on_chunk:
+                    on_chunk(content)
+
+            task = asyncio.ensure_future(self._call_provider(provider, prompt, stage, forward, not remaining))
+            running[task] = provider
+
+        launch()
+        while running:
+            hedge_due = hedge_deadline is not None and remaining and not state['hedged'] and state['leader'] is None
+            done, _ = await asyncio.wait(list(running), timeout=hedge_deadline if hedge_due else None,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                state['hedged'] = True
+                self._record(stage_name, hedges=1)
+                logger.info(f"  • No first token from {', '.join(running.values())} after {hedge_deadline:g}s, "
+                            f"hedging with {remaining[0]}...")
+                launch()
+                continue
+
+            for task in done:
+                provider = running.pop(task)
+                if task.cancelled():
+                    continue
+                if task.exception() is None:
+                    for other in running:
+                        other.cancel()
+                    hedge_won = state['hedged'] and provider != self.route(stage_name)[0]
+                    self._record(stage_name, winner=provider, hedge_wins=int(hedge_won))
+                    report_call(provider=provider)
+                    return provider, task.result()
+
+                state['error'] = task.exception()
+                if state['leader'] == provider:
+                    # Its chunks have already reached on_chunk, so another provider's answer cannot follow them.
+                    self._record(stage_name, failed_after_first_chunk=1)
+                    logger.warning(f"LLM provider {provider} failed for stage {stage_name} after streaming "
+                                   f"({state['error']}), not failing over")
+                    raise state['error']
+                if not running and remaining:
+                    self._record(stage_name, failovers=1)
+                    logger.warning(f"LLM provider {provider} failed for stage {stage_name} ({state['error']}), "
+                                   f"failing over to {remaining[0]}")
+                    launch()
+        raise state['error']
+
+    def _get_loop(self):
+        if self._loop is None:
+            with self._loop_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="llm-router", daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def get_llm_response(self, prompt, stage=None, on_chunk=None):
+        # Chunks are handed back to the calling thread so per-task output capture keeps working.
+        chunks = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            reporting_to(get_call_report(), self._route_async(prompt, stage=stage, on_chunk=chunks.put)),
+            self._get_loop()
+        )
+        future.add_done_callback(lambda _: chunks.put(_DONE))
+        while True:
+            content = chunks.get()
+            if content is _DONE:
+                break
+            if on_chunk:
+                on_chunk(content)
+        provider, response = future.result()
+        _answered_by.set(provider)
+        return response
+
+
+_default_router = None
+_default_router_lock = threading.Lock()
+
+
+def get_default_router(primary=None):
+    global _default_router
+    if _default_router is None:
+        with _default_router_lock:
+            if _default_router is None:
+                _default_router = LLMRouter(*route_config_from_environment(get_provider_name(primary)))
+    return _default_router
+
+
+def get_router_stats():
+    return _default_router.get_stats() if _default_router is not None else {}
+
+
+def routed_llm_response(get_llm_response, provider):
+    router = get_default_router(provider)
+    if not router.is_routed():
+        return scheduled_llm_response(get_llm_response, provider)
+
+    @functools.wraps(get_llm_response)
+    def routed_get_llm_response(prompt, stage=None, **kwargs):
+        return router.get_llm_response(prompt, stage=stage, **kwargs)
+
+    return routed_get_llm_response
@@ -0,0 +1,348 @@
+import asyncio
+import contextvars
+import functools
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+DEFAULT_PROVIDER_LIMITS = {
+    "deepseek": {"requests_per_minute": 300, "tokens_per_minute": 1000000},
+    "openai": {"requests_per_minute": 500, "tokens_per_minute": 200000},
+    "gemini": {"requests_per_minute": 150, "tokens_per_minute": 2000000},
+    "local": {"requests_per_minute": None, "tokens_per_minute": None}
+}
+MAX_RETRIES = 5
+BASE_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+CHARS_PER_TOKEN = 4
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+_call_report = contextvars.ContextVar("llm_call_report", default=None)
+
+
+@contextmanager
+def llm_call_report():
+    # The cache, router and scheduler wrappers record what happened to the call made inside this block.
+    report = {'cached': False, 'provider': None, 'calls': {}}
+    token = _call_report.set(report)
+    try:
+        yield report
+    finally:
+        _call_report.reset(token)
+
+
+def get_call_report():
+    return _call_report.get()
+
+
+def report_call(**fields):
+    report = _call_report.get()
+    if report is not None:
+        report.update(fields)
+
+
+async def reporting_to(report, awaitable):
+    # Coroutines handed to another event loop do not inherit the caller's context, so the report is passed along.
+    _call_report.set(report)
+    return await awaitable
+
+
+def estimate_tokens(text):
+    return max(1, len(text or "") // CHARS_PER_TOKEN)
+
+
+def count_forwarded_chunks(kwargs):
+    # A retry cannot take back chunks already handed to on_chunk, so attempts that streamed are not retried.
+    forwarded = [0]
+    on_chunk = kwargs.get("on_chunk")
+    if on_chunk is None:
+        return kwargs, forwarded
+
+    def counting_on_chunk(content):
+        forwarded[0] += 1
+        on_chunk(content)
+
+    return dict(kwargs, on_chunk=counting_on_chunk), forwarded
+
+
+def error_status_code(error):
+    for attribute in ("status_code", "code"):
+        status = getattr(error, attribute, None)
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def is_retryable_error(error):
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    openai = sys.modules.get("openai")
+    if openai is not None and isinstance(error, openai.APIConnectionError):
+        return True
+    status = error_status_code(error)
+    return status is not None and (status in RETRYABLE_STATUS_CODES or status >= 500)
+
+
+def retry_after_seconds(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, retry_after=None):
+    delay = random.uniform(0, min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** attempt))
+    return max(delay, retry_after or 0)
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount):
+        self._refill()
+        self.tokens -= amount
+
+    def refund(self, amount):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ProviderScheduler:
+    def __init__(self, provider, requests_per_minute=None, tokens_per_minute=None, max_retries=MAX_RETRIES):
+        self.provider = provider
+        self.max_retries = max_retries
+        self._request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._condition = threading.Condition()
+        self._stage_queues = {}
+        self._stage_order = deque()
+        self._stats = {}
+
+    def _wait_time(self, tokens):
+        waits = [0.0]
+        if self._request_bucket:
+            waits.append(self._request_bucket.wait_time(1))
+        if self._token_bucket:
+            waits.append(self._token_bucket.wait_time(tokens))
+        return max(waits)
+
+    def _is_next(self, ticket):
+        return bool(self._stage_order) and self._stage_queues[self._stage_order[0]][0] is ticket
+
+    def _leave_queue(self, stage, ticket):
+        queue = self._stage_queues[stage]
+        queue.remove(ticket)
+        if not queue:
+            self._stage_order.remove(stage)
+        self._condition.notify_all()
+
+    def acquire(self, stage, tokens, acquisition=None):
+        start_time = time.perf_counter()
+        ticket = object()
+        with self._condition:
+            queue = self._stage_queues.setdefault(stage, deque())
+            queue.append(ticket)
+            if stage not in self._stage_order:
+                self._stage_order.append(stage)
+
+            while True:
+                if acquisition is not None and acquisition['cancelled']:
+                    self._leave_queue(stage, ticket)
+                    return None
+                if self._is_next(ticket):
+                    wait = self._wait_time(tokens)
+                    if wait <= 0:
+                        break
+                    self._condition.wait(wait)
+                else:
+                    self._condition.wait()
+
+            if self._request_bucket:
+                self._request_bucket.consume(1)
+            if self._token_bucket:
+                self._token_bucket.consume(tokens)
+            if acquisition is not None:
+                acquisition['granted'] = True
+            queue.popleft()
+            self._stage_order.popleft()
+            if queue:
+                self._stage_order.append(stage)
+            self._condition.notify_all()
+
+        return time.perf_counter() - start_time
+
+    def cancel_acquisition(self, acquisition, tokens):
+        # A waiting acquisition leaves the queue; one granted after its caller was cancelled gives the budget back.
+        with self._condition:
+            acquisition['cancelled'] = True
+            if acquisition['granted']:
+                if self._request_bucket:
+                    self._request_bucket.refund(1)
+                if self._token_bucket:
+                    self._token_bucket.refund(tokens)
+            self._condition.notify_all()
+
+    async def acquire_async(self, stage, tokens):
+        acquisition = {'cancelled': False, 'granted': False}
+        try:
+            return await asyncio.to_thread(self.acquire, stage, tokens, acquisition)
+        except asyncio.CancelledError:
+            self.cancel_acquisition(acquisition, tokens)
+            raise
+
+    def debit_tokens(self, tokens):
+        if self._token_bucket:
+            with self._condition:
+                self._token_bucket.consume(tokens)
+
+    def _record(self, stage, queue_wait=0.0, generation=0.0, retried=False, failed=False):
+        with self._condition:
+            stats = self._stats.setdefault(stage, {
+                'calls': 0,
+                'retries': 0,
+                'errors': 0,
+                'queue_wait_seconds': 0.0,
+                'generation_seconds': 0.0
+            })
+            stats['calls'] += not retried
+            stats['retries'] += retried
+            stats['errors'] += failed
+            stats['queue_wait_seconds'] += queue_wait
+            stats['generation_seconds'] += generation
+
+    def get_stats(self):
+        with self._condition:
+            return {stage: dict(stats) for stage, stats in self._stats.items()}
+
+    def _report_attempt(self, stage, attempt, queue_wait_seconds, generation_started, generation_seconds=None):
+        # Each attempt overwrites the previous one, so the generation clock starts after the final acquisition.
+        report = _call_report.get()
+        if report is not None:
+            report['calls'][self.provider] = {
+                'stage': stage,
+                'attempts': attempt + 1,
+                'queue_wait_seconds': queue_wait_seconds,
+                'generation_started': generation_started,
+                'generation_seconds': generation_seconds
+            }
+
+    def call(self, get_llm_response, prompt, stage=None, max_retries=None, **kwargs):
+        stage = stage or "default"
+        max_retries = self.max_retries if max_retries is None else max_retries
+        estimated_tokens = estimate_tokens(prompt)
+        kwargs, forwarded = count_forwarded_chunks(kwargs)
+        total_queue_wait = 0.0
+
+        for attempt in range(max_retries + 1):
+            queue_wait = self.acquire(stage, estimated_tokens)
+            total_queue_wait += queue_wait
+            start_time = time.perf_counter()
+            self._report_attempt(stage, attempt, total_queue_wait, start_time)
+            try:
+                response = get_llm_response(prompt, **kwargs)
+            except Exception as e:
+                generation = time.perf_counter() - start_time
+                if attempt >= max_retries or forwarded[0] or not is_retryable_error(e):
+                    self._record(stage, queue_wait, generation, failed=True)
+                    raise
+                self._record(stage, queue_wait, generation, retried=True)
+                time.sleep(backoff_delay(attempt, retry_after_seconds(e)))
+                continue
+
+            generation = time.perf_counter() - start_time
+            self.debit_tokens(estimate_tokens(response))
+            self._record(stage, queue_wait, generation)
+            self._report_attempt(stage, attempt, total_queue_wait, start_time, generation)
+            return response
+
+    async def call_async(self, get_llm_response_async, prompt, stage=None, max_retries=None, **kwargs):
+        stage = stage or "default"
+        max_retries = self.max_retries if max_retries is None else max_retries
+        estimated_tokens = estimate_tokens(prompt)
+        kwargs, forwarded = count_forwarded_chunks(kwargs)
+        total_queue_wait = 0.0
+
+        for attempt in range(max_retries + 1):
+            queue_wait = await self.acquire_async(stage, estimated_tokens)
+            total_queue_wait += queue_wait
+            start_time = time.perf_counter()
+            self._report_attempt(stage, attempt, total_queue_wait, start_time)
+            try:
+                response = await get_llm_response_async(prompt, **kwargs)
+            except Exception as e:
+                generation = time.perf_counter() - start_time
+                if attempt >= max_retries or forwarded[0] or not is_retryable_error(e):
+                    self._record(stage, queue_wait, generation, failed=True)
+                    raise
+                self._record(stage, queue_wait, generation, retried=True)
+                await asyncio.sleep(backoff_delay(attempt, retry_after_seconds(e)))
+                continue
+
+            generation = time.perf_counter() - start_time
+            self.debit_tokens(estimate_tokens(response))
+            self._record(stage, queue_wait, generation)
+            self._report_attempt(stage, attempt, total_queue_wait, start_time, generation)
+            return response
+
+
+def provider_limits(provider):
+    limits = dict(DEFAULT_PROVIDER_LIMITS.get(provider, {}))
+    for key, variable in (("requests_per_minute", "RPM"), ("tokens_per_minute", "TPM")):
+        value = os.environ.get(f"LLM_{variable}_{provider.upper()}")
+        if value is not None:
+            limits[key] = int(value) or None
+    return limits
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(provider):
+    with _schedulers_lock:
+        if provider not in _schedulers:
+            _schedulers[provider] = ProviderScheduler(provider, **provider_limits(provider))
+        return _schedulers[provider]
+
+
+def get_all_scheduler_stats():
+    with _schedulers_lock:
+        schedulers = dict(_schedulers)
+    return {provider: scheduler.get_stats() for provider, scheduler in schedulers.items()}
+
+
+def scheduled_llm_response(get_llm_response, provider):
+    @functools.wraps(get_llm_response)
+    def scheduled_get_llm_response(prompt, stage=None, **kwargs):
+        return get_scheduler(provider).call(get_llm_response, prompt, stage=stage, **kwargs)
+
+    return scheduled_get_llm_response
+
+
+def scheduled_llm_response_async(get_llm_response_async, provider):
+    @functools.wraps(get_llm_response_async)
+    async def scheduled_get_llm_response_async(prompt, stage=None, **kwargs):
+        return await get_scheduler(provider).call_async(get_llm_response_async, prompt, stage=stage, **kwargs)
+
+    return scheduled_get_llm_response_async
@@ -1,7 +1,18 @@
 import json
+import os
 from pathlib import Path
-from chroma_database.scenic_retriever import search_snippets
-from llm_clients.deepseek_client import get_llm_response
+from chroma_database.scenic_retriever import get_default_retriever
+from llm_clients.providers import get_provider, get_provider_name
+from llm_clients.response_cache import cached_llm_response
+from llm_clients.router import get_default_router, routed_llm_response
+from concurrent_generation import ConcurrentTasks, raise_if_cancelled, run_concurrently
+from local_integrator import IntegrationConflict, integrate_locally
+from decomposition_cache import get_default_decomposition_cache
+from prompt_budget import PROMPT_TOKEN_BUDGETS, compile_prompt_template, fit_snippets
+from short_circuit import record_generation, select_stored_snippet
+from streaming_json import IncrementalJsonObjectParser
+from tracing import current_span, scenario, span, timed_span, traced, traced_llm_response
+from verbosity import configure_verbosity, echoed_llm_response, get_logger, write_output
 from scenic_validator import validate_scenic_code
 
 BASE_DIR = Path(__file__).parent.parent
@@ -10,6 +21,39 @@ GEOMETRY_PROMPT_PATH = BASE_DIR / "prompts" / "geometry.txt"
 SPAWN_PROMPT_PATH = BASE_DIR / "prompts" / "spawn.txt"
 SCENARIO_DECOMPOSITION_PATH = BASE_DIR / "prompts" / "decomposition.txt"
 CODE_INTEGRATION_PROMPT_PATH = BASE_DIR / "prompts" / "integration.txt"
+COMPONENT_REPAIR_PROMPT_PATH = BASE_DIR / "prompts" / "repair.txt"
+CATEGORY_PROMPT_PATHS = {
+    "behavior": BEHAVIOR_PROMPT_PATH,
+    "geometry": GEOMETRY_PROMPT_PATH,
+    "spawn": SPAWN_PROMPT_PATH
+}
+CATEGORY_DECOMPOSITION_KEYS = {
+    "behavior": "behavior",
+    "geometry": "geometry",
+    "spawn": "spawn_position"
+}
+DECOMPOSITION_CATEGORY_TYPES = {
+    decomposition_key: category_type for category_type, decomposition_key in CATEGORY_DECOMPOSITION_KEYS.items()
+}
+CODE_GENERATION_MAX_WORKERS = 3
+CATEGORY_GENERATION_RETRIES = 1
+REPAIR_MAX_ATTEMPTS = 2
+MISSING_EGO_ERROR = "did not specify ego object"
+INTEGRATION_MODE = os.environ.get("SCENIC_INTEGRATION_MODE", "local")
+LLM_PROVIDER = get_provider_name()
+
+llm_client = get_provider(LLM_PROVIDER)
+get_llm_response = echoed_llm_response(traced_llm_response(
+    cached_llm_response(
+        routed_llm_response(llm_client.get_llm_response, LLM_PROVIDER),
+        LLM_PROVIDER,
+        llm_client.MODEL_NAME,
+        router=get_default_router(LLM_PROVIDER)
+    ),
+    LLM_PROVIDER,
+    llm_client.MODEL_NAME
+))
+logger = get_logger("auto_scenario_generator")
 
 
 class Colors:
@@ -24,20 +68,19 @@ class Colors:
     END = '\033[0m'
 
 
-def print_step(step_name, color=Colors.BLUE):
-    print(f"{color}{Colors.BOLD}[{step_name}]{Colors.END}")
+def log_step(step_name, color=Colors.BLUE):
+    logger.info(f"{color}{Colors.BOLD}[{step_name}]{Colors.END}")
 
 
-def print_success(message, color=Colors.GREEN):
-    print(f"{color}✓ {message}{Colors.END}")
+def log_success(message, color=Colors.GREEN):
+    logger.info(f"{color}✓ {message}{Colors.END}")
 
 
 def load_prompt_template(prompt_path):
     try:
-        with open(prompt_path, "r", encoding="utf-8") as f:
-            return f.read()
+        return compile_prompt_template(prompt_path)
     except Exception as e:
-        print(f"{Colors.RED}✗ Failed to load prompt template {prompt_path}: {e}{Colors.END}")
+        logger.error(f"{Colors.RED}✗ Failed to load prompt template {prompt_path}: {e}{Colors.END}")
         raise
 
 
@@ -65,27 +108,42 @@ def extract_code_between_backticks(text):
     return code.strip()
 
 
-def decompose_scenario(scenario):
+def decompose_scenario(scenario, on_field=None):
     try:
-        print("Loading prompt template...")
+        logger.debug("Loading prompt template...")
         prompt_template = load_prompt_template(SCENARIO_DECOMPOSITION_PATH)
-        full_prompt = prompt_template.replace("{scenario}", scenario)
+        full_prompt = prompt_template.render(scenario=scenario)
 
-        print("\nSending request to LLM...")
-        response = get_llm_response(full_prompt)
-        print(f"Model response:\n{response}")
+        decomposition_cache = get_default_decomposition_cache()
+        if decomposition_cache is not None:
+            cached_result, match, similarity = decomposition_cache.lookup(
+                scenario, prompt_template.text, LLM_PROVIDER, llm_client.MODEL_NAME)
+            current_span().set_attribute("decomposition_cache", match or "miss")
+            if cached_result is not None:
+                logger.debug(f"Reusing {match} decomposition cache match (similarity {similarity:.3f})")
+                return cached_result
 
-        print("\nCleaning and parsing JSON...")
+        logger.debug("Sending request to LLM...")
+        field_parser = IncrementalJsonObjectParser()
+
+        def report_fields(content):
+            for key, value in field_parser.feed(content):
+                on_field(key, value)
+
+        response = get_llm_response(full_prompt, stage="decomposition", on_chunk=report_fields if on_field else None)
+        logger.debug(f"Model response:\n{response}")
+
+        logger.debug("Cleaning and parsing JSON...")
         cleaned_response = clean_json_response(response)
         try:
             result_json = json.loads(cleaned_response)
-            print(f"Raw JSON data:\n{json.dumps(result_json, indent=2)}")
+            logger.debug(f"Raw JSON data:\n{json.dumps(result_json, indent=2)}")
         except json.JSONDecodeError as e:
-            print(f"{Colors.RED}Failed - Response is not valid JSON: {e}{Colors.END}")
+            logger.error(f"{Colors.RED}Failed - Response is not valid JSON: {e}{Colors.END}")
             return None
 
         if not result_json.get("success", False):
-            print(f"{Colors.RED}Failed - Scenario decomposition marked as unsuccessful{Colors.END}")
+            logger.error(f"{Colors.RED}Failed - Scenario decomposition marked as unsuccessful{Colors.END}")
             return None
 
         adversarial_object = result_json["adversarial_object"]
@@ -94,22 +152,25 @@ def decompose_scenario(scenario):
         spawn_position = result_json["spawn_position"]
         success = result_json["success"]
 
-        print(f"\n{Colors.GREEN}Success{Colors.END}")
-        print(f"Adversarial Object: {adversarial_object}")
-        print(f"Behavior: {behavior}")
-        print(f"Geometry: {geometry}")
-        print(f"Spawn Position: {spawn_position}")
+        logger.debug(f"{Colors.GREEN}Success{Colors.END}")
+        logger.debug(f"Adversarial Object: {adversarial_object}")
+        logger.debug(f"Behavior: {behavior}")
+        logger.debug(f"Geometry: {geometry}")
+        logger.debug(f"Spawn Position: {spawn_position}")
 
-        return {
+        decomposition = {
             "success": success,
             "adversarial_object": adversarial_object,
             "behavior": behavior,
             "geometry": geometry,
             "spawn_position": spawn_position
         }
+        if decomposition_cache is not None:
+            decomposition_cache.store(scenario, prompt_template.text, LLM_PROVIDER, llm_client.MODEL_NAME, decomposition)
+        return decomposition
 
     except Exception as e:
-        print(f"{Colors.RED}Failed - Unexpected error: {e}{Colors.END}")
+        logger.error(f"{Colors.RED}Failed - Unexpected error: {e}{Colors.END}")
         return None
 
 
@@ -124,90 +185,252 @@ def format_snippets_content(snippets):
     return "\n".join(content_parts)
 
 
-def generate_code_for_category(category_description, category_type, prompt_path):
-    try:
-        print(f"  • Retrieving {category_type} snippets...")
-        snippets = search_snippets(category_description, category_type, limit=3)
-
-        print(f"  • Loading {category_type} prompt template...")
-        prompt_template = load_prompt_template(prompt_path)
-        formatted_content = format_snippets_content(snippets)
+def retrieve_category_snippets(decomposition_result, limit=3):
+    logger.info("  • Retrieving behavior, geometry and spawn snippets...")
+    behavior_snippets, geometry_snippets, spawn_snippets = get_default_retriever().search_snippets_batch([
+        (decomposition_result["behavior"], "behavior", limit),
+        (decomposition_result["geometry"], "geometry", limit),
+        (decomposition_result["spawn_position"], "spawn", limit)
+    ])
+    current_span().set_attributes(
+        behavior_similarities=[round(snippet['similarity'], 4) for snippet in behavior_snippets],
+        geometry_similarities=[round(snippet['similarity'], 4) for snippet in geometry_snippets],
+        spawn_similarities=[round(snippet['similarity'], 4) for snippet in spawn_snippets]
+    )
+    return {
+        "behavior": behavior_snippets,
+        "geometry": geometry_snippets,
+        "spawn": spawn_snippets
+    }
+
+
+def build_category_prompt(category_description, prompt_path, snippets, repair_context=None, stage=None):
+    prompt_template = load_prompt_template(prompt_path)
+    repair_template = load_prompt_template(COMPONENT_REPAIR_PROMPT_PATH) if repair_context else None
+
+    def assemble_prompt(selected_snippets):
+        full_prompt = prompt_template.render(
+            content=format_snippets_content(selected_snippets),
+            current_description=category_description
+        )
+        if repair_template is None:
+            return full_prompt
+        return repair_template.render(
+            category_prompt=full_prompt.rstrip(),
+            previous_code=repair_context["code"],
+            error=repair_context["error"]
+        )
 
-        full_prompt = prompt_template.replace("{content}", formatted_content)
-        full_prompt = full_prompt.replace("{current_description}", category_description)
+    return assemble_prompt(fit_snippets(snippets, assemble_prompt, PROMPT_TOKEN_BUDGETS.get(stage), stage))
 
-        print(f"{Colors.YELLOW}{Colors.BOLD}=== FULL PROMPT FOR {category_type.upper()} ==={Colors.END}")
-        print(f"{Colors.WHITE}{full_prompt}{Colors.END}")
-        print(f"{Colors.YELLOW}{'=' * 50}{Colors.END}")
-        print()
 
-        print(f"  • Generating {category_type} code with LLM...")
-        response = get_llm_response(full_prompt)
+def generate_code_for_category(category_description, category_type, prompt_path, snippets=None, repair_context=None):
+    try:
+        if snippets is None:
+            logger.info(f"  • Retrieving {category_type} snippets...")
+            snippets = get_default_retriever().search_snippets(category_description, category_type, limit=3)
+
+        stored_snippet = select_stored_snippet(category_type, snippets) if repair_context is None else None
+        if stored_snippet is not None:
+            record_generation(category_type, short_circuited=True)
+            current_span().set_attributes(short_circuit=True, short_circuit_uid=stored_snippet['uid'],
+                                          short_circuit_similarity=round(stored_snippet['similarity'], 4))
+            log_success(f"{category_type.capitalize()} code taken from knowledge base snippet {stored_snippet['uid']} "
+                        f"(similarity {stored_snippet['similarity']:.3f})")
+            return stored_snippet['code'].strip()
+
+        logger.info(f"  • Loading {category_type} prompt template...")
+        full_prompt = build_category_prompt(category_description, prompt_path, snippets, repair_context, stage=category_type)
+
+        logger.debug(f"{Colors.YELLOW}{Colors.BOLD}=== FULL PROMPT FOR {category_type.upper()} ==={Colors.END}")
+        logger.debug(f"{Colors.WHITE}{full_prompt}{Colors.END}")
+        logger.debug(f"{Colors.YELLOW}{'=' * 50}{Colors.END}")
+
+        logger.info(f"  • Generating {category_type} code with LLM...")
+        response = get_llm_response(full_prompt, stage=category_type)
+        record_generation(category_type, short_circuited=False)
 
         cleaned_code = clean_code_block(response)
 
-        print(f"{Colors.CYAN}{Colors.BOLD}=== CLEANED LLM RESPONSE FOR {category_type.upper()} ==={Colors.END}")
-        print(f"{Colors.WHITE}{cleaned_code}{Colors.END}")
-        print(f"{Colors.CYAN}{'=' * 50}{Colors.END}")
-        print()
+        logger.debug(f"{Colors.CYAN}{Colors.BOLD}=== CLEANED LLM RESPONSE FOR {category_type.upper()} ==={Colors.END}")
+        logger.debug(f"{Colors.WHITE}{cleaned_code}{Colors.END}")
+        logger.debug(f"{Colors.CYAN}{'=' * 50}{Colors.END}")
 
-        print_success(f"{category_type.capitalize()} code generated")
+        log_success(f"{category_type.capitalize()} code generated")
         return response.strip()
     except Exception as e:
-        print(f"{Colors.RED}✗ Error generating {category_type} code: {e}{Colors.END}")
+        logger.error(f"{Colors.RED}✗ Error generating {category_type} code: {e}{Colors.END}")
         raise
 
 
+def report_failed_categories(results, errors):
+    for category_type, error in errors.items():
+        logger.error(f"{Colors.RED}✗ {category_type.capitalize()} generation failed: {error}{Colors.END}")
+    completed = [category_type for category_type in CATEGORY_DECOMPOSITION_KEYS if category_type in results]
+    if completed:
+        logger.info(f"  • {', '.join(completed)} code completed; only {', '.join(errors)} failed")
+
+
+def generate_category_codes(decomposition_result, category_snippets, max_workers=CODE_GENERATION_MAX_WORKERS):
+    tasks = [
+        (
+            category_type,
+            traced(generate_code_for_category, "category_generation", category=category_type),
+            (
+                decomposition_result[decomposition_key],
+                category_type,
+                CATEGORY_PROMPT_PATHS[category_type],
+                category_snippets[category_type]
+            )
+        )
+        for category_type, decomposition_key in CATEGORY_DECOMPOSITION_KEYS.items()
+    ]
+
+    logger.info(f"  • Generating {', '.join(CATEGORY_DECOMPOSITION_KEYS)} code with up to {max_workers} parallel requests...")
+    results, errors, outputs = run_concurrently(tasks, max_workers, retries=CATEGORY_GENERATION_RETRIES)
+
+    for category_type in CATEGORY_DECOMPOSITION_KEYS:
+        if outputs.get(category_type):
+            write_output(outputs[category_type])
+
+    if errors:
+        report_failed_categories(results, errors)
+        return None
+
+    return results
+
+
+def retrieve_and_generate_category(category_description, category_type, limit=3):
+    # Timings are returned with the result, so a superseded run cannot overwrite those of the run that is kept.
+    timings = {}
+    with timed_span("retrieval", timings, category=category_type) as retrieval_span:
+        snippets = get_default_retriever().search_snippets(category_description, category_type, limit=limit)
+        retrieval_span.set_attribute(f"{category_type}_similarities",
+                                     [round(snippet['similarity'], 4) for snippet in snippets])
+    raise_if_cancelled()
+    with timed_span("code_generation", timings, category=category_type):
+        code = generate_code_for_category(category_description, category_type, CATEGORY_PROMPT_PATHS[category_type],
+                                          snippets)
+    return snippets, code, timings
+
+
+def decompose_and_generate_categories(scenario_description, max_workers=CODE_GENERATION_MAX_WORKERS, timings=None):
+    with ConcurrentTasks(max_workers) as streamed_tasks:
+        started_descriptions = {}
+
+        def start_category(decomposition_key, category_description, final=False):
+            category_type = DECOMPOSITION_CATEGORY_TYPES.get(decomposition_key)
+            if not category_type or not isinstance(category_description, str) or not category_description.strip():
+                return
+            if streamed_tasks.started(category_type):
+                if not final or started_descriptions[category_type] == category_description:
+                    return
+                logger.info(f"  • Final {category_type} description differs from the streamed one, regenerating...")
+            started_descriptions[category_type] = category_description
+            streamed_tasks.submit(
+                category_type,
+                traced(retrieve_and_generate_category, "category_generation", category=category_type),
+                category_description,
+                category_type
+            )
+
+        with timed_span("decomposition", timings):
+            decomposition_result = decompose_scenario(scenario_description, on_field=start_category)
+
+        decomposed = decomposition_result is not None and decomposition_result.get("success", False)
+        streamed = [category_type for category_type in CATEGORY_DECOMPOSITION_KEYS if streamed_tasks.started(category_type)]
+        if not decomposed and streamed:
+            logger.info(f"  • Decomposition failed, cancelling speculative {', '.join(streamed)} generation...")
+            streamed_tasks.cancel()
+        if decomposed:
+            log_success("Scenario decomposed successfully")
+            logger.info(f"  Adversarial object: {decomposition_result.get('adversarial_object', 'Vehicle')}")
+            log_step("STEP 2: CODE GENERATION", Colors.YELLOW)
+        if decomposed and streamed:
+            logger.info(f"  • Started {', '.join(streamed)} retrieval and generation while decomposition was streaming...")
+            for category_type, decomposition_key in CATEGORY_DECOMPOSITION_KEYS.items():
+                start_category(decomposition_key, decomposition_result[decomposition_key], final=True)
+            with timed_span("code_generation", timings):
+                results, errors, outputs = streamed_tasks.wait(retries=CATEGORY_GENERATION_RETRIES)
+
+    if not decomposed:
+        return decomposition_result, None, None
+
+    if not streamed:
+        with timed_span("retrieval", timings):
+            category_snippets = retrieve_category_snippets(decomposition_result)
+        with timed_span("code_generation", timings):
+            category_codes = generate_category_codes(decomposition_result, category_snippets, max_workers)
+        return decomposition_result, category_snippets, category_codes
+
+    for category_type in CATEGORY_DECOMPOSITION_KEYS:
+        if outputs.get(category_type):
+            write_output(outputs[category_type])
+
+    if errors:
+        report_failed_categories(results, errors)
+        return decomposition_result, None, None
+
+    if timings is not None:
+        for category_type in CATEGORY_DECOMPOSITION_KEYS:
+            for stage, seconds in results[category_type][2].items():
+                timings[f"{category_type}_{stage}"] = seconds
+
+    category_snippets = {category_type: results[category_type][0] for category_type in CATEGORY_DECOMPOSITION_KEYS}
+    category_codes = {category_type: results[category_type][1] for category_type in CATEGORY_DECOMPOSITION_KEYS}
+    return decomposition_result, category_snippets, category_codes
+
+
 def clean_code_block(code):
     return extract_code_between_backticks(code)
 
 
 def extract_town_from_geometry(geometry_code):
     try:
-        print("  • Extracting town information...")
+        logger.info("  • Extracting town information...")
         for line in geometry_code.split('\n'):
             if 'Town' in line and '=' in line:
                 town_part = line.split('=')[1].strip().strip('\'"')
-                print_success(f"Town extracted: {town_part}")
+                log_success(f"Town extracted: {town_part}")
                 return town_part
-        print_success("Using default town: Town04")
+        log_success("Using default town: Town04")
         return "Town04"
     except Exception as e:
-        print(f"{Colors.RED}✗ Error extracting town: {e}{Colors.END}")
+        logger.error(f"{Colors.RED}✗ Error extracting town: {e}{Colors.END}")
         return "Town04"
 
 
 def remove_town_line(geometry_code):
     try:
-        print("  • Removing town definition from geometry...")
+        logger.info("  • Removing town definition from geometry...")
         lines = []
         for line in geometry_code.split('\n'):
             if not (line.strip().startswith('Town') and '=' in line):
                 lines.append(line)
         return '\n'.join(lines).strip()
     except Exception as e:
-        print(f"{Colors.RED}✗ Error removing town line: {e}{Colors.END}")
+        logger.error(f"{Colors.RED}✗ Error removing town line: {e}{Colors.END}")
         return geometry_code
 
 
 def build_scenic_header(town):
     try:
-        print(f"  • Building scenic header for {town}...")
+        logger.info(f"  • Building scenic header for {town}...")
         return f'''param map = localPath('../maps/{town}.xodr')
 param carla_map = '{town}'
 model scenic.simulators.carla.model
 EGO_MODEL = "vehicle.lincoln.mkz_2017"'''
     except Exception as e:
-        print(f"{Colors.RED}✗ Error building scenic header: {e}{Colors.END}")
+        logger.error(f"{Colors.RED}✗ Error building scenic header: {e}{Colors.END}")
         raise
 
 
 def integrate_code_components(scenario_description, town, scenic_header, behavior_code, geometry_code, spawn_code):
     try:
-        print("  • Loading integration prompt template...")
+        logger.info("  • Loading integration prompt template...")
         prompt_template = load_prompt_template(CODE_INTEGRATION_PROMPT_PATH)
 
-        integration_prompt = prompt_template.format(
+        integration_prompt = prompt_template.render(
             scenario_description=scenario_description,
             town=town,
             scenic_header=scenic_header,
@@ -216,131 +439,248 @@ def integrate_code_components(scenario_description, town, scenic_header, behavio
             spawn_code=spawn_code
         )
 
-        print(f"{Colors.YELLOW}{Colors.BOLD}=== FULL PROMPT FOR INTEGRATION ==={Colors.END}")
-        print(f"{Colors.WHITE}{integration_prompt}{Colors.END}")
-        print(f"{Colors.YELLOW}{'=' * 50}{Colors.END}")
-        print()
+        logger.debug(f"{Colors.YELLOW}{Colors.BOLD}=== FULL PROMPT FOR INTEGRATION ==={Colors.END}")
+        logger.debug(f"{Colors.WHITE}{integration_prompt}{Colors.END}")
+        logger.debug(f"{Colors.YELLOW}{'=' * 50}{Colors.END}")
 
-        print("  • Sending integration request to LLM...")
-        response = get_llm_response(integration_prompt)
+        logger.info("  • Sending integration request to LLM...")
+        response = get_llm_response(integration_prompt, stage="integration")
         integrated_code = clean_code_block(response)
 
-        print(f"{Colors.CYAN}{Colors.BOLD}=== CLEANED LLM RESPONSE FOR INTEGRATION ==={Colors.END}")
-        print(f"{Colors.WHITE}{integrated_code}{Colors.END}")
-        print(f"{Colors.CYAN}{'=' * 50}{Colors.END}")
-        print()
+        logger.debug(f"{Colors.CYAN}{Colors.BOLD}=== CLEANED LLM RESPONSE FOR INTEGRATION ==={Colors.END}")
+        logger.debug(f"{Colors.WHITE}{integrated_code}{Colors.END}")
+        logger.debug(f"{Colors.CYAN}{'=' * 50}{Colors.END}")
 
-        print_success("Code integration completed")
+        log_success("Code integration completed")
         return integrated_code
 
     except Exception as e:
-        print(f"{Colors.RED}✗ Integration error: {e}{Colors.END}")
+        logger.error(f"{Colors.RED}✗ Integration error: {e}{Colors.END}")
         return None
 
 
-def generate_scenario_code(scenario_description):
-    try:
-        print(f"{Colors.BOLD}{Colors.PURPLE}SCENIC CODE GENERATOR{Colors.END}")
-        print(f"Scenario: {scenario_description}")
-        print()
-
-        print_step("STEP 1: SCENARIO DECOMPOSITION", Colors.PURPLE)
-        decomposition_result = decompose_scenario(scenario_description)
-
-        if not decomposition_result or not decomposition_result.get("success", False):
-            print(f"{Colors.RED}✗ Scenario decomposition failed{Colors.END}")
-            return None
-
-        adversarial_object = decomposition_result.get("adversarial_object", "Vehicle")
-        print_success("Scenario decomposed successfully")
-        print(f"  Adversarial object: {adversarial_object}")
-        print()
-
-        print_step("STEP 2: CODE GENERATION", Colors.YELLOW)
-
-        behavior_code = generate_code_for_category(
-            decomposition_result["behavior"],
-            "behavior",
-            BEHAVIOR_PROMPT_PATH
-        )
-        print()
-
-        geometry_code = generate_code_for_category(
-            decomposition_result["geometry"],
-            "geometry",
-            GEOMETRY_PROMPT_PATH
+def integrate_components(scenario_description, town, scenic_header, behavior_code, geometry_code, spawn_code,
+                         mode=INTEGRATION_MODE):
+    if mode == "local":
+        logger.info("  • Integrating components locally...")
+        try:
+            integrated_code = integrate_locally(scenario_description, scenic_header, behavior_code, geometry_code,
+                                                spawn_code)
+        except IntegrationConflict as e:
+            current_span().set_attribute("local_integration", False)
+            logger.info(f"  • Components disagree, falling back to LLM integration: {e}")
+        else:
+            validation_result = validate_scenic_code(integrated_code)
+            current_span().set_attribute("local_integration", validation_result["valid"])
+            if validation_result["valid"]:
+                log_success("Code integration completed without an LLM call")
+                return integrated_code
+            logger.info(f"  • Local integration does not compile, falling back to LLM: {validation_result['error']}")
+
+    return integrate_code_components(scenario_description, town, scenic_header, behavior_code, geometry_code, spawn_code)
+
+
+def prepare_component(category_type, code, adversarial_object):
+    code = clean_code_block(code)
+    if category_type == "geometry":
+        code = remove_town_line(code)
+    if category_type == "spawn":
+        code = code.replace("{AdvObject}", adversarial_object)
+    return code
+
+
+def assemble_components(scenario_description, scenic_header, components):
+    sections = [("description", f'"""{scenario_description}"""'), ("header", scenic_header)]
+    sections.extend((category_type, components[category_type])
+                    for category_type in CATEGORY_DECOMPOSITION_KEYS if category_type in components)
+
+    lines = []
+    line_ranges = {}
+    for name, code in sections:
+        start_line = len(lines) + 1
+        lines.extend(code.split("\n"))
+        line_ranges[name] = (start_line, len(lines))
+        lines.append("")
+    return "\n".join(lines).strip(), line_ranges
+
+
+def locate_failing_component(scenario_description, scenic_header, components):
+    categories = [category_type for category_type in CATEGORY_DECOMPOSITION_KEYS if category_type in components]
+    for count in range(1, len(categories) + 1):
+        included = categories[:count]
+        assembled_code, line_ranges = assemble_components(
+            scenario_description,
+            scenic_header,
+            {category_type: components[category_type] for category_type in included}
         )
-        print()
+        validation_result = validate_scenic_code(assembled_code)
+        if validation_result["valid"]:
+            continue
+        if count < len(categories) and validation_result["error"] == MISSING_EGO_ERROR:
+            continue
+
+        line = validation_result.get("line")
+        for name, (start_line, end_line) in line_ranges.items():
+            if line is not None and start_line <= line <= end_line:
+                return name, validation_result["error"]
+        return included[-1], validation_result["error"]
+    return None, None
+
+
+def repair_scenario_code(scenario_description, decomposition_result, category_snippets, components, town,
+                         scenic_header, adversarial_object, integrated_code, max_attempts=REPAIR_MAX_ATTEMPTS):
+    if validate_scenic_code(integrated_code)["valid"]:
+        return integrated_code
 
-        spawn_code = generate_code_for_category(
-            decomposition_result["spawn_position"],
-            "spawn",
-            SPAWN_PROMPT_PATH
+    log_step("REPAIR: COMPONENT VALIDATION", Colors.RED)
+    components = dict(components)
+    regenerated = []
+    for attempt in range(max_attempts + 1):
+        failing_component, error = locate_failing_component(scenario_description, scenic_header, components)
+        if failing_component is None:
+            break
+        if failing_component not in components:
+            logger.error(f"{Colors.RED}✗ Validation error in the {failing_component}, not repairable: {error}{Colors.END}")
+            return integrated_code
+        if attempt == max_attempts:
+            logger.error(f"{Colors.RED}✗ {failing_component.capitalize()} still invalid after {max_attempts} "
+                         f"repair attempts: {error}{Colors.END}")
+            return integrated_code
+
+        logger.info(f"  • Regenerating {failing_component} code ({attempt + 1}/{max_attempts}): {error}")
+        response = generate_code_for_category(
+            decomposition_result[CATEGORY_DECOMPOSITION_KEYS[failing_component]],
+            failing_component,
+            CATEGORY_PROMPT_PATHS[failing_component],
+            category_snippets[failing_component],
+            repair_context={"code": components[failing_component], "error": error}
         )
-        print()
-
-        print_step("STEP 3: CODE PROCESSING", Colors.CYAN)
-
-        print("  • Cleaning code blocks...")
-        behavior_code = clean_code_block(behavior_code)
-        geometry_code = clean_code_block(geometry_code)
-        spawn_code = clean_code_block(spawn_code)
-
-        town = extract_town_from_geometry(geometry_code)
-        geometry_code = remove_town_line(geometry_code)
-        scenic_header = build_scenic_header(town)
-
-        print("  • Processing adversarial object placeholder...")
-        if "{AdvObject}" in spawn_code:
-            spawn_code = spawn_code.replace("{AdvObject}", adversarial_object)
-            print_success(f"Replaced {{AdvObject}} with {adversarial_object}")
-
-        print()
-        print_step("STEP 4: LLM CODE INTEGRATION", Colors.GREEN)
-
-        integrated_code = integrate_code_components(
+        components[failing_component] = prepare_component(failing_component, response, adversarial_object)
+        regenerated.append(failing_component)
+
+    current_span().set_attribute("regenerated_components", regenerated)
+    assembled_code, _ = assemble_components(scenario_description, scenic_header, components)
+    if regenerated:
+        log_success(f"Components validated after regenerating {', '.join(regenerated)}")
+        repaired_code = integrate_components(
             scenario_description,
             town,
             scenic_header,
-            behavior_code,
-            geometry_code,
-            spawn_code
+            components["behavior"],
+            components["geometry"],
+            components["spawn"]
         )
+        if repaired_code and validate_scenic_code(repaired_code)["valid"]:
+            return repaired_code
 
-        if not integrated_code:
-            print(f"{Colors.RED}✗ Code integration failed{Colors.END}")
-            return None
-
-        print()
-        print_step("FINAL INTEGRATED SCENIC CODE", Colors.BOLD + Colors.WHITE)
-        print("=" * 80)
-        print(f"{Colors.WHITE}{integrated_code}{Colors.END}")
-        print("=" * 80)
+    log_success("Using validated component assembly instead of the integrated code")
+    return assembled_code
 
-        print_success("Scenic code generation completed successfully")
-        return integrated_code
 
-    except Exception as e:
-        print(f"{Colors.RED}✗ Error generating scenario code: {e}{Colors.END}")
-        return None
+def generate_scenario_code(scenario_description, max_workers=CODE_GENERATION_MAX_WORKERS, timings=None,
+                           scenario_id=None, repair_attempts=0):
+    with scenario(scenario_id), span("generate_scenario_code", scenario_description=scenario_description):
+        try:
+            logger.info(f"{Colors.BOLD}{Colors.PURPLE}SCENIC CODE GENERATOR{Colors.END}")
+            logger.info(f"Scenario: {scenario_description}")
+
+            log_step("STEP 1: SCENARIO DECOMPOSITION", Colors.PURPLE)
+            decomposition_result, category_snippets, category_codes = decompose_and_generate_categories(
+                scenario_description,
+                max_workers,
+                timings
+            )
+
+            if not decomposition_result or not decomposition_result.get("success", False):
+                logger.error(f"{Colors.RED}✗ Scenario decomposition failed{Colors.END}")
+                return None
+
+            adversarial_object = decomposition_result.get("adversarial_object", "Vehicle")
+            if category_codes is None:
+                logger.error(f"{Colors.RED}✗ Code generation failed{Colors.END}")
+                return None
+
+            behavior_code = category_codes["behavior"]
+            geometry_code = category_codes["geometry"]
+            spawn_code = category_codes["spawn"]
+
+            log_step("STEP 3: CODE PROCESSING", Colors.CYAN)
+
+            logger.info("  • Cleaning code blocks...")
+            behavior_code = clean_code_block(behavior_code)
+            geometry_code = clean_code_block(geometry_code)
+            spawn_code = clean_code_block(spawn_code)
+
+            town = extract_town_from_geometry(geometry_code)
+            geometry_code = remove_town_line(geometry_code)
+            scenic_header = build_scenic_header(town)
+
+            logger.info("  • Processing adversarial object placeholder...")
+            if "{AdvObject}" in spawn_code:
+                spawn_code = spawn_code.replace("{AdvObject}", adversarial_object)
+                log_success(f"Replaced {{AdvObject}} with {adversarial_object}")
+
+            log_step("STEP 4: CODE INTEGRATION", Colors.GREEN)
+
+            with timed_span("integration", timings):
+                integrated_code = integrate_components(
+                    scenario_description,
+                    town,
+                    scenic_header,
+                    behavior_code,
+                    geometry_code,
+                    spawn_code
+                )
+
+            if not integrated_code:
+                logger.error(f"{Colors.RED}✗ Code integration failed{Colors.END}")
+                return None
+
+            if repair_attempts:
+                with timed_span("repair", timings):
+                    integrated_code = repair_scenario_code(
+                        scenario_description,
+                        decomposition_result,
+                        category_snippets,
+                        {"behavior": behavior_code, "geometry": geometry_code, "spawn": spawn_code},
+                        town,
+                        scenic_header,
+                        adversarial_object,
+                        integrated_code,
+                        repair_attempts
+                    )
+
+            log_step("FINAL INTEGRATED SCENIC CODE", Colors.BOLD + Colors.WHITE)
+            logger.info("=" * 80)
+            logger.info(f"{Colors.WHITE}{integrated_code}{Colors.END}")
+            logger.info("=" * 80)
+
+            log_success("Scenic code generation completed successfully")
+            return integrated_code
+
+        except Exception as e:
+            logger.error(f"{Colors.RED}✗ Error generating scenario code: {e}{Colors.END}")
+            return None
 
 
 def main():
     test_scenario = "The ego encounters a parked car blocking its lane and must use the opposite lane to bypass the vehicle, carefully assessing the situation and yielding to oncoming traffic, when an oncoming motorcyclist swerves into the lane unexpectedly, necessitating the ego to brake or maneuver to avoid a potential accident."
 
+    configure_verbosity(default="stream")
+
     try:
-        scenic_code = generate_scenario_code(test_scenario)
+        scenic_code = generate_scenario_code(test_scenario, repair_attempts=REPAIR_MAX_ATTEMPTS)
 
         if scenic_code:
-            print()
-            validation_result = validate_scenic_code(scenic_code)
+            with span("validation"):
+                validation_result = validate_scenic_code(scenic_code)
             if validation_result["valid"]:
-                print_success("All processes completed successfully")
+                log_success("All processes completed successfully")
             else:
-                print(f"{Colors.RED}✗ Code validation failed: {validation_result['error']}{Colors.END}")
+                logger.error(f"{Colors.RED}✗ Code validation failed: {validation_result['error']}{Colors.END}")
 
     except Exception as e:
-        print(f"✗ Error in main: {e}")
+        logger.error(f"✗ Error in main: {e}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,164 @@
+import argparse
+import importlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from llm_clients.router import get_router_stats
+from llm_clients.scheduler import get_all_scheduler_stats
+from scenic_validator import validate_scenic_code
+from decomposition_cache import get_default_decomposition_cache
+from prompt_budget import get_prompt_token_stats
+from short_circuit import get_short_circuit_stats
+from validation_cache import get_default_validation_cache
+from tracing import scenario, timed_span
+from verbosity import VERBOSITY_LEVELS, configure_verbosity
+
+PIPELINES = {
+    "auto": "auto_scenario_generator",
+    "basic": "scenario_generator"
+}
+DEFAULT_WORKERS = 4
+
+
+class Colors:
+    GREEN = '\033[92m'
+    RED = '\033[91m'
+    BOLD = '\033[1m'
+    END = '\033[0m'
+
+
+def read_scenarios(input_path):
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            scenario = record.get("scenario") or record.get("description")
+            if not scenario:
+                raise ValueError(f"Line {line_number} of {input_path} has no 'scenario' or 'description' field")
+            yield {"id": record.get("id", line_number), "scenario": scenario}
+
+
+def run_scenario(generator, scenario_record, max_workers, validate, repair_attempts=0):
+    timings = {}
+    result = {
+        "id": scenario_record["id"],
+        "scenario": scenario_record["scenario"],
+        "code": None,
+        "valid": False,
+        "error": None,
+        "timings": timings
+    }
+    start_time = time.perf_counter()
+
+    try:
+        with scenario(str(scenario_record["id"])):
+            options = {"repair_attempts": repair_attempts} if repair_attempts else {}
+            code = generator.generate_scenario_code(scenario_record["scenario"], max_workers=max_workers,
+                                                    timings=timings, **options)
+            result["code"] = code
+            if code is None:
+                result["error"] = "Scenario generation failed"
+            elif validate:
+                with timed_span("validation", timings):
+                    validation_result = validate_scenic_code(code)
+                result["valid"] = validation_result["valid"]
+                result["error"] = validation_result["error"]
+            else:
+                result["valid"] = None
+    except Exception as e:
+        result["error"] = str(e)
+
+    timings["total"] = round(time.perf_counter() - start_time, 4)
+    return result
+
+
+def run_batch(input_path, output_path, pipeline="auto", workers=DEFAULT_WORKERS, category_workers=3, validate=True,
+              repair_attempts=0):
+    if repair_attempts and pipeline != "auto":
+        raise ValueError("Component repair is only available for the auto pipeline")
+    generator = importlib.import_module(PIPELINES[pipeline])
+    scenarios = list(read_scenarios(input_path))
+    summary = {"total": len(scenarios), "generated": 0, "valid": 0}
+
+    with open(output_path, "w", encoding="utf-8") as output, \
+            ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [
+            executor.submit(run_scenario, generator, scenario_record, category_workers, validate, repair_attempts)
+            for scenario_record in scenarios
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+            summary["generated"] += result["code"] is not None
+            summary["valid"] += result["valid"] is True
+
+    summary["scheduler"] = get_all_scheduler_stats()
+    summary["routing"] = get_router_stats()
+    summary["short_circuit"] = get_short_circuit_stats()
+    summary["prompt_tokens"] = get_prompt_token_stats()
+    decomposition_cache = get_default_decomposition_cache()
+    summary["decomposition_cache"] = decomposition_cache.get_stats() if decomposition_cache else None
+    validation_cache = get_default_validation_cache() if validate else None
+    summary["validation_cache"] = validation_cache.get_stats() if validation_cache else None
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate Scenic code for every scenario in a JSONL file")
+    parser.add_argument("input", help="JSONL file with one {'id', 'scenario'} record per line")
+    parser.add_argument("output", help="JSONL file receiving one result record per scenario")
+    parser.add_argument("--pipeline", choices=sorted(PIPELINES), default="auto")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="scenarios generated in parallel")
+    parser.add_argument("--category-workers", type=int, default=3,
+                        help="parallel behavior/geometry/spawn requests per scenario")
+    parser.add_argument("--no-validate", action="store_true", help="skip Scenic validation")
+    parser.add_argument("--repair-attempts", type=int, default=0,
+                        help="regenerate only the failing component up to this many times (auto pipeline)")
+    parser.add_argument("--verbosity", choices=list(VERBOSITY_LEVELS), default=None,
+                        help="console output per scenario (default: $SCENIC_VERBOSITY or quiet)")
+    args = parser.parse_args()
+    configure_verbosity(args.verbosity, default="quiet")
+
+    try:
+        summary = run_batch(
+            args.input,
+            args.output,
+            pipeline=args.pipeline,
+            workers=args.workers,
+            category_workers=args.category_workers,
+            validate=not args.no_validate,
+            repair_attempts=args.repair_attempts
+        )
+        print(f"{Colors.GREEN}{Colors.BOLD}✓ Batch finished: {summary['generated']}/{summary['total']} generated, "
+              f"{summary['valid']} valid{Colors.END}")
+        for provider, stage_stats in summary["scheduler"].items():
+            for stage, stats in stage_stats.items():
+                print(f"  {provider}/{stage}: {stats['calls']} calls, {stats['retries']} retries, "
+                      f"queue wait {stats['queue_wait_seconds']:.1f}s, generation {stats['generation_seconds']:.1f}s")
+        for stage, stats in summary["routing"].items():
+            wins = ", ".join(f"{provider} {count}" for provider, count in stats["wins"].items())
+            print(f"  routing/{stage}: {stats['calls']} calls, {stats['hedges']} hedged ({stats['hedge_wins']} won by the hedge), "
+                  f"{stats['failovers']} failovers, answered by {wins or 'none'}")
+        for stage, stats in summary["prompt_tokens"].items():
+            print(f"  {stage} prompts: {stats['prompts']} sent, {stats['mean_tokens']:.0f} tokens on average, "
+                  f"{stats['max_tokens']} max, {stats['examples_dropped']} examples dropped, "
+                  f"{stats['examples_truncated']} truncated")
+        for category_type, stats in summary["short_circuit"].items():
+            print(f"  {category_type}: {stats['llm_calls_saved']} LLM calls saved by knowledge base matches, "
+                  f"{stats['llm_calls']} generated")
+        if summary["decomposition_cache"]:
+            stats = summary["decomposition_cache"]
+            print(f"  decomposition cache: {stats['exact_hits']} exact and {stats['semantic_hits']} similar scenarios "
+                  f"reused, {stats['misses']} decomposed ({stats['reuse_rate']:.0%} reuse)")
+        if summary["validation_cache"]:
+            print(f"  validation cache: {summary['validation_cache']['compilations_avoided']} compilations avoided, "
+                  f"{summary['validation_cache']['misses']} compiled")
+    except Exception as e:
+        print(f"{Colors.RED}✗ Error in batch generation: {e}{Colors.END}")
+
+
+if __name__ == "__main__":
+    main()
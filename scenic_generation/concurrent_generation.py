@@ -0,0 +1,107 @@
+import contextvars
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from llm_clients.scheduler import is_retryable_error
+from verbosity import captured_output, get_logger
+
+DEFAULT_MAX_WORKERS = 3
+
+logger = get_logger(__name__)
+_cancel_event = contextvars.ContextVar("concurrent_tasks_cancel_event", default=None)
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+def raise_if_cancelled():
+    # Long tasks call this between expensive steps so cancelled work stops before its next LLM request.
+    cancel_event = _cancel_event.get()
+    if cancel_event is not None and cancel_event.is_set():
+        raise TaskCancelled()
+
+
+class ConcurrentTasks:
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        self.max_workers = max(1, max_workers)
+        self.results = {}
+        self.errors = {}
+        self.outputs = {}
+        self._tasks = {}
+        self._futures = {}
+        self._runs = {}
+        self._executor = None
+        self._cancel_event = threading.Event()
+
+    def __enter__(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.cancel()
+        # Cancelled tasks that are already running finish in the background; nobody waits for their results.
+        self._executor.shutdown(wait=not self._cancel_event.is_set(), cancel_futures=self._cancel_event.is_set())
+
+    def cancel(self):
+        self._cancel_event.set()
+        for future in self._futures.values():
+            future.cancel()
+
+    def _run_task(self, name, run, function, args):
+        # Output is captured per task through a context variable, so sys.stdout is never swapped.
+        buffer = io.StringIO()
+        _cancel_event.set(self._cancel_event)
+        try:
+            raise_if_cancelled()
+            with captured_output(buffer):
+                return function(*args)
+        finally:
+            if self._runs.get(name) is run:
+                self.outputs[name] = self.outputs.get(name, "") + buffer.getvalue()
+
+    def _start(self, name):
+        function, args = self._tasks[name]
+        run = self._runs[name] = object()
+        self._futures[name] = self._executor.submit(contextvars.copy_context().run, self._run_task, name, run, function, args)
+
+    def submit(self, name, function, *args):
+        # Submitting a name again supersedes the earlier run: only the latest result and output are kept.
+        previous = self._futures.get(name)
+        if previous is not None:
+            previous.cancel()
+        self.outputs.pop(name, None)
+        self._tasks[name] = (function, args)
+        self._start(name)
+
+    def started(self, name):
+        return name in self._futures
+
+    def _collect(self, names):
+        for name in names:
+            try:
+                self.results[name] = self._futures[name].result()
+                self.errors.pop(name, None)
+            except Exception as e:
+                self.errors[name] = e
+
+    def wait(self, retries=0):
+        # Only tasks that failed with a transient error are rerun; completed results and earlier output are kept.
+        self._collect(list(self._futures))
+        for _ in range(retries):
+            failed = [name for name, error in self.errors.items() if is_retryable_error(error)]
+            if not failed:
+                break
+            logger.warning(f"  • Retrying failed {', '.join(failed)}...")
+            for name in failed:
+                self._start(name)
+            self._collect(failed)
+        return self.results, self.errors, self.outputs
+
+
+def run_concurrently(tasks, max_workers=DEFAULT_MAX_WORKERS, retries=0):
+    with ConcurrentTasks(max_workers) as concurrent_tasks:
+        for name, function, args in tasks:
+            concurrent_tasks.submit(name, function, *args)
+        return concurrent_tasks.wait(retries)
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import threading
+import diskcache
+import numpy as np
+from chroma_database.scenic_retriever import get_default_retriever, normalize_query_text
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DECOMPOSITION_CACHE_ENABLED = os.environ.get("SCENIC_DECOMPOSITION_CACHE", "1") != "0"
+DECOMPOSITION_CACHE_DIR = os.environ.get("SCENIC_DECOMPOSITION_CACHE_DIR", os.path.join(script_dir, ".decomposition_cache"))
+DECOMPOSITION_CACHE_SEMANTIC = os.environ.get("SCENIC_DECOMPOSITION_CACHE_SEMANTIC", "0") == "1"
+DECOMPOSITION_CACHE_THRESHOLD = float(os.environ.get("SCENIC_DECOMPOSITION_CACHE_THRESHOLD", 0.95))
+DECOMPOSITION_CACHE_SIZE_LIMIT = 64 * 1024 * 1024
+DECOMPOSITION_FIELDS = ("success", "adversarial_object", "behavior", "geometry", "spawn_position")
+
+
+def scenario_hash(scenario, prompt_template, provider, model_name):
+    # A decomposition is only reused for the same prompt, provider and model that produced it.
+    payload = json.dumps([prompt_template, provider, model_name], ensure_ascii=False)
+    prompt_hash = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    text_hash = hashlib.sha256(normalize_query_text(scenario).encode("utf-8")).hexdigest()
+    return prompt_hash, text_hash
+
+
+class DecompositionCache:
+    # Exact matches on the normalized scenario text are always served; near-duplicates only when semantic is set.
+    def __init__(self, directory=DECOMPOSITION_CACHE_DIR, threshold=DECOMPOSITION_CACHE_THRESHOLD, retriever=None,
+                 size_limit=DECOMPOSITION_CACHE_SIZE_LIMIT, semantic=DECOMPOSITION_CACHE_SEMANTIC):
+        self.threshold = threshold
+        self.semantic = semantic
+        self._cache = diskcache.Cache(directory, size_limit=size_limit, eviction_policy="least-recently-used")
+        self._retriever = retriever
+        self._index_lock = threading.Lock()
+        self._index = None
+        self._stats_lock = threading.Lock()
+        self._stats = {'exact_hits': 0, 'semantic_hits': 0, 'misses': 0}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['exact_hits'] + stats['semantic_hits'] + stats['misses']
+        stats['reuse_rate'] = (stats['exact_hits'] + stats['semantic_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def _embed(self, scenario):
+        retriever = self._retriever or get_default_retriever()
+        embedding = np.asarray(retriever.embed_queries([scenario])[0], dtype=np.float32)
+        return retriever.embedding_model_name(), embedding / max(float(np.linalg.norm(embedding)), 1e-12)
+
+    def _load_index(self):
+        # Scanned once per process; later stores are added in place, entries from other processes show up on restart.
+        if self._index is None:
+            self._index = {}
+            for key in self._cache.iterkeys():
+                entry = self._cache.get(key)
+                if entry is not None and entry.get("embedding") is not None:
+                    self._add_to_index(key, entry["model"], entry["embedding"])
+        return self._index
+
+    def _add_to_index(self, key, model_name, embedding):
+        # One matrix per embedding model; an entry whose dimension no longer matches its model's matrix is skipped.
+        index = self._index.setdefault(model_name, {'rows': {}, 'keys': [], 'embeddings': None})
+        if index['embeddings'] is not None and index['embeddings'].shape[1] != len(embedding):
+            return
+        if key in index['rows']:
+            index['embeddings'][index['rows'][key]] = embedding
+            return
+        index['rows'][key] = len(index['keys'])
+        index['keys'].append(key)
+        if index['embeddings'] is None:
+            index['embeddings'] = embedding[None, :]
+        else:
+            index['embeddings'] = np.vstack([index['embeddings'], embedding])
+
+    def lookup(self, scenario, prompt_template, provider, model_name):
+        prompt_hash, text_hash = scenario_hash(scenario, prompt_template, provider, model_name)
+        entry = self._cache.get((prompt_hash, text_hash))
+        if entry is not None:
+            self._count('exact_hits')
+            return dict(entry["decomposition"]), "exact", 1.0
+
+        if self.semantic:
+            embedding_model, embedding = self._embed(scenario)
+            with self._index_lock:
+                index = self._load_index().get(embedding_model)
+                candidates = [i for i, key in enumerate(index['keys']) if key[0] == prompt_hash] if index else []
+                if candidates and index['embeddings'].shape[1] == len(embedding):
+                    similarities = index['embeddings'][candidates] @ embedding
+                    best = int(np.argmax(similarities))
+                    similarity = float(similarities[best])
+                    entry = self._cache.get(index['keys'][candidates[best]]) if similarity >= self.threshold else None
+                    if entry is not None:
+                        self._count('semantic_hits')
+                        return dict(entry["decomposition"]), "semantic", similarity
+
+        self._count('misses')
+        return None, None, None
+
+    def store(self, scenario, prompt_template, provider, model_name, decomposition):
+        embedding_model, embedding = self._embed(scenario) if self.semantic else (None, None)
+        key = scenario_hash(scenario, prompt_template, provider, model_name)
+        self._cache.set(key, {
+            "scenario": scenario,
+            "model": embedding_model,
+            "embedding": embedding,
+            "decomposition": {field: decomposition[field] for field in DECOMPOSITION_FIELDS}
+        })
+        if self.semantic:
+            with self._index_lock:
+                if self._index is not None:
+                    self._add_to_index(key, embedding_model, embedding)
+
+    def clear(self):
+        self._cache.clear()
+        with self._index_lock:
+            self._index = None
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_decomposition_cache():
+    global _default_cache
+    if not DECOMPOSITION_CACHE_ENABLED:
+        return None
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = DecompositionCache()
+    return _default_cache
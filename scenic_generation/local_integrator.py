@@ -0,0 +1,113 @@
+import re
+
+ADV_OBJECT_PLACEHOLDER = "{AdvObject}"
+IMPORT_PATTERN = re.compile(r"^(import|from)\s")
+MODEL_PATTERN = re.compile(r"^model\s")
+PARAM_PATTERN = re.compile(r"^param\s+(\w+)\s*=")
+DEFINITION_PATTERN = re.compile(r"^(behavior|monitor|scenario|def|class)\s+(\w+)")
+DEDENT_CONTINUATIONS = ("else", "elif", "except", "finally")
+SECTION_ORDER = ["imports", "params", "definitions", "geometry", "spawn"]
+SECTION_SEPARATORS = {"definitions": "\n\n"}
+
+
+class IntegrationConflict(ValueError):
+    pass
+
+
+def bracket_delta(line):
+    # Brackets inside string literals and comments do not open or close anything.
+    delta = 0
+    quote = None
+    escaped = False
+    for char in line:
+        if quote:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char == "#":
+            break
+        elif char in "([{":
+            delta += 1
+        elif char in ")]}":
+            delta -= 1
+    return delta
+
+
+def split_statements(code):
+    statements = []
+    comments = []
+    depth = 0
+    for line in code.split("\n"):
+        stripped = line.strip()
+        continues = bool(statements) and (
+            depth > 0
+            or line[:1] in (" ", "\t")
+            or stripped.startswith(DEDENT_CONTINUATIONS)
+            or statements[-1].rstrip().endswith(("\\", ","))
+        )
+        if not stripped:
+            if continues and depth > 0:
+                statements[-1] += "\n" + line
+            continue
+        if continues:
+            statements[-1] += "\n" + line
+        elif stripped.startswith("#"):
+            comments.append(line)
+            continue
+        else:
+            statements.append("\n".join(comments + [line]))
+            comments = []
+        depth = max(0, depth + bracket_delta(line))
+    if comments:
+        statements.append("\n".join(comments))
+    return statements
+
+
+def statement_code(statement):
+    return "\n".join(line for line in statement.split("\n") if not line.strip().startswith("#")).strip()
+
+
+def statement_key(statement):
+    code = statement_code(statement)
+    if not code:
+        return None, ("comment", statement.strip())
+    first_line = code.split("\n", 1)[0]
+    param = PARAM_PATTERN.match(first_line)
+    if param and "," not in first_line.split("=", 1)[1].split("(")[0]:
+        return "params", ("param", param.group(1))
+    definition = DEFINITION_PATTERN.match(first_line)
+    if definition:
+        return "definitions", (definition.group(1), definition.group(2))
+    if IMPORT_PATTERN.match(first_line) or MODEL_PATTERN.match(first_line):
+        return "imports", ("statement", code)
+    return None, ("statement", code)
+
+
+def integrate_locally(scenario_description, scenic_header, behavior_code, geometry_code, spawn_code,
+                      adversarial_object=None):
+    # Repeated statements are emitted once; a param or definition given two different bodies is a conflict the
+    # caller must resolve, since picking either silently could compile with the wrong value.
+    header_statements = split_statements(scenic_header)
+    seen = {statement_key(statement)[1]: statement_code(statement) for statement in header_statements}
+    sections = {name: [] for name in SECTION_ORDER}
+
+    for component_section, code in (("definitions", behavior_code), ("geometry", geometry_code), ("spawn", spawn_code)):
+        if adversarial_object:
+            code = code.replace(ADV_OBJECT_PLACEHOLDER, adversarial_object)
+        for statement in split_statements(code):
+            section, key = statement_key(statement)
+            if key in seen:
+                if seen[key] != statement_code(statement):
+                    raise IntegrationConflict(f"Conflicting definitions of {' '.join(key)}")
+                continue
+            seen[key] = statement_code(statement)
+            sections[section or component_section].append(statement)
+
+    parts = [f'"""{scenario_description}"""', "\n".join(header_statements)]
+    parts.extend(SECTION_SEPARATORS.get(name, "\n").join(sections[name]) for name in SECTION_ORDER if sections[name])
+    return "\n\n".join(parts)
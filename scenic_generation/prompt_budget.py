@@ -0,0 +1,130 @@
+import functools
+import os
+import re
+import threading
+from verbosity import get_logger
+
+CHARS_PER_TOKEN = 4
+PROMPT_TOKENIZER = os.environ.get("SCENIC_PROMPT_TOKENIZER")
+DEFAULT_PROMPT_TOKEN_BUDGET = 1536
+PROMPT_TOKEN_BUDGETS = {
+    stage: int(os.environ.get(f"SCENIC_PROMPT_BUDGET_{stage.upper()}", DEFAULT_PROMPT_TOKEN_BUDGET))
+    for stage in ("behavior", "geometry", "spawn")
+}
+MIN_TRUNCATED_EXAMPLE_TOKENS = 64
+TRUNCATION_MARKER = "# ..."
+PLACEHOLDER_PATTERN = re.compile(r"\{(\w+)\}")
+
+logger = get_logger(__name__)
+
+_tokenizer = None
+_tokenizer_loaded = False
+_tokenizer_lock = threading.Lock()
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def get_tokenizer():
+    global _tokenizer, _tokenizer_loaded
+    if not _tokenizer_loaded:
+        with _tokenizer_lock:
+            if not _tokenizer_loaded:
+                if PROMPT_TOKENIZER:
+                    try:
+                        from tokenizers import Tokenizer
+                        if os.path.exists(PROMPT_TOKENIZER):
+                            _tokenizer = Tokenizer.from_file(PROMPT_TOKENIZER)
+                        else:
+                            _tokenizer = Tokenizer.from_pretrained(PROMPT_TOKENIZER)
+                    except Exception as e:
+                        logger.warning(f"Could not load tokenizer {PROMPT_TOKENIZER}, estimating tokens from characters: {e}")
+                _tokenizer_loaded = True
+    return _tokenizer
+
+
+def count_tokens(text):
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return len(text) // CHARS_PER_TOKEN
+    return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+class PromptTemplate:
+    # Placeholders are substituted in a single pass, so values containing "{name}" are left alone.
+    def __init__(self, text):
+        self.text = text
+        self._parts = PLACEHOLDER_PATTERN.split(text)
+
+    def render(self, **values):
+        parts = list(self._parts)
+        parts[1::2] = [values.get(name, f"{{{name}}}") for name in parts[1::2]]
+        return "".join(parts)
+
+
+@functools.lru_cache(maxsize=None)
+def compile_prompt_template(prompt_path):
+    with open(prompt_path, "r", encoding="utf-8") as f:
+        return PromptTemplate(f.read())
+
+
+def truncate_to_tokens(text, max_tokens):
+    lines = text.split("\n")
+    low, high = 0, len(lines)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens("\n".join(lines[:middle] + [TRUNCATION_MARKER])) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return "\n".join(lines[:low] + [TRUNCATION_MARKER])
+
+
+def fit_snippets(snippets, assemble_prompt, budget, stage=None):
+    if not budget or count_tokens(assemble_prompt(snippets)) <= budget:
+        return snippets
+
+    # The most similar examples are kept; whatever does not fit is dropped from the least similar end.
+    fitted = []
+    truncated = 0
+    for snippet in sorted(snippets, key=lambda snippet: -snippet['similarity']):
+        if count_tokens(assemble_prompt(fitted + [snippet])) <= budget:
+            fitted.append(snippet)
+            continue
+        available = budget - count_tokens(assemble_prompt(fitted + [dict(snippet, code="")]))
+        if not fitted or available >= MIN_TRUNCATED_EXAMPLE_TOKENS:
+            fitted.append(dict(snippet, code=truncate_to_tokens(snippet['code'], available)))
+            truncated = 1
+        break
+
+    record_examples(stage, dropped=len(snippets) - len(fitted), truncated=truncated)
+    return fitted
+
+
+def _stage_stats(stage):
+    return _stats.setdefault(stage, {
+        'prompts': 0, 'total_tokens': 0, 'max_tokens': 0, 'examples_dropped': 0, 'examples_truncated': 0
+    })
+
+
+def record_prompt_tokens(stage, tokens):
+    with _stats_lock:
+        stats = _stage_stats(stage)
+        stats['prompts'] += 1
+        stats['total_tokens'] += tokens
+        stats['max_tokens'] = max(stats['max_tokens'], tokens)
+
+
+def record_examples(stage, dropped, truncated):
+    with _stats_lock:
+        stats = _stage_stats(stage)
+        stats['examples_dropped'] += dropped
+        stats['examples_truncated'] += truncated
+
+
+def get_prompt_token_stats():
+    with _stats_lock:
+        report = {}
+        for stage, stats in _stats.items():
+            report[stage] = dict(stats)
+            report[stage]['mean_tokens'] = stats['total_tokens'] / stats['prompts'] if stats['prompts'] else 0.0
+        return report
@@ -1,9 +1,19 @@
+import importlib.metadata
 import os
-import subprocess
-import scenic
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from validation_cache import get_default_validation_cache, validation_cache_key
+from validation_pool import get_default_pool
+from verbosity import configure_verbosity, get_logger
 
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
+logger = get_logger("scenic_validator")
+
+_scenic_version = None
+_compile_lock = threading.Lock()
+
 
 class Colors:
     BLUE = '\033[94m'
@@ -13,12 +23,42 @@ class Colors:
     END = '\033[0m'
 
 
-def print_step(step_name, color=Colors.BLUE):
-    print(f"{color}{Colors.BOLD}[{step_name}]{Colors.END}")
+def log_step(step_name, color=Colors.BLUE):
+    logger.info(f"{color}{Colors.BOLD}[{step_name}]{Colors.END}")
+
+
+def log_success(message, color=Colors.GREEN):
+    logger.info(f"{color}✓ {message}{Colors.END}")
+
 
+def get_scenic_version():
+    global _scenic_version
+    if _scenic_version is None:
+        try:
+            _scenic_version = f"Scenic {importlib.metadata.version('scenic')}"
+        except importlib.metadata.PackageNotFoundError:
+            _scenic_version = "Unknown version"
+    return _scenic_version
 
-def print_success(message, color=Colors.GREEN):
-    print(f"{color}✓ {message}{Colors.END}")
+
+def error_line(error):
+    line = getattr(error, "lineno", None)
+    if line is None:
+        frames = [frame for frame in traceback.extract_tb(error.__traceback__) if frame.filename == "<string>"]
+        line = frames[-1].lineno if frames else None
+    return line
+
+
+def compile_scenic_code(scenic_code):
+    import scenic
+
+    try:
+        scenic.scenarioFromString(scenic_code)
+        return {"valid": True, "error": None}
+    except MemoryError:
+        raise
+    except Exception as e:
+        return {"valid": False, "error": str(e), "line": error_line(e)}
 
 
 def validate_scenic_code(scenic_code):
@@ -26,23 +66,45 @@ def validate_scenic_code(scenic_code):
         if not scenic_code:
             return {"valid": False, "error": "No code provided"}
 
-        print_step("SCENIC CODE VALIDATION", Colors.BLUE)
+        log_step("SCENIC CODE VALIDATION", Colors.BLUE)
 
-        version_output = subprocess.run(['scenic', '--version'], capture_output=True, text=True, timeout=5)
-        version_info = version_output.stdout.strip() if version_output.returncode == 0 else "Unknown version"
-        print(f"  • Using Scenic version: {version_info}")
+        scenic_version = get_scenic_version()
+        logger.info(f"  • Using Scenic version: {scenic_version}")
 
-        print("  • Compiling scenic code for validation...")
+        cache = get_default_validation_cache()
+        cache_key = validation_cache_key(scenic_code, scenic_version) if cache else None
+        result = cache.get(cache_key, scenic_code) if cache else None
+        if result is not None:
+            logger.info("  • Reusing cached validation result...")
+        else:
+            pool = get_default_pool()
+            if pool is None:
+                logger.info("  • Compiling scenic code for validation...")
+                with _compile_lock:
+                    result = compile_scenic_code(scenic_code)
+            else:
+                logger.info("  • Compiling scenic code in validation worker...")
+                result = pool.validate(scenic_code)
+            if cache and not result.get("worker_failure"):
+                cache.set(cache_key, scenic_code, result)
 
-        scenario = scenic.scenarioFromString(scenic_code)
-        print_success("Syntax validation passed")
-        return {"valid": True, "error": None}
+        if result["valid"]:
+            log_success("Syntax validation passed")
+        else:
+            logger.error(f"{Colors.RED}✗ Validation failed: {result['error']}{Colors.END}")
+        return result
     except Exception as e:
         error_msg = str(e)
-        print(f"{Colors.RED}✗ Validation failed: {error_msg}{Colors.END}")
+        logger.error(f"{Colors.RED}✗ Validation failed: {error_msg}{Colors.END}")
         return {"valid": False, "error": error_msg}
 
 
+def validate_many(scenic_codes):
+    pool = get_default_pool()
+    with ThreadPoolExecutor(max_workers=pool.workers if pool else 1) as executor:
+        return list(executor.map(validate_scenic_code, scenic_codes))
+
+
 def run_demo():
     try:
         print(f"{Colors.BOLD}SCENIC VALIDATOR DEMO{Colors.END}")
@@ -70,7 +132,7 @@ param distance = Range(5, 15)
         print(f"Validation result: {result}")
 
         if result["valid"]:
-            print_success("Demo completed successfully")
+            log_success("Demo completed successfully")
         else:
             print(f"{Colors.RED}✗ Demo failed{Colors.END}")
 
@@ -81,6 +143,8 @@ param distance = Range(5, 15)
 
 
 def main():
+    configure_verbosity()
+
     try:
         run_demo()
     except Exception as e:
@@ -0,0 +1,37 @@
+import os
+import threading
+
+# Similarity never exceeds 1, so the default threshold keeps every category on the LLM until one is configured.
+DEFAULT_SHORT_CIRCUIT_THRESHOLD = 1.01
+
+
+def short_circuit_thresholds(environ=os.environ):
+    return {
+        category_type: float(environ.get(f"SCENIC_SHORT_CIRCUIT_{category_type.upper()}", DEFAULT_SHORT_CIRCUIT_THRESHOLD))
+        for category_type in ("behavior", "geometry", "spawn")
+    }
+
+
+SHORT_CIRCUIT_THRESHOLDS = short_circuit_thresholds()
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def select_stored_snippet(category_type, snippets, thresholds=None):
+    threshold = (thresholds or SHORT_CIRCUIT_THRESHOLDS).get(category_type)
+    if threshold is None or not snippets:
+        return None
+    best_snippet = max(snippets, key=lambda snippet: snippet['similarity'])
+    return best_snippet if best_snippet['similarity'] >= threshold else None
+
+
+def record_generation(category_type, short_circuited):
+    with _stats_lock:
+        stats = _stats.setdefault(category_type, {'llm_calls': 0, 'llm_calls_saved': 0})
+        stats['llm_calls_saved' if short_circuited else 'llm_calls'] += 1
+
+
+def get_short_circuit_stats():
+    with _stats_lock:
+        return {category_type: dict(stats) for category_type, stats in _stats.items()}
@@ -0,0 +1,60 @@
+import json
+
+_decoder = json.JSONDecoder()
+WHITESPACE = " \t\r\n"
+
+
+def skip_whitespace(text, position, extra=""):
+    while position < len(text) and text[position] in WHITESPACE + extra:
+        position += 1
+    return position
+
+
+class IncrementalJsonObjectParser:
+    # A member is reported once the delimiter after its value has arrived, so truncated numbers are never reported.
+    def __init__(self):
+        self.values = {}
+        self.complete = False
+        self._buffer = ""
+        self._position = None
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        completed = []
+        while not self.complete:
+            member = self._next_member()
+            if member is None:
+                break
+            completed.append(member)
+        return completed
+
+    def _next_member(self):
+        buffer = self._buffer
+        if self._position is None:
+            start = buffer.find("{")
+            if start == -1:
+                return None
+            self._position = start + 1
+
+        position = skip_whitespace(buffer, self._position, ",")
+        if position >= len(buffer):
+            return None
+        if buffer[position] == "}":
+            self.complete = True
+            return None
+
+        try:
+            key, position = _decoder.raw_decode(buffer, position)
+            position = skip_whitespace(buffer, position)
+            if position >= len(buffer) or buffer[position] != ":":
+                return None
+            position = skip_whitespace(buffer, position + 1)
+            value, position = _decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            return None
+        if skip_whitespace(buffer, position) >= len(buffer):
+            return None
+
+        self._position = position
+        self.values[key] = value
+        return key, value
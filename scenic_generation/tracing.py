@@ -0,0 +1,256 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from llm_clients.scheduler import llm_call_report
+from prompt_budget import CHARS_PER_TOKEN, count_tokens, record_prompt_tokens
+
+TRACE_FILE = os.environ.get("SCENIC_TRACE_FILE")
+TRACE_OTEL = os.environ.get("SCENIC_TRACE_OTEL", "0") == "1"
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_current_scenario_id = contextvars.ContextVar("current_scenario_id", default=None)
+
+
+class Span:
+    def __init__(self, name, attributes, parent=None, scenario_id=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.scenario_id = scenario_id
+        self.attributes = dict(attributes)
+        self.status = "ok"
+        self.error = None
+        self.start_time = time.time()
+        self.end_time = None
+        self._start_counter = time.perf_counter()
+        self.duration = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self):
+        self.duration = time.perf_counter() - self._start_counter
+        self.end_time = self.start_time + self.duration
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'scenario_id': self.scenario_id,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'duration': self.duration,
+            'status': self.status,
+            'error': self.error,
+            'attributes': self.attributes
+        }
+
+
+class NullSpan:
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class JsonlSpanSink:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def default_tracer_provider(service_name):
+    # An application that configured OpenTelemetry keeps its provider. Otherwise spans go to the OTLP endpoint from
+    # OTEL_EXPORTER_OTLP_ENDPOINT when one is set, and to the console when it is not.
+    from opentelemetry import trace
+    provider = trace.get_tracer_provider()
+    if not isinstance(provider, trace.ProxyTracerProvider):
+        return provider
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    if os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT") or os.environ.get("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT"):
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter()
+    else:
+        exporter = ConsoleSpanExporter()
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    return trace.get_tracer_provider()
+
+
+class OpenTelemetrySpanSink:
+    def __init__(self, service_name="llm-scenario-generator", tracer_provider=None):
+        self._tracer = (tracer_provider or default_tracer_provider(service_name)).get_tracer(service_name)
+
+    def export(self, span):
+        attributes = {
+            key: value for key, value in span.to_dict()['attributes'].items()
+            if isinstance(value, (str, bool, int, float, list, tuple))
+        }
+        attributes.update({
+            'scenario.id': str(span.scenario_id),
+            'span.local_id': span.span_id,
+            'span.local_parent_id': str(span.parent_id)
+        })
+        otel_span = self._tracer.start_span(span.name, start_time=int(span.start_time * 1e9), attributes=attributes)
+        if span.status == "error":
+            otel_span.set_attribute("error.message", span.error or "")
+        otel_span.end(end_time=int(span.end_time * 1e9))
+
+
+_sinks = None
+_sinks_lock = threading.Lock()
+
+
+def get_sinks():
+    global _sinks
+    if _sinks is None:
+        with _sinks_lock:
+            if _sinks is None:
+                sinks = []
+                if TRACE_FILE:
+                    sinks.append(JsonlSpanSink(TRACE_FILE))
+                if TRACE_OTEL:
+                    sinks.append(OpenTelemetrySpanSink())
+                _sinks = sinks
+    return _sinks
+
+
+def add_sink(sink):
+    sinks = get_sinks()
+    with _sinks_lock:
+        sinks.append(sink)
+
+
+def remove_sink(sink):
+    with _sinks_lock:
+        if _sinks and sink in _sinks:
+            _sinks.remove(sink)
+
+
+@contextmanager
+def scenario(scenario_id=None):
+    token = _current_scenario_id.set(scenario_id or _current_scenario_id.get() or uuid.uuid4().hex[:12])
+    try:
+        yield _current_scenario_id.get()
+    finally:
+        _current_scenario_id.reset(token)
+
+
+@contextmanager
+def span(name, **attributes):
+    sinks = get_sinks()
+    if not sinks:
+        yield NULL_SPAN
+        return
+
+    current = Span(name, attributes, _current_span.get(), _current_scenario_id.get())
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.status = "error"
+        current.error = str(e)
+        raise
+    finally:
+        current.end()
+        _current_span.reset(token)
+        for sink in list(sinks):
+            sink.export(current)
+
+
+def traced_llm_response(get_llm_response, provider, model):
+    @functools.wraps(get_llm_response)
+    def traced_get_llm_response(prompt, stage=None, on_chunk=None, **kwargs):
+        with span("llm_call", provider=provider, model=model, stage=stage) as llm_span, llm_call_report() as report:
+            stream_state = {'first_chunk_at': None, 'chunks': 0}
+
+            def record_chunk(content):
+                if stream_state['first_chunk_at'] is None:
+                    stream_state['first_chunk_at'] = time.perf_counter()
+                stream_state['chunks'] += 1
+                if on_chunk:
+                    on_chunk(content)
+
+            response = get_llm_response(prompt, stage=stage, on_chunk=record_chunk, **kwargs)
+            prompt_tokens = count_tokens(prompt)
+            record_prompt_tokens(stage, prompt_tokens)
+
+            answered_by = report['provider'] or provider
+            timing = report['calls'].get(answered_by)
+            time_to_first_token = None
+            if stream_state['first_chunk_at'] is not None and timing is not None:
+                # Measured from the start of the final attempt, after the scheduler has granted the request.
+                time_to_first_token = stream_state['first_chunk_at'] - timing['generation_started']
+            llm_span.set_attributes(
+                answered_by=answered_by,
+                time_to_first_token=time_to_first_token,
+                chunk_count=stream_state['chunks'],
+                prompt_chars=len(prompt),
+                completion_chars=len(response),
+                prompt_tokens_estimate=prompt_tokens,
+                completion_tokens_estimate=len(response) // CHARS_PER_TOKEN,
+                cached=report['cached']
+            )
+            if timing is not None:
+                llm_span.set_attributes(
+                    queue_wait_seconds=timing['queue_wait_seconds'],
+                    generation_seconds=timing['generation_seconds'],
+                    attempts=timing['attempts']
+                )
+            return response
+
+    return traced_get_llm_response
+
+
+def current_span():
+    return _current_span.get() or NULL_SPAN
+
+
+@contextmanager
+def timed_span(name, timings=None, **attributes):
+    start_time = time.perf_counter()
+    try:
+        with span(name, **attributes) as stage_span:
+            yield stage_span
+    finally:
+        if timings is not None:
+            timings[name] = round(time.perf_counter() - start_time, 4)
+
+
+def traced(function, name, **attributes):
+    @functools.wraps(function)
+    def traced_function(*args, **kwargs):
+        with span(name, **attributes):
+            return function(*args, **kwargs)
+
+    return traced_function
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import diskcache
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+VALIDATION_CACHE_ENABLED = os.environ.get("SCENIC_VALIDATION_CACHE", "1") != "0"
+VALIDATION_CACHE_DIR = os.environ.get("SCENIC_VALIDATION_CACHE_DIR", os.path.join(script_dir, ".validation_cache"))
+VALIDATION_CACHE_SIZE_LIMIT = 64 * 1024 * 1024
+MAP_PARAM_PATTERN = re.compile(r"^param\s+map\s*=\s*(?:localPath\()?\s*['\"]([^'\"]+)['\"]", re.MULTILINE)
+
+_map_hashes = {}
+_map_hashes_lock = threading.Lock()
+
+
+def source_lines(scenic_code):
+    return scenic_code.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+
+
+def normalize_scenic_source(scenic_code):
+    return "\n".join(line.rstrip() for line in source_lines(scenic_code) if line.strip())
+
+
+def kept_line_numbers(scenic_code):
+    return [number for number, line in enumerate(source_lines(scenic_code), 1) if line.strip()]
+
+
+def to_normalized_line(scenic_code, line):
+    # Errors reported on a dropped blank line are attributed to the next kept line.
+    if line is None:
+        return None
+    kept = kept_line_numbers(scenic_code)
+    return min(sum(1 for number in kept if number < line) + 1, max(len(kept), 1))
+
+
+def from_normalized_line(scenic_code, line):
+    if line is None:
+        return None
+    kept = kept_line_numbers(scenic_code)
+    return kept[line - 1] if 0 < line <= len(kept) else line
+
+
+def map_file_hash(scenic_code):
+    match = MAP_PARAM_PATTERN.search(scenic_code)
+    if not match:
+        return None
+    path = os.path.abspath(match.group(1))
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return f"missing:{path}"
+
+    signature = (path, stat.st_size, stat.st_mtime_ns)
+    with _map_hashes_lock:
+        if signature in _map_hashes:
+            return _map_hashes[signature]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    with _map_hashes_lock:
+        _map_hashes[signature] = digest.hexdigest()
+    return _map_hashes[signature]
+
+
+def validation_cache_key(scenic_code, scenic_version):
+    payload = json.dumps(
+        {
+            "source": normalize_scenic_source(scenic_code),
+            "scenic_version": scenic_version,
+            "map": map_file_hash(scenic_code)
+        },
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ValidationCache:
+    def __init__(self, directory=VALIDATION_CACHE_DIR, size_limit=VALIDATION_CACHE_SIZE_LIMIT):
+        self._cache = diskcache.Cache(directory, size_limit=size_limit, eviction_policy="least-recently-used")
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+
+    # Keys ignore blank lines and trailing whitespace, so error lines are stored in normalized coordinates
+    # and mapped back onto the source of whoever hits the entry.
+    def get(self, key, scenic_code):
+        result = self._cache.get(key)
+        with self._stats_lock:
+            self._stats['hits' if result is not None else 'misses'] += 1
+        if result is None:
+            return None
+        return dict(result, line=from_normalized_line(scenic_code, result.get("line")))
+
+    def set(self, key, scenic_code, result):
+        self._cache.set(key, {
+            "valid": result["valid"],
+            "error": result["error"],
+            "line": to_normalized_line(scenic_code, result.get("line"))
+        })
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['compilations_avoided'] = stats['hits']
+        return stats
+
+    def clear(self):
+        self._cache.clear()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_validation_cache():
+    global _default_cache
+    if not VALIDATION_CACHE_ENABLED:
+        return None
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = ValidationCache()
+    return _default_cache
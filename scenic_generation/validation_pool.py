@@ -0,0 +1,195 @@
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+VALIDATION_WORKERS = int(os.environ.get("SCENIC_VALIDATION_WORKERS", DEFAULT_WORKERS))
+JOB_TIMEOUT_SECONDS = float(os.environ.get("SCENIC_VALIDATION_TIMEOUT", 60))
+MEMORY_LIMIT_MB = int(os.environ.get("SCENIC_VALIDATION_MEMORY_MB", 4096))
+MAX_JOBS_PER_WORKER = int(os.environ.get("SCENIC_VALIDATION_MAX_JOBS", 50))
+WORKER_START_TIMEOUT_SECONDS = 120
+
+
+def worker_failure(message):
+    return {"valid": False, "error": message, "worker_failure": True}
+
+
+def _worker_main(connection, memory_limit_mb, compile_function=None):
+    # The address space limit needs the POSIX resource module; elsewhere only the timeout applies.
+    if memory_limit_mb and resource is not None:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    from scenic_validator import compile_scenic_code, get_scenic_version
+    if compile_function is None:
+        import scenic
+        compile_function = compile_scenic_code
+
+    connection.send(get_scenic_version())
+    while True:
+        try:
+            scenic_code = connection.recv()
+        except EOFError:
+            break
+        if scenic_code is None:
+            break
+        try:
+            connection.send((compile_function(scenic_code), True))
+        except MemoryError:
+            connection.send((worker_failure(f"Validation exceeded the {memory_limit_mb} MB memory limit"), False))
+            break
+
+
+class ValidationWorker:
+    def __init__(self, context, memory_limit_mb, compile_function=None):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_connection, memory_limit_mb, compile_function),
+                                       daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.jobs = 0
+        self.scenic_version = None
+
+    def wait_ready(self, timeout=WORKER_START_TIMEOUT_SECONDS):
+        if not self.connection.poll(timeout):
+            self.stop()
+            raise TimeoutError(f"Validation worker did not start within {timeout:g}s")
+        try:
+            self.scenic_version = self.connection.recv()
+        except EOFError:
+            self.stop()
+            raise RuntimeError(f"Validation worker exited during startup with code {self.process.exitcode}")
+        return self
+
+    def run(self, scenic_code, timeout):
+        self.jobs += 1
+        self.connection.send(scenic_code)
+        if not self.connection.poll(timeout):
+            self.process.kill()
+            self.stop()
+            return worker_failure(f"Validation timed out after {timeout:g}s")
+        try:
+            result, healthy = self.connection.recv()
+        except EOFError:
+            self.process.join(1)
+            return worker_failure(f"Validation worker exited with code {self.process.exitcode}")
+        if not healthy:
+            self.stop()
+        return result
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def stop(self):
+        if self.process.is_alive():
+            try:
+                self.connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+
+class ValidationPool:
+    def __init__(self, workers=VALIDATION_WORKERS, job_timeout=JOB_TIMEOUT_SECONDS, memory_limit_mb=MEMORY_LIMIT_MB,
+                 max_jobs_per_worker=MAX_JOBS_PER_WORKER, compile_function=None):
+        self.workers = max(1, workers)
+        self.compile_function = compile_function
+        self.job_timeout = job_timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._closed = False
+        self._start_error = None
+        self.stats = {"jobs": 0, "timeouts": 0, "failures": 0, "recycled": 0}
+
+        starting = [ValidationWorker(self._context, memory_limit_mb, compile_function) for _ in range(self.workers)]
+        for worker in starting:
+            self._idle.put(worker.wait_ready())
+        self.scenic_version = starting[0].scenic_version
+
+    def _replace_worker(self):
+        try:
+            worker = ValidationWorker(self._context, self.memory_limit_mb, self.compile_function).wait_ready()
+        except Exception as e:
+            self._start_error = e
+            self._idle.put(None)
+            return
+        if self._closed:
+            worker.stop()
+        else:
+            self._idle.put(worker)
+
+    def _record(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def get_stats(self):
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def validate(self, scenic_code):
+        if self._closed:
+            raise RuntimeError("Validation pool is closed")
+        worker = self._idle.get()
+        if worker is None:
+            self._idle.put(None)
+            raise RuntimeError(f"Validation worker could not be started: {self._start_error}")
+        result = worker.run(scenic_code, self.job_timeout)
+        self._record("jobs")
+
+        if not worker.is_alive():
+            worker.stop()
+            self._record("timeouts" if result["error"].startswith("Validation timed out") else "failures")
+        elif worker.jobs >= self.max_jobs_per_worker:
+            self._record("recycled")
+            worker.stop()
+        else:
+            self._idle.put(worker)
+            return result
+
+        threading.Thread(target=self._replace_worker, daemon=True).start()
+        return result
+
+    def validate_many(self, scenic_codes):
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(self.validate, scenic_codes))
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                worker.stop()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool():
+    global _default_pool
+    if VALIDATION_WORKERS <= 0:
+        return None
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = ValidationPool()
+                atexit.register(_default_pool.close)
+    return _default_pool
@@ -0,0 +1,90 @@
+import contextvars
+import functools
+import logging
+import os
+import sys
+from contextlib import contextmanager
+
+LOGGER_NAME = "scenic_generation"
+VERBOSITY_LEVELS = {
+    "silent": logging.CRITICAL + 1,
+    "quiet": logging.WARNING,
+    "normal": logging.INFO,
+    "verbose": logging.DEBUG,
+    "stream": logging.DEBUG
+}
+
+_root_logger = logging.getLogger(LOGGER_NAME)
+_root_logger.addHandler(logging.NullHandler())
+_console_handler = None
+_stream_echo_enabled = False
+_captured_output = contextvars.ContextVar("scenic_captured_output", default=None)
+
+
+def write_output(text):
+    buffer = _captured_output.get()
+    if buffer is not None:
+        buffer.write(text)
+        return
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+
+@contextmanager
+def captured_output(buffer):
+    # Output written through write_output in this context goes to buffer; other threads keep writing to stdout.
+    token = _captured_output.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _captured_output.reset(token)
+
+
+class CurrentStdoutHandler(logging.Handler):
+    # Resolves the output target on every record so output captured per task by run_concurrently stays separated.
+    def emit(self, record):
+        try:
+            write_output(self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
+
+
+def get_logger(name):
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+def configure_verbosity(verbosity=None, default="normal"):
+    global _console_handler, _stream_echo_enabled
+    verbosity = verbosity or os.environ.get("SCENIC_VERBOSITY") or default
+    if verbosity not in VERBOSITY_LEVELS:
+        raise ValueError(f"Unknown verbosity {verbosity!r}, expected one of {', '.join(VERBOSITY_LEVELS)}")
+
+    _root_logger.setLevel(VERBOSITY_LEVELS[verbosity])
+    if _console_handler is None:
+        _console_handler = CurrentStdoutHandler()
+        _console_handler.setFormatter(logging.Formatter("%(message)s"))
+        _root_logger.addHandler(_console_handler)
+    _stream_echo_enabled = verbosity == "stream"
+    return verbosity
+
+
+def echo_chunk(content):
+    write_output(content)
+
+
+def echoed_llm_response(get_llm_response):
+    @functools.wraps(get_llm_response)
+    def echoed_get_llm_response(prompt, on_chunk=None, **kwargs):
+        if not _stream_echo_enabled:
+            return get_llm_response(prompt, on_chunk=on_chunk, **kwargs)
+
+        def echo_and_forward(content):
+            echo_chunk(content)
+            if on_chunk:
+                on_chunk(content)
+
+        response = get_llm_response(prompt, on_chunk=echo_and_forward, **kwargs)
+        write_output("\n")
+        return response
+
+    return echoed_get_llm_response
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+sys.path[:0] = [str(BASE_DIR), str(BASE_DIR / "scenic_generation"), str(BASE_DIR / "chroma_database")]
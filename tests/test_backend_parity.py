@@ -0,0 +1,57 @@
+import shutil
+import pytest
+
+pytest.importorskip("chromadb")
+
+from chroma_database.scenic_retriever import (
+    MmapSnippetRetriever, NumpySnippetRetriever, SnippetRetriever, db_path, embedding_parity_mismatches,
+    export_snippet_store, rankings_differ
+)
+
+
+@pytest.fixture(scope="module")
+def knowledge_base(tmp_path_factory):
+    # Chroma rewrites index files when a collection is opened, so tests work on a copy of the shipped KB.
+    path = tmp_path_factory.mktemp("kb") / "scenic_codebase"
+    shutil.copytree(db_path, path)
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def stored_queries(knowledge_base):
+    records = SnippetRetriever(path=knowledge_base)._get_collection().get(include=["embeddings", "metadatas"])
+    queries = {}
+    for embedding, meta in zip(records['embeddings'], records['metadatas']):
+        queries.setdefault(meta['type'], []).append(list(embedding))
+    queries[None] = [embeddings[0] for embeddings in queries.values()]
+    return queries
+
+
+@pytest.fixture(scope="module")
+def backends(knowledge_base, tmp_path_factory):
+    store_path = str(tmp_path_factory.mktemp("snippet_store"))
+    export_snippet_store(store_path, path=knowledge_base)
+    return {
+        'numpy': NumpySnippetRetriever(path=knowledge_base),
+        'mmap': MmapSnippetRetriever(path=store_path)
+    }
+
+
+@pytest.mark.parametrize("backend", ["numpy", "mmap"])
+@pytest.mark.parametrize("limit", [1, 3, 5])
+def test_backend_returns_chroma_uids_for_stored_embeddings(knowledge_base, stored_queries, backends, backend, limit):
+    chroma = SnippetRetriever(path=knowledge_base)
+    for category, query_embeddings in stored_queries.items():
+        assert embedding_parity_mismatches(chroma, backends[backend], query_embeddings, category, limit) == []
+
+
+def ranked(*pairs):
+    return [{'uid': uid, 'similarity': similarity} for uid, similarity in pairs]
+
+
+def test_swapped_uids_are_accepted_only_when_both_rankings_tie():
+    backend = ranked(("b", 0.9), ("a", 0.9), ("c", 0.5))
+    assert not rankings_differ(ranked(("a", 0.9), ("b", 0.9), ("c", 0.5)), backend, 2, 1e-4)
+    assert rankings_differ(ranked(("a", 0.9), ("b", 0.7), ("c", 0.5)), ranked(("b", 0.9), ("a", 0.9)), 1, 1e-4)
+    assert rankings_differ(ranked(("a", 0.9), ("c", 0.5)), backend, 1, 1e-4)
+    assert rankings_differ(ranked(("a", 0.9), ("b", 0.9)), ranked(("b", 0.9), ("a", 0.8)), 1, 1e-4)
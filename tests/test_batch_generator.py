@@ -0,0 +1,89 @@
+import json
+import sys
+import threading
+import time
+import types
+import pytest
+import batch_generator
+
+
+@pytest.fixture
+def fake_pipeline(monkeypatch):
+    module = types.ModuleType("fake_pipeline")
+    fast_written = threading.Event()
+
+    def generate_scenario_code(scenario, max_workers, timings, **options):
+        timings["decomposition"] = 0.1
+        if scenario == "slow":
+            fast_written.wait(5)
+        if scenario == "broken":
+            raise ValueError("provider unavailable")
+        if scenario == "undecomposable":
+            return None
+        return f"# {scenario}"
+
+    module.generate_scenario_code = generate_scenario_code
+    module.fast_written = fast_written
+    monkeypatch.setitem(sys.modules, module.__name__, module)
+    monkeypatch.setitem(batch_generator.PIPELINES, "fake", module.__name__)
+    monkeypatch.setattr(batch_generator, "get_default_decomposition_cache", lambda: None)
+    monkeypatch.setattr(batch_generator, "get_default_validation_cache", lambda: None)
+    monkeypatch.setattr(batch_generator, "validate_scenic_code",
+                        lambda code: {"valid": "invalid" not in code, "error": None if "invalid" not in code else "bad"})
+    return module
+
+
+def write_input(path, records):
+    path.write_text("\n".join(json.dumps(record) if record else "" for record in records) + "\n")
+    return str(path)
+
+
+def test_jsonl_contract(fake_pipeline, tmp_path):
+    input_path = write_input(tmp_path / "in.jsonl", [
+        {"id": "a", "scenario": "fast"},
+        None,
+        {"description": "invalid"},
+        {"id": 7, "scenario": "broken"},
+        {"scenario": "undecomposable"}
+    ])
+    output_path = str(tmp_path / "out.jsonl")
+
+    summary = batch_generator.run_batch(input_path, output_path, pipeline="fake", workers=2)
+    records = {record["id"]: record for record in map(json.loads, open(output_path, encoding="utf-8"))}
+
+    assert set(records) == {"a", 3, 7, 5}
+    assert records["a"]["code"] == "# fast" and records["a"]["valid"] is True and records["a"]["error"] is None
+    assert records[3]["scenario"] == "invalid" and records[3]["valid"] is False and records[3]["error"] == "bad"
+    assert records[7]["code"] is None and records[7]["error"] == "provider unavailable"
+    assert records[5]["error"] == "Scenario generation failed"
+    assert records["a"]["timings"]["decomposition"] == 0.1 and "validation" in records["a"]["timings"]
+    assert all("total" in record["timings"] for record in records.values())
+    assert (summary["total"], summary["generated"], summary["valid"]) == (4, 2, 1)
+
+
+def test_records_are_written_as_scenarios_finish(fake_pipeline, tmp_path):
+    input_path = write_input(tmp_path / "in.jsonl", [{"id": "slow", "scenario": "slow"}, {"id": "fast", "scenario": "fast"}])
+    output_path = tmp_path / "out.jsonl"
+
+    def watch_output():
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if output_path.exists() and '"fast"' in output_path.read_text():
+                fake_pipeline.fast_written.set()
+                return
+            time.sleep(0.01)
+
+    watcher = threading.Thread(target=watch_output)
+    watcher.start()
+    batch_generator.run_batch(input_path, str(output_path), pipeline="fake", workers=2, validate=False)
+    watcher.join()
+
+    assert fake_pipeline.fast_written.is_set()
+    assert [json.loads(line)["id"] for line in output_path.read_text().splitlines()] == ["fast", "slow"]
+    assert all(json.loads(line)["valid"] is None for line in output_path.read_text().splitlines())
+
+
+def test_unknown_record_shape_is_rejected(tmp_path):
+    input_path = write_input(tmp_path / "in.jsonl", [{"id": 1, "prompt": "no scenario"}])
+    with pytest.raises(ValueError, match="Line 1"):
+        list(batch_generator.read_scenarios(input_path))
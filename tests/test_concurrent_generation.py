@@ -0,0 +1,113 @@
+import sys
+import threading
+import time
+from concurrent_generation import ConcurrentTasks, raise_if_cancelled, run_concurrently
+from verbosity import write_output
+
+
+def test_resubmitted_task_supersedes_the_running_one():
+    streamed_started = threading.Event()
+    final_done = threading.Event()
+
+    def generate(description):
+        write_output(f"generating {description}\n")
+        if description == "streamed":
+            streamed_started.set()
+            final_done.wait(5)
+        else:
+            final_done.set()
+        return description
+
+    with ConcurrentTasks(2) as tasks:
+        tasks.submit("behavior", generate, "streamed")
+        streamed_started.wait(5)
+        tasks.submit("behavior", generate, "final")
+    results, errors, outputs = tasks.wait()
+
+    assert results == {"behavior": "final"}
+    assert errors == {}
+    assert outputs == {"behavior": "generating final\n"}
+
+
+def test_output_is_captured_per_task_without_swapping_stdout(capsys):
+    stdout = sys.stdout
+    seen = []
+
+    def generate(name):
+        seen.append(sys.stdout is stdout)
+        write_output(f"{name} output\n")
+        return name
+
+    results, errors, outputs = run_concurrently([(name, generate, (name,)) for name in ("behavior", "spawn")])
+    write_output("main output\n")
+
+    assert all(seen) and sys.stdout is stdout
+    assert outputs == {"behavior": "behavior output\n", "spawn": "spawn output\n"}
+    assert capsys.readouterr().out == "main output\n"
+
+
+def test_only_failed_tasks_are_rerun():
+    calls = []
+
+    def generate(name):
+        calls.append(name)
+        write_output(f"{name} attempt {calls.count(name)}\n")
+        if name == "geometry" and calls.count(name) == 1:
+            raise ConnectionError("connection reset")
+        return f"{name} code"
+
+    tasks = [(name, generate, (name,)) for name in ("behavior", "geometry", "spawn")]
+    results, errors, outputs = run_concurrently(tasks, retries=1)
+
+    assert errors == {}
+    assert results == {"behavior": "behavior code", "geometry": "geometry code", "spawn": "spawn code"}
+    assert sorted(calls) == ["behavior", "geometry", "geometry", "spawn"]
+    assert outputs["geometry"] == "geometry attempt 1\ngeometry attempt 2\n"
+
+
+def test_failures_that_persist_keep_the_completed_results():
+    def generate(name):
+        if name == "spawn":
+            raise TimeoutError("read timed out")
+        return f"{name} code"
+
+    results, errors, _ = run_concurrently([(name, generate, (name,)) for name in ("behavior", "spawn")], retries=2)
+    assert results == {"behavior": "behavior code"}
+    assert list(errors) == ["spawn"]
+
+
+def test_non_transient_errors_are_not_retried():
+    calls = []
+
+    def generate(name):
+        calls.append(name)
+        raise ValueError("bad prompt")
+
+    results, errors, _ = run_concurrently([("spawn", generate, ("spawn",))], retries=2)
+    assert results == {} and isinstance(errors["spawn"], ValueError)
+    assert calls == ["spawn"]
+
+
+def test_cancel_does_not_wait_for_speculative_tasks():
+    retrieval_started = threading.Event()
+    release_retrieval = threading.Event()
+    llm_calls = []
+
+    def retrieve_and_generate(name):
+        retrieval_started.set()
+        release_retrieval.wait(5)
+        raise_if_cancelled()
+        llm_calls.append(name)
+
+    start = time.perf_counter()
+    with ConcurrentTasks(1) as tasks:
+        tasks.submit("behavior", retrieve_and_generate, "behavior")
+        tasks.submit("geometry", retrieve_and_generate, "geometry")
+        retrieval_started.wait(5)
+        tasks.cancel()
+    elapsed = time.perf_counter() - start
+    release_retrieval.set()
+    time.sleep(0.1)
+
+    assert elapsed < 1
+    assert llm_calls == []
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from decomposition_cache import DecompositionCache
+
+DECOMPOSITION = {"success": True, "adversarial_object": "Bicycle", "behavior": "b", "geometry": "g",
+                 "spawn_position": "s"}
+
+
+class KeywordRetriever:
+    def __init__(self):
+        self.embedded = []
+
+    def embed_queries(self, texts):
+        self.embedded.extend(texts)
+        return [np.array([1.0, 0.1 if "swerves" in text else 0.0, 0.5 if "pedestrian" in text else 0.0])
+                for text in texts]
+
+    def embedding_model_name(self):
+        return "keywords"
+
+
+def test_exact_matching_is_the_default(tmp_path):
+    retriever = KeywordRetriever()
+    cache = DecompositionCache(str(tmp_path), retriever=retriever)
+    cache.store("A cyclist swerves", "template", "openai", "gpt", DECOMPOSITION)
+
+    assert cache.lookup("A  cyclist   swerves", "template", "openai", "gpt")[1] == "exact"
+    assert cache.lookup("A bike swerves", "template", "openai", "gpt") == (None, None, None)
+    assert retriever.embedded == []
+
+
+def test_semantic_matching_is_opt_in(tmp_path):
+    cache = DecompositionCache(str(tmp_path), threshold=0.99, retriever=KeywordRetriever(), semantic=True)
+    cache.store("A cyclist swerves", "template", "openai", "gpt", DECOMPOSITION)
+
+    decomposition, match, similarity = cache.lookup("A bike swerves", "template", "openai", "gpt")
+    assert match == "semantic" and similarity == pytest.approx(1.0)
+    assert decomposition == DECOMPOSITION
+    assert cache.lookup("A pedestrian", "template", "openai", "gpt")[1] is None
+    assert cache.lookup("A bike swerves", "other template", "openai", "gpt")[1] is None
+
+
+def test_stores_extend_the_index_without_rescanning(tmp_path, monkeypatch):
+    cache = DecompositionCache(str(tmp_path), threshold=0.99, retriever=KeywordRetriever(), semantic=True)
+    cache.store("A cyclist swerves", "template", "openai", "gpt", DECOMPOSITION)
+    cache.lookup("unrelated", "template", "openai", "gpt")
+
+    scans = []
+    iterkeys = cache._cache.iterkeys
+    monkeypatch.setattr(cache._cache, "iterkeys", lambda: scans.append(1) or iterkeys())
+    cache.store("A pedestrian crosses", "template", "openai", "gpt", DECOMPOSITION)
+    cache.store("A pedestrian crosses", "template", "openai", "gpt", DECOMPOSITION)
+
+    assert cache.lookup("pedestrian ahead", "template", "openai", "gpt")[1] == "semantic"
+    assert scans == []
+    assert len(cache._index['keywords']['keys']) == 2
+
+
+def test_other_providers_and_models_do_not_share_decompositions(tmp_path):
+    cache = DecompositionCache(str(tmp_path), retriever=KeywordRetriever())
+    cache.store("A cyclist swerves", "template", "openai", "gpt", DECOMPOSITION)
+
+    assert cache.lookup("A cyclist swerves", "template", "openai", "gpt")[1] == "exact"
+    assert cache.lookup("A cyclist swerves", "template", "openai", "gpt-mini")[1] is None
+    assert cache.lookup("A cyclist swerves", "template", "deepseek", "gpt")[1] is None
+
+
+def test_entries_from_another_embedding_model_or_dimension_are_kept_apart(tmp_path):
+    retriever = KeywordRetriever()
+    cache = DecompositionCache(str(tmp_path), threshold=0.99, retriever=retriever, semantic=True)
+    cache.store("A cyclist swerves", "template", "openai", "gpt", DECOMPOSITION)
+    cache.lookup("unrelated", "template", "openai", "gpt")
+
+    retriever.embedding_model_name = lambda: "wide"
+    retriever.embed_queries = lambda texts: [np.ones(5) for _ in texts]
+    cache.store("A pedestrian crosses", "template", "openai", "gpt", DECOMPOSITION)
+    cache._add_to_index(("stale", "entry"), "wide", np.ones(3, dtype=np.float32))
+
+    reloaded = DecompositionCache(str(tmp_path), threshold=0.99, retriever=retriever, semantic=True)
+    assert reloaded.lookup("anything", "template", "openai", "gpt")[1] == "semantic"
+    assert {model: len(index['keys']) for model, index in reloaded._index.items()} == {"keywords": 1, "wide": 1}
+    assert len(cache._index['wide']['keys']) == 1
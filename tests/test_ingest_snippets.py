@@ -0,0 +1,67 @@
+import pickle
+import pytest
+from ingest_snippets import (LEGACY_UID_PATTERN, ingest_snippets, legacy_uid_mapping, load_pickle_records,
+                             load_scenic_directory_records)
+
+
+def write_pickle(path, descriptions):
+    with open(path, "wb") as f:
+        pickle.dump({"behavior": {"description": descriptions, "snippet": [f"# {d}" for d in descriptions]}}, f)
+    return str(path)
+
+
+def test_pickle_uids_do_not_shift_when_a_snippet_is_inserted(tmp_path):
+    before = {record['description']: record['uid']
+              for record in load_pickle_records(write_pickle(tmp_path / "a.pkl", ["brakes", "swerves"]))}
+    after = {record['description']: record['uid']
+             for record in load_pickle_records(write_pickle(tmp_path / "b.pkl", ["cuts in", "brakes", "swerves"]))}
+    assert after["brakes"] == before["brakes"] and after["swerves"] == before["swerves"]
+    assert len(set(after.values())) == 3
+
+
+def test_repeated_descriptions_get_numbered_uids(tmp_path):
+    uids = [record['uid'] for record in load_pickle_records(write_pickle(tmp_path / "a.pkl", ["turn", "turn"]))]
+    assert uids[1] == f"{uids[0]}_2"
+
+
+class StoredCollection:
+    def __init__(self, records):
+        self.records = records
+
+    def get(self, include):
+        return {'ids': list(self.records), 'documents': list(self.records.values())}
+
+
+def test_legacy_uids_map_to_the_uids_their_pickle_now_loads_with(tmp_path):
+    descriptions = ["turn", "brakes", "turn"]
+    collection = StoredCollection({"behavior_002": "turn", "behavior_000": "turn", "behavior_001": "brakes",
+                                   "behavior_brake": "brakes"})
+    expected = [record['uid'] for record in load_pickle_records(write_pickle(tmp_path / "a.pkl", descriptions))]
+    assert legacy_uid_mapping(collection) == dict(zip(["behavior_000", "behavior_001", "behavior_002"], expected))
+
+
+def test_scenic_file_uids_never_look_like_index_based_uids(tmp_path):
+    (tmp_path / "behavior").mkdir()
+    (tmp_path / "behavior" / "000.scenic").write_text('"""Brakes hard."""\ndo FollowLaneBehavior()\n')
+    records = list(load_scenic_directory_records(str(tmp_path)))
+    assert [record['uid'] for record in records] == ["behavior_file_000"]
+    assert not LEGACY_UID_PATTERN.match(records[0]['uid'])
+
+
+def test_prune_removes_the_record_left_behind_by_a_description_edit(tmp_path, monkeypatch):
+    pytest.importorskip("chromadb")
+    from chromadb.utils import embedding_functions
+
+    class LengthEmbedding(embedding_functions.DefaultEmbeddingFunction):
+        def __call__(self, input):
+            return [[float(len(text)), 1.0] for text in input]
+
+    monkeypatch.setattr(embedding_functions, "DefaultEmbeddingFunction", LengthEmbedding)
+    path = str(tmp_path / "kb")
+    before = load_pickle_records(write_pickle(tmp_path / "a.pkl", ["brakes", "swerves"]))
+    assert ingest_snippets(before, path=path)['total'] == 2
+
+    edited = list(load_pickle_records(write_pickle(tmp_path / "b.pkl", ["brakes hard", "swerves"])))
+    assert ingest_snippets(edited, path=path)['total'] == 3
+    stats = ingest_snippets(edited, path=path, prune=True)
+    assert (stats['pruned'], stats['total']) == (1, 2)
@@ -0,0 +1,47 @@
+import shutil
+import pytest
+
+pytest.importorskip("chromadb")
+
+from chroma_database import scenic_retriever
+from chroma_database.scenic_retriever import NumpySnippetRetriever, SnippetRetriever, bump_kb_version, db_path
+
+
+@pytest.fixture
+def knowledge_base(tmp_path):
+    path = tmp_path / "scenic_codebase"
+    shutil.copytree(db_path, path)
+    return str(path)
+
+
+def test_kb_version_is_computed_once_until_ingestion_bumps_it(knowledge_base, monkeypatch):
+    retriever = SnippetRetriever(path=knowledge_base)
+    legacy_version = retriever.kb_version()
+
+    def fail(*args):
+        raise AssertionError("kb_version re-read the database")
+
+    monkeypatch.setattr(scenic_retriever, "read_max_seq_id", fail)
+    assert retriever.kb_version() == legacy_version
+
+    bump_kb_version(knowledge_base)
+    bumped_version = retriever.kb_version()
+    assert bumped_version != legacy_version
+    assert retriever.kb_version() == bumped_version
+
+    bump_kb_version(knowledge_base)
+    assert retriever.kb_version() not in (legacy_version, bumped_version)
+
+
+def test_numpy_index_reloads_after_ingestion(knowledge_base, monkeypatch):
+    retriever = NumpySnippetRetriever(path=knowledge_base)
+    first_version = retriever.kb_version()
+    loads = []
+    load_index = retriever._load_index
+    monkeypatch.setattr(retriever, "_load_index", lambda: loads.append(1) or load_index())
+
+    retriever.get_snippet_by_id("missing")
+    assert loads == []
+    bump_kb_version(knowledge_base)
+    retriever.get_snippet_by_id("missing")
+    assert loads == [1] and retriever.kb_version() != first_version
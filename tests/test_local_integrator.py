@@ -0,0 +1,59 @@
+import pytest
+from local_integrator import IntegrationConflict, integrate_locally, split_statements, statement_key
+
+HEADER = "param map = localPath('Town05.xodr')\nparam carla_map = 'Town05'\nmodel scenic.simulators.carla.model"
+
+
+def integrate(behavior="", geometry="", spawn="", **kwargs):
+    return integrate_locally("A scenario.", HEADER, behavior, geometry, spawn, **kwargs)
+
+
+def test_duplicate_imports_and_params_are_emitted_once():
+    code = integrate(
+        behavior="import math\nparam OPT_SPEED = 10\nbehavior Adv():\n    do FollowLaneBehavior(globalParameters.OPT_SPEED)",
+        geometry="import math\nparam OPT_SPEED = 10\nlane = Uniform(*network.lanes)",
+        spawn="param carla_map = 'Town05'\nego = new Car on lane"
+    )
+    assert code.count("import math") == 1
+    assert code.count("param OPT_SPEED = 10") == 1
+    assert code.count("param carla_map") == 1
+    assert code.index("import math") < code.index("param OPT_SPEED") < code.index("behavior Adv") < code.index("lane =")
+
+
+def test_conflicting_params_are_an_integration_failure():
+    with pytest.raises(IntegrationConflict, match="OPT_SPEED"):
+        integrate(behavior="param OPT_SPEED = 10", spawn="param OPT_SPEED = 20")
+    with pytest.raises(IntegrationConflict, match="carla_map"):
+        integrate(spawn="param carla_map = 'Town01'")
+
+
+def test_conflicting_definitions_are_an_integration_failure():
+    with pytest.raises(IntegrationConflict, match="behavior Adv"):
+        integrate(behavior="behavior Adv():\n    wait", spawn="behavior Adv():\n    take SetBrakeAction(1)")
+
+
+def test_adversarial_object_placeholder_is_substituted():
+    code = integrate(spawn="adversary = new {AdvObject} ahead of ego", adversarial_object="Pedestrian")
+    assert "new Pedestrian ahead of ego" in code and "{AdvObject}" not in code
+
+
+def test_if_else_continuations_stay_in_one_statement():
+    statements = split_statements("if x > 1:\n    y = 1\nelif x < 0:\n    y = 2\nelse:\n    y = 3\nz = y")
+    assert statements == ["if x > 1:\n    y = 1\nelif x < 0:\n    y = 2\nelse:\n    y = 3", "z = y"]
+
+
+def test_comments_stay_attached_and_trailing_comments_are_kept():
+    statements = split_statements("# the lane\nlane = Uniform(*network.lanes)\n# trailing note")
+    assert statements == ["# the lane\nlane = Uniform(*network.lanes)", "# trailing note"]
+    assert "# trailing note" in integrate(geometry="lane = Uniform(*network.lanes)\n# trailing note")
+
+
+def test_brackets_in_strings_and_comments_do_not_join_statements():
+    statements = split_statements("label = 'turn (left'  # closes later )\nside = \"[\"\nego = new Car")
+    assert len(statements) == 3
+    assert statement_key(statements[2]) == (None, ("statement", "ego = new Car"))
+
+
+def test_multiline_calls_are_one_statement():
+    statements = split_statements("points = [\n    (0, 0),\n\n    (1, 1)\n]\nego = new Car")
+    assert statements[0] == "points = [\n    (0, 0),\n\n    (1, 1)\n]"
@@ -0,0 +1,69 @@
+import threading
+import time
+import pytest
+
+pytest.importorskip("openai")
+
+from llm_clients import local_client, mock_server
+from llm_clients.scheduler import is_retryable_error
+from prompt_budget import compile_prompt_template
+import scenario_generator
+from streaming_json import IncrementalJsonObjectParser
+
+
+@pytest.fixture
+def start_mock_server(monkeypatch):
+    servers = []
+
+    def start_mock_server(**options):
+        server = mock_server.create_server(port=0, **options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        monkeypatch.setattr(local_client, "SERVER_URL", f"http://127.0.0.1:{server.server_address[1]}")
+        monkeypatch.setattr(local_client, "_client", None)
+        return server
+
+    yield start_mock_server
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_streamed_decomposition_parses_into_fields(start_mock_server):
+    start_mock_server()
+    prompt = compile_prompt_template(str(scenario_generator.SCENARIO_DECOMPOSITION_PATH)).render(
+        scenario="A cyclist swerves into the ego lane.")
+    parser = IncrementalJsonObjectParser()
+    fields = []
+
+    response = local_client.get_llm_response(prompt, on_chunk=lambda chunk: fields.extend(parser.feed(chunk)))
+
+    assert response.startswith("```json") and parser.complete
+    assert [key for key, _ in fields] == ["success", "adversarial_object", "behavior", "geometry", "spawn_position"]
+    assert parser.values["success"] is True and parser.values["adversarial_object"] == "Bicycle"
+
+
+def test_category_prompts_are_answered_from_their_first_example():
+    snippets = [{"uid": "behavior_1", "similarity": 0.9, "description": "Brakes.", "code": "behavior Brake():\n    wait"}]
+    prompt = scenario_generator.build_category_prompt("The car brakes.", scenario_generator.BEHAVIOR_PROMPT_PATH, snippets)
+    assert mock_server.classify_prompt(prompt) == "behavior"
+    assert mock_server.build_mock_response(prompt) == "```\nbehavior Brake():\n    wait\n```"
+
+    empty_prompt = scenario_generator.build_category_prompt("The car brakes.", scenario_generator.SPAWN_PROMPT_PATH, [])
+    assert mock_server.build_mock_response(empty_prompt) == f"```\n{mock_server.FALLBACK_SNIPPETS['spawn']}\n```"
+
+
+def test_time_to_first_token_is_simulated(start_mock_server):
+    start_mock_server(time_to_first_token=0.3)
+    chunk_times = []
+    start = time.perf_counter()
+    local_client.get_llm_response("hello", on_chunk=lambda chunk: chunk_times.append(time.perf_counter() - start))
+    assert chunk_times and chunk_times[0] >= 0.3
+
+
+def test_simulated_errors_are_retryable(start_mock_server):
+    start_mock_server(error_rate=1.0, error_status=503)
+    with pytest.raises(Exception) as raised:
+        local_client.get_llm_response("hello")
+    assert getattr(raised.value, "status_code", None) == 503
+    assert is_retryable_error(raised.value)
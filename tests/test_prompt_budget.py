@@ -0,0 +1,56 @@
+import prompt_budget
+from prompt_budget import PromptTemplate, count_tokens, fit_snippets, truncate_to_tokens
+
+
+def snippet(uid, similarity, lines):
+    return {"uid": uid, "similarity": similarity, "description": uid,
+            "code": "\n".join(f"line {uid} {i:02d} xxxxxxxxxxxxxxxxxxxxxxxxxxxx" for i in range(lines))}
+
+
+def assemble(snippets):
+    return "Header\n" + "\n\n".join(s["code"] for s in snippets)
+
+
+def test_count_tokens_estimates_from_characters_without_a_tokenizer(monkeypatch):
+    monkeypatch.setattr(prompt_budget, "_tokenizer", None)
+    monkeypatch.setattr(prompt_budget, "_tokenizer_loaded", True)
+    assert count_tokens("") == 0
+    assert count_tokens("x" * 41) == 41 // prompt_budget.CHARS_PER_TOKEN
+
+
+def test_zero_budget_is_unlimited():
+    snippets = [snippet("a", 0.9, 200), snippet("b", 0.8, 200)]
+    assert fit_snippets(snippets, assemble, 0) is snippets
+    assert fit_snippets(snippets, assemble, None) is snippets
+
+
+def test_least_similar_examples_are_dropped_first():
+    snippets = [snippet("low", 0.2, 10), snippet("high", 0.9, 10), snippet("mid", 0.5, 10)]
+    budget = count_tokens(assemble([snippets[1], snippets[2]]))
+    assert [s["uid"] for s in fit_snippets(snippets, assemble, budget, stage="test")] == ["high", "mid"]
+
+
+def test_last_example_is_truncated_on_a_line_boundary():
+    snippets = [snippet("high", 0.9, 10), snippet("mid", 0.5, 40)]
+    budget = count_tokens(assemble([snippets[0]])) + prompt_budget.MIN_TRUNCATED_EXAMPLE_TOKENS + 40
+    fitted = fit_snippets(snippets, assemble, budget, stage="test")
+
+    assert fitted[0] == snippets[0]
+    code_lines = fitted[1]["code"].split("\n")
+    assert code_lines[-1] == prompt_budget.TRUNCATION_MARKER
+    assert 1 < len(code_lines) < 41
+    assert all(line in snippets[1]["code"].split("\n") for line in code_lines[:-1])
+    assert count_tokens(assemble(fitted)) <= budget
+
+
+def test_truncation_keeps_whole_lines_within_the_limit():
+    text = "\n".join("x" * 20 for _ in range(10))
+    truncated = truncate_to_tokens(text, 20)
+    assert count_tokens(truncated) <= 20
+    assert truncated.split("\n")[:-1] == ["x" * 20] * (len(truncated.split("\n")) - 1)
+
+
+def test_template_renders_in_one_pass_and_keeps_unknown_placeholders():
+    template = PromptTemplate("Describe {scenario} using {AdvObject} and {examples}.")
+    rendered = template.render(scenario="a car that says {examples}", examples="none")
+    assert rendered == "Describe a car that says {examples} using {AdvObject} and none."
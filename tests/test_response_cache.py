@@ -0,0 +1,68 @@
+import asyncio
+import sys
+import types
+import pytest
+from llm_clients import providers
+from llm_clients.response_cache import (LLMCacheMissError, LLMResponseCache, cached_llm_response,
+                                        cached_llm_response_async, response_cache_key)
+from llm_clients.router import LLMRouter
+
+
+def register_provider(monkeypatch, name, calls, fail=False):
+    module = types.ModuleType(f"fake_{name}")
+    module.MODEL_NAME = f"{name}-model"
+
+    async def get_llm_response_async(prompt, on_chunk=None):
+        calls.append(name)
+        if fail:
+            raise ValueError(f"{name} unavailable")
+        return f"answer from {name}"
+
+    module.get_llm_response_async = get_llm_response_async
+    monkeypatch.setitem(sys.modules, module.__name__, module)
+    monkeypatch.setitem(providers.PROVIDERS, name, module.__name__)
+
+
+def test_routed_answers_are_cached_under_the_answering_provider(monkeypatch, tmp_path):
+    calls = []
+    register_provider(monkeypatch, "primary", calls, fail=True)
+    register_provider(monkeypatch, "backup", calls)
+    router = LLMRouter({"default": ["primary", "backup"]}, failover_retries=0)
+    cache = LLMResponseCache(directory=str(tmp_path))
+    get_llm_response = cached_llm_response(router.get_llm_response, "primary", "primary-model", cache=cache,
+                                           router=router)
+
+    assert get_llm_response("p", stage="behavior") == "answer from backup"
+    assert cache.get(response_cache_key("primary", "primary-model", "p")) is None
+    assert cache.get(response_cache_key("backup", "backup-model", "p")) == "answer from backup"
+
+    assert get_llm_response("p", stage="behavior") == "answer from backup"
+    assert calls == ["primary", "backup"]
+
+
+def test_replay_mode_serves_recorded_responses_and_never_calls_the_provider(tmp_path):
+    calls = []
+
+    def get_llm_response(prompt, **kwargs):
+        calls.append(prompt)
+        return f"answer to {prompt}"
+
+    async def get_llm_response_async(prompt, **kwargs):
+        return get_llm_response(prompt, **kwargs)
+
+    recorded = cached_llm_response(get_llm_response, "local", "m", cache=LLMResponseCache(directory=str(tmp_path)))
+    assert recorded("recorded") == "answer to recorded"
+
+    replay_cache = LLMResponseCache(directory=str(tmp_path), mode="replay")
+    replayed = cached_llm_response(get_llm_response, "local", "m", cache=replay_cache)
+    replayed_async = cached_llm_response_async(get_llm_response_async, "local", "m", cache=replay_cache)
+    assert replayed("recorded") == "answer to recorded"
+    with pytest.raises(LLMCacheMissError):
+        replayed("new prompt")
+    with pytest.raises(LLMCacheMissError):
+        asyncio.run(replayed_async("new prompt"))
+    with pytest.raises(LLMCacheMissError):
+        cached_llm_response(get_llm_response, "local", "other-model", cache=replay_cache)("recorded")
+
+    assert calls == ["recorded"]
+    assert replay_cache.get_stats() == {'hits': 1, 'misses': 3}
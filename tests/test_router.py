@@ -0,0 +1,45 @@
+import asyncio
+import sys
+import types
+import pytest
+from llm_clients import providers
+from llm_clients.router import LLMRouter
+
+
+def register_provider(monkeypatch, name, fail_before=None, fail_at_chunk=None):
+    module = types.ModuleType(f"fake_{name}")
+
+    async def get_llm_response_async(prompt, on_chunk=None):
+        await asyncio.sleep(0.01)
+        if fail_before:
+            raise ValueError(f"{name} unavailable")
+        for i, chunk in enumerate(["{", f'"{name}"', ": 1", "}"]):
+            if i == fail_at_chunk:
+                raise ValueError(f"{name} broke mid-stream")
+            on_chunk(chunk)
+        return f'{{"{name}": 1}}'
+
+    module.get_llm_response_async = get_llm_response_async
+    monkeypatch.setitem(sys.modules, module.__name__, module)
+    monkeypatch.setitem(providers.PROVIDERS, name, module.__name__)
+
+
+def test_fails_over_before_first_chunk(monkeypatch):
+    register_provider(monkeypatch, "down", fail_before=True)
+    register_provider(monkeypatch, "up")
+    router = LLMRouter({"default": ["down", "up"]}, failover_retries=0)
+    chunks = []
+    assert router.get_llm_response("p", stage="behavior", on_chunk=chunks.append) == '{"up": 1}'
+    assert "".join(chunks) == '{"up": 1}'
+    assert router.get_stats()["behavior"]["failovers"] == 1
+
+
+def test_does_not_fail_over_after_streaming(monkeypatch):
+    register_provider(monkeypatch, "flaky", fail_at_chunk=2)
+    register_provider(monkeypatch, "up")
+    router = LLMRouter({"default": ["flaky", "up"]}, failover_retries=0)
+    chunks = []
+    with pytest.raises(ValueError, match="mid-stream"):
+        router.get_llm_response("p", stage="behavior", on_chunk=chunks.append)
+    assert chunks == ["{", '"flaky"']
+    assert router.get_stats()["behavior"]["failed_after_first_chunk"] == 1
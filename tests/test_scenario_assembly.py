@@ -0,0 +1,29 @@
+import pytest
+
+import scenario_generator
+
+
+def test_assembled_header_is_not_indented():
+    header = scenario_generator.build_scenic_header("Town05")
+    code = scenario_generator.assemble_scenic_code("A scenario.", header, "b = 1", "g = 2", "s = 3")
+    lines = code.split("\n")
+    for header_line in header.split("\n"):
+        assert header_line in lines
+    assert all(not line[:1].isspace() for line in lines if line)
+
+
+def test_assembled_program_compiles():
+    pytest.importorskip("scenic")
+    from scenic_validator import compile_scenic_code
+
+    # The CARLA header needs map files that are not part of the repository, so compile a header without them.
+    header = "param carla_map = 'Town05'\nEGO_MODEL = \"vehicle.lincoln.mkz_2017\""
+    code = scenario_generator.assemble_scenic_code(
+        "A scenario.",
+        header,
+        "behavior AdvBehavior():\n    wait",
+        "egoPt = (0, 0)",
+        "ego = Object at egoPt\nadv = Object at (5, 5), with behavior AdvBehavior()"
+    )
+    result = compile_scenic_code(code)
+    assert result["valid"], result["error"]
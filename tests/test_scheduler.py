@@ -0,0 +1,79 @@
+import asyncio
+import time
+from collections import deque
+import pytest
+from llm_clients import scheduler
+from llm_clients.scheduler import ProviderScheduler
+
+
+def flaky_response(fail_after_chunks, failures=1):
+    attempts = []
+
+    def get_llm_response(prompt, on_chunk=None):
+        attempts.append(prompt)
+        if len(attempts) <= failures:
+            for chunk in ["partial "] * fail_after_chunks:
+                on_chunk(chunk)
+            raise ConnectionError("connection reset")
+        on_chunk("complete")
+        return "complete"
+
+    return get_llm_response, attempts
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(scheduler, "backoff_delay", lambda attempt, retry_after=None: 0)
+
+
+def test_retries_failures_before_the_first_chunk():
+    get_llm_response, attempts = flaky_response(fail_after_chunks=0)
+    chunks = []
+    result = ProviderScheduler("local").call(get_llm_response, "p", on_chunk=chunks.append)
+    assert result == "complete" and chunks == ["complete"] and len(attempts) == 2
+
+
+def test_does_not_replay_chunks_on_retry():
+    get_llm_response, attempts = flaky_response(fail_after_chunks=2)
+    chunks = []
+    with pytest.raises(ConnectionError):
+        ProviderScheduler("local").call(get_llm_response, "p", on_chunk=chunks.append)
+    assert chunks == ["partial ", "partial "] and len(attempts) == 1
+
+
+def test_async_does_not_replay_chunks_on_retry():
+    get_llm_response, attempts = flaky_response(fail_after_chunks=1)
+
+    async def get_llm_response_async(prompt, on_chunk=None):
+        return get_llm_response(prompt, on_chunk=on_chunk)
+
+    chunks = []
+    with pytest.raises(ConnectionError):
+        asyncio.run(ProviderScheduler("local").call_async(get_llm_response_async, "p", on_chunk=chunks.append))
+    assert chunks == ["partial "] and len(attempts) == 1
+
+
+def test_cancelled_waiter_leaves_the_queue_without_spending_budget():
+    provider_scheduler = ProviderScheduler("local", requests_per_minute=1, tokens_per_minute=1000)
+    provider_scheduler.acquire("behavior", 100)
+
+    async def cancel_while_waiting():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(provider_scheduler.acquire_async("behavior", 100), 0.2)
+
+    start = time.perf_counter()
+    asyncio.run(cancel_while_waiting())
+    assert time.perf_counter() - start < 5
+    assert provider_scheduler._stage_queues["behavior"] == deque() and not provider_scheduler._stage_order
+    assert provider_scheduler._token_bucket.tokens == pytest.approx(900, abs=1)
+
+
+def test_budget_granted_after_cancellation_is_refunded():
+    provider_scheduler = ProviderScheduler("local", requests_per_minute=10, tokens_per_minute=1000)
+    acquisition = {'cancelled': False, 'granted': False}
+    provider_scheduler.acquire("behavior", 100, acquisition)
+    assert acquisition['granted']
+
+    provider_scheduler.cancel_acquisition(acquisition, 100)
+    assert provider_scheduler._request_bucket.tokens == pytest.approx(10, abs=0.1)
+    assert provider_scheduler._token_bucket.tokens == pytest.approx(1000, abs=1)
@@ -0,0 +1,69 @@
+import pytest
+import auto_scenario_generator
+import short_circuit
+from short_circuit import (get_short_circuit_stats, record_generation, select_stored_snippet,
+                           short_circuit_thresholds)
+
+SNIPPETS = [
+    {"uid": "behavior_close", "similarity": 0.95, "code": "behavior Stored():\n    wait\n", "description": "d"},
+    {"uid": "behavior_far", "similarity": 0.4, "code": "behavior Other():\n    wait\n", "description": "d"}
+]
+
+
+def test_short_circuit_is_disabled_by_default():
+    thresholds = short_circuit_thresholds({})
+    assert all(threshold > 1 for threshold in thresholds.values())
+    assert select_stored_snippet("behavior", [dict(SNIPPETS[0], similarity=1.0)], thresholds) is None
+
+
+def test_threshold_is_inclusive():
+    assert select_stored_snippet("behavior", SNIPPETS, {"behavior": 0.95})["uid"] == "behavior_close"
+    assert select_stored_snippet("behavior", SNIPPETS, {"behavior": 0.9500001}) is None
+    assert select_stored_snippet("behavior", [], {"behavior": 0.5}) is None
+
+
+def test_thresholds_are_overridden_per_category():
+    thresholds = short_circuit_thresholds({"SCENIC_SHORT_CIRCUIT_GEOMETRY": "0.9"})
+    assert thresholds["geometry"] == 0.9
+    assert thresholds["behavior"] == thresholds["spawn"] == short_circuit.DEFAULT_SHORT_CIRCUIT_THRESHOLD
+    assert select_stored_snippet("geometry", SNIPPETS, thresholds) is not None
+    assert select_stored_snippet("behavior", SNIPPETS, thresholds) is None
+
+
+@pytest.fixture
+def counters(monkeypatch):
+    monkeypatch.setattr(short_circuit, "_stats", {})
+    monkeypatch.setitem(short_circuit.SHORT_CIRCUIT_THRESHOLDS, "behavior", 0.9)
+    prompts = []
+    monkeypatch.setattr(auto_scenario_generator, "get_llm_response",
+                        lambda prompt, stage=None: prompts.append(prompt) or "behavior Generated():\n    wait")
+    return prompts
+
+
+def test_stored_snippet_saves_the_llm_call(counters):
+    code = auto_scenario_generator.generate_code_for_category(
+        "A car brakes", "behavior", auto_scenario_generator.BEHAVIOR_PROMPT_PATH, snippets=SNIPPETS)
+
+    assert code == SNIPPETS[0]["code"].strip()
+    assert counters == []
+    assert get_short_circuit_stats() == {"behavior": {"llm_calls": 0, "llm_calls_saved": 1}}
+
+
+def test_repair_attempts_bypass_the_short_circuit(counters):
+    repair_context = {"code": SNIPPETS[0]["code"], "error": "name 'Stored' is not defined"}
+    code = auto_scenario_generator.generate_code_for_category(
+        "A car brakes", "behavior", auto_scenario_generator.BEHAVIOR_PROMPT_PATH, snippets=SNIPPETS,
+        repair_context=repair_context)
+
+    assert code == "behavior Generated():\n    wait"
+    assert len(counters) == 1 and "name 'Stored' is not defined" in counters[0]
+    assert get_short_circuit_stats() == {"behavior": {"llm_calls": 1, "llm_calls_saved": 0}}
+
+
+def test_counters_are_kept_per_category(monkeypatch):
+    monkeypatch.setattr(short_circuit, "_stats", {})
+    record_generation("geometry", short_circuited=True)
+    record_generation("geometry", short_circuited=False)
+    record_generation("spawn", short_circuited=False)
+    assert get_short_circuit_stats() == {"geometry": {"llm_calls": 1, "llm_calls_saved": 1},
+                                         "spawn": {"llm_calls": 1, "llm_calls_saved": 0}}
@@ -0,0 +1,45 @@
+import json
+import pytest
+from streaming_json import IncrementalJsonObjectParser
+
+DOCUMENT = json.dumps({
+    "success": True,
+    "adversarial_object": "Car",
+    "behavior": 'The car says "stop {now}" and brakes, then swerves (left).',
+    "geometry": "A road with a {curly} name and \\ backslash.",
+    "spawn_position": "Ahead of ego.",
+    "retries": 12
+}, indent=2)
+
+
+def feed_in_chunks(parser, text, size):
+    members = []
+    for start in range(0, len(text), size):
+        members.extend(parser.feed(text[start:start + size]))
+    return members
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 16, len(DOCUMENT)])
+def test_members_are_reported_once_at_any_chunk_boundary(size):
+    parser = IncrementalJsonObjectParser()
+    members = feed_in_chunks(parser, "Here you go:\n" + DOCUMENT + "\n", size)
+    assert members == list(json.loads(DOCUMENT).items())
+    assert parser.values == json.loads(DOCUMENT)
+    assert parser.complete
+
+
+def test_truncated_stream_reports_only_finished_members():
+    truncated = DOCUMENT[:DOCUMENT.index('"retries"') + len('"retries": 1')]
+    parser = IncrementalJsonObjectParser()
+    members = feed_in_chunks(parser, truncated, 5)
+    assert [key for key, _ in members] == ["success", "adversarial_object", "behavior", "geometry", "spawn_position"]
+    assert "retries" not in parser.values
+    assert not parser.complete
+
+
+def test_string_cut_inside_an_escape_is_not_reported():
+    parser = IncrementalJsonObjectParser()
+    assert parser.feed('{"behavior": "says \\"sto') == []
+    assert parser.feed('p\\" now", "geometry"') == [("behavior", 'says "stop" now')]
+    assert parser.feed(': "road"}') == [("geometry", "road")]
+    assert parser.complete
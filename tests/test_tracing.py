@@ -0,0 +1,125 @@
+import sys
+import time
+import types
+import pytest
+from llm_clients import providers
+from llm_clients.response_cache import LLMResponseCache, cached_llm_response
+from llm_clients.router import LLMRouter
+from llm_clients.scheduler import get_scheduler, scheduled_llm_response
+from tracing import OpenTelemetrySpanSink, Span, add_sink, default_tracer_provider, remove_sink, traced_llm_response
+
+
+class MemorySink:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+
+@pytest.fixture
+def llm_spans():
+    sink = MemorySink()
+    add_sink(sink)
+    yield sink.spans
+    remove_sink(sink)
+
+
+@pytest.fixture
+def slow_acquire(monkeypatch):
+    scheduler = get_scheduler("local")
+
+    def acquire(stage, tokens, acquisition=None):
+        time.sleep(0.2)
+        return 0.2
+
+    monkeypatch.setattr(scheduler, "acquire", acquire)
+
+
+def streaming_response(prompt, on_chunk=None):
+    for chunk in ("ego = ", "new Car"):
+        on_chunk(chunk)
+    return "ego = new Car"
+
+
+def test_time_to_first_token_excludes_the_scheduler_queue(llm_spans, slow_acquire, tmp_path):
+    cache = LLMResponseCache(directory=str(tmp_path))
+    get_llm_response = traced_llm_response(
+        cached_llm_response(scheduled_llm_response(streaming_response, "local"), "local", "m", cache=cache),
+        "local",
+        "m"
+    )
+
+    get_llm_response("prompt", stage="behavior")
+    attributes = llm_spans[-1].attributes
+    assert attributes['cached'] is False and attributes['chunk_count'] == 2
+    assert attributes['time_to_first_token'] < 0.1
+    assert attributes['queue_wait_seconds'] == pytest.approx(0.2)
+    assert attributes['attempts'] == 1
+
+    get_llm_response("prompt", stage="behavior")
+    attributes = llm_spans[-1].attributes
+    assert attributes['cached'] is True
+    assert attributes['time_to_first_token'] is None and 'queue_wait_seconds' not in attributes
+
+
+def test_routed_async_calls_report_timing(llm_spans, monkeypatch):
+    module = types.ModuleType("fake_async_provider")
+    module.MODEL_NAME = "async-model"
+
+    async def get_llm_response_async(prompt, on_chunk=None):
+        on_chunk("ego = new Car")
+        return "ego = new Car"
+
+    module.get_llm_response_async = get_llm_response_async
+    monkeypatch.setitem(sys.modules, module.__name__, module)
+    monkeypatch.setitem(providers.PROVIDERS, "async_backup", module.__name__)
+    monkeypatch.setitem(providers.PROVIDERS, "async_down", "missing_provider_module")
+
+    router = LLMRouter({"default": ["async_down", "async_backup"]}, failover_retries=0)
+    traced_llm_response(router.get_llm_response, "async_down", "down-model")("prompt", stage="spawn")
+
+    attributes = llm_spans[-1].attributes
+    assert attributes['answered_by'] == "async_backup"
+    assert attributes['attempts'] == 1 and attributes['generation_seconds'] is not None
+    assert attributes['time_to_first_token'] is not None
+
+
+def test_opentelemetry_sink_exports_finished_spans():
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    span = Span("llm_call", {"stage": "behavior", "similarities": [0.9, 0.8], "skipped": None}, scenario_id=7)
+    span.end_time = span.start_time + 1.5
+    OpenTelemetrySpanSink(tracer_provider=provider).export(span)
+
+    exported, = exporter.get_finished_spans()
+    assert exported.name == "llm_call"
+    assert exported.attributes["stage"] == "behavior" and exported.attributes["scenario.id"] == "7"
+    assert "skipped" not in exported.attributes
+    assert (exported.end_time - exported.start_time) / 1e9 == pytest.approx(1.5)
+
+
+def test_an_exporting_provider_is_installed_when_none_is_configured(monkeypatch):
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry import trace
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+    installed = []
+    monkeypatch.delenv("OTEL_EXPORTER_OTLP_ENDPOINT", raising=False)
+    monkeypatch.delenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT", raising=False)
+    monkeypatch.setattr(trace, "get_tracer_provider", lambda: installed[-1] if installed else trace.ProxyTracerProvider())
+    monkeypatch.setattr(trace, "set_tracer_provider", installed.append)
+
+    provider = default_tracer_provider("test-service")
+    assert isinstance(provider, TracerProvider) and installed == [provider]
+    processor, = provider._active_span_processor._span_processors
+    assert isinstance(processor.span_exporter, ConsoleSpanExporter)
+    assert default_tracer_provider("test-service") is provider
+    provider.shutdown()
@@ -0,0 +1,19 @@
+from validation_cache import ValidationCache, validation_cache_key
+
+
+def test_cached_error_line_maps_onto_callers_source(tmp_path):
+    cache = ValidationCache(directory=str(tmp_path))
+    compact = "ego = new Car\nbehavior Broken():\n  take bad\n"
+    spaced = "ego = new Car\n\n\nbehavior Broken():\n\n  take bad\n"
+    assert validation_cache_key(compact, "3.0") == validation_cache_key(spaced, "3.0")
+
+    cache.set(validation_cache_key(compact, "3.0"), compact, {"valid": False, "error": "bad", "line": 3})
+    assert cache.get(validation_cache_key(spaced, "3.0"), spaced)["line"] == 6
+    assert cache.get(validation_cache_key(compact, "3.0"), compact)["line"] == 3
+
+
+def test_valid_results_keep_no_line(tmp_path):
+    cache = ValidationCache(directory=str(tmp_path))
+    key = validation_cache_key("ego = new Car\n", "3.0")
+    cache.set(key, "ego = new Car\n", {"valid": True, "error": None})
+    assert cache.get(key, "\nego = new Car\n") == {"valid": True, "error": None, "line": None}
@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+import pytest
+import scenic_validator
+import validation_pool
+from validation_pool import ValidationPool
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="worker memory limits need the resource module")
+
+
+def stub_compile(scenic_code):
+    # Runs in the worker process: "sleep", "allocate" and "exit" simulate a hang, a memory blow-up and a crash.
+    if scenic_code == "sleep":
+        time.sleep(30)
+    elif scenic_code == "allocate":
+        bytearray(4 * 1024 * 1024 * 1024)
+    elif scenic_code == "exit":
+        os._exit(3)
+    return {"valid": True, "error": None, "line": None, "pid": os.getpid()}
+
+
+@pytest.fixture
+def make_pool():
+    # Replacement workers start in the background; the next validate() blocks until one is idle.
+    pools = []
+
+    def make_pool(**options):
+        pools.append(ValidationPool(**dict({"workers": 1, "compile_function": stub_compile}, **options)))
+        return pools[-1]
+
+    yield make_pool
+    for pool in pools:
+        pool.close()
+
+
+def test_hung_job_is_killed_and_its_worker_replaced(make_pool):
+    pool = make_pool(job_timeout=0.5)
+    first_pid = pool.validate("ok")["pid"]
+
+    result = pool.validate("sleep")
+    assert result["worker_failure"] and result["error"] == "Validation timed out after 0.5s"
+    assert pool.validate("ok")["pid"] != first_pid
+    assert pool.get_stats() == {"jobs": 3, "timeouts": 1, "failures": 0, "recycled": 0}
+
+
+def test_workers_are_replaced_after_the_job_limit(make_pool):
+    pool = make_pool(max_jobs_per_worker=2)
+    pids = [pool.validate("ok")["pid"] for _ in range(3)]
+    assert pids[0] == pids[1] != pids[2]
+    assert pool.get_stats()["recycled"] == 1
+
+
+def test_memory_limit_fails_the_job_and_restarts_the_worker(make_pool):
+    pool = make_pool(memory_limit_mb=1024)
+    first_pid = pool.validate("ok")["pid"]
+
+    result = pool.validate("allocate")
+    assert result["worker_failure"] and "1024 MB memory limit" in result["error"]
+    assert pool.validate("ok")["pid"] != first_pid
+    assert pool.get_stats()["failures"] == 1
+
+
+def test_crashed_worker_is_reported_and_replaced(make_pool):
+    pool = make_pool()
+    result = pool.validate("exit")
+    assert result["worker_failure"] and result["error"] == "Validation worker exited with code 3"
+    assert pool.validate("ok")["valid"]
+
+
+def test_zero_workers_compile_in_process(monkeypatch):
+    compiled = []
+    monkeypatch.setattr(validation_pool, "VALIDATION_WORKERS", 0)
+    monkeypatch.setattr(scenic_validator, "get_default_validation_cache", lambda: None)
+    monkeypatch.setattr(scenic_validator, "compile_scenic_code",
+                        lambda scenic_code: compiled.append(os.getpid()) or {"valid": True, "error": None})
+
+    assert validation_pool.get_default_pool() is None
+    assert scenic_validator.validate_scenic_code("ego = new Object")["valid"]
+    assert compiled == [os.getpid()]